@@ -7,6 +7,8 @@ Class instance used to make Display.
 import numpy as np
 import scipy
 import os
+import hashlib
+from collections import OrderedDict
 import pyart
 
 from matplotlib.backends import pylab_setup
@@ -18,12 +20,15 @@ NavigationToolbar = backend.NavigationToolbar2QT
 #    NavigationToolbar
 from matplotlib.figure import Figure
 from matplotlib.colors import Normalize as mlabNormalize
+from matplotlib.colors import LogNorm
 from matplotlib.colorbar import ColorbarBase as mlabColorbarBase
 from matplotlib.pyplot import cm
 
 from ..core import (Variable, Component, common, VariableChoose, QtCore,
-                    QtGui, QtWidgets)
+                    QtGui, QtWidgets, get_job_runner, log)
 from ..core.points import Points
+from ..core.journal import radar_version
+from ..core import correlation_stats
 
 # Save image file type and DPI (resolution)
 IMAGE_EXT = 'png'
@@ -42,6 +47,7 @@ class Correlation(Component):
     VfieldHorizontal = None  #: see :ref:`shared_variable`
     Vtilt = None  #: see :ref:`shared_variable`
     Vgatefilter = None  #: see :ref:`shared_variable`
+    Vfilelist = None  #: see :ref:`shared_variable`
     VplotAxes = None  #: see :ref:`shared_variable` (no internal use)
 
     @classmethod
@@ -53,7 +59,8 @@ class Correlation(Component):
         return self(**kwargs), independent
 
     def __init__(self, Vradar=None, VfieldVertical=None, VfieldHorizontal=None,
-                 Vgatefilter=None, name="Correlation", parent=None):
+                 Vgatefilter=None, Vfilelist=None, name="Correlation",
+                 parent=None):
         '''
         Initialize the class to create display.
 
@@ -68,6 +75,9 @@ class Correlation(Component):
         Vgatefilter : :py:class:`~artview.core.core.Variable` instance
             Gatefilter signal variable.
             A value of None will instantiate a empty variable.
+        Vfilelist : :py:class:`~artview.core.core.Variable` instance
+            File list signal variable, files of 'Accumulate Files'.
+            A value of None will instantiate a empty list variable.
         name : string
             Display window name.
         parent : PyQt instance
@@ -100,12 +110,18 @@ class Correlation(Component):
         else:
             self.Vgatefilter = Vgatefilter
 
+        if Vfilelist is None:
+            self.Vfilelist = Variable([])
+        else:
+            self.Vfilelist = Vfilelist
+
         self.VplotAxes = Variable(None)
 
         self.sharedVariables = {"Vradar": self.NewRadar,
                                 "VfieldVertical": self.NewField,
                                 "VfieldHorizontal": self.NewField,
                                 "Vgatefilter": self.NewGatefilter,
+                                "Vfilelist": None,
                                 "VplotAxes": None,}
 
         # Connect the components
@@ -121,6 +137,9 @@ class Correlation(Component):
             "xmax": None,
             "ymin": None,
             "ymax": None,
+            "bins": 200,
+            "cmap": "viridis",
+            "density_norm": "log",
             }
 
         self.parameters_type = [
@@ -133,8 +152,20 @@ class Correlation(Component):
             ("xmax", common.float_or_none, "Max X Value"),
             ("ymin", common.float_or_none, "Min Y Value"),
             ("ymax", common.float_or_none, "Max Y Value"),
+            ("bins", int, "density bins"),
+            ("cmap", str, "density colormap"),
+            ("density_norm", ("log", "linear"), "density color scale"),
             ]
 
+        # binned counts of the density plot, limits and colormap only
+        # redraw the image
+        self._densityCache = OrderedDict()
+        self.maxDensityCache = 4
+
+        # merged statistics of 'Accumulate Files'
+        self._accumulated = None
+        self._accumulation = 0  # generation, older results are dropped
+
         # Set plot title and colorbar units to defaults
         self.title = self._get_default_title()
         self.unitsVertical, self.unitsHorizontal = self._get_default_units()
@@ -328,11 +359,29 @@ class Correlation(Component):
         dispmenu.addAction(self.gatefilterToggle)
         self.gatefilterToggle.setChecked(True)
 
+        self.densityToggle = QtWidgets.QAction(
+            'Density Plot', dispmenu, checkable=True,
+            triggered=self._update_plot)
+        self.densityToggle.setToolTip(
+            "Plot a 2D histogram of the gates instead of a scatter plot")
+        dispmenu.addAction(self.densityToggle)
+
         self.regressionLineToggle = QtWidgets.QAction(
             'Linear Regression', dispmenu, checkable=True,
             triggered=self._update_plot)
         dispmenu.addAction(self.regressionLineToggle)
 
+        accumulate = dispmenu.addAction("Accumulate Files")
+        accumulate.setToolTip(
+            "Density and regression of the selected fields and sweeps over "
+            "all files of the file list")
+        accumulate.triggered.connect(self.accumulateFiles)
+        self.accumulatedToggle = QtWidgets.QAction(
+            'Show Accumulated', dispmenu, checkable=True,
+            triggered=self._update_plot)
+        self.accumulatedToggle.setEnabled(False)
+        dispmenu.addAction(self.accumulatedToggle)
+
         self.dispImageText = dispmenu.addAction("Add Text to Image")
         self.dispImageText.setToolTip("Add Text Box to Image")
         dispQuickSave = dispmenu.addAction("Quick Save Image")
@@ -513,25 +562,8 @@ class Correlation(Component):
     @staticmethod
     def _get_xy_values(radar, field_horizontal, field_vertical,
                        sweeps, gatefilter):
-        xvalues = radar.fields[field_horizontal]['data']
-        yvalues = radar.fields[field_vertical]['data']
-
-        if gatefilter is None:
-            gates = np.ma.getmaskarray(xvalues) | np.ma.getmaskarray(yvalues)
-        else:
-            gates = gatefilter.gate_excluded
-
-        if sweeps is not None:
-            sweep_filter = gates | True
-            for sweep, (start, end) in enumerate(radar.iter_start_end()):
-                if sweep in sweeps:
-                    sweep_filter[start:end+1,:] = False
-            gates = gates | sweep_filter
-
-        xvalues = np.ma.MaskedArray(xvalues, mask=gates)
-        yvalues = np.ma.MaskedArray(yvalues, mask=gates)
-
-        return xvalues, yvalues
+        return correlation_stats.correlation_values(
+            radar, field_horizontal, field_vertical, sweeps, gatefilter)
 
     @staticmethod
     def plot_correlation(radar, field_horizontal, field_vertical,
@@ -544,6 +576,47 @@ class Correlation(Component):
 
         ax.set_title(title)
 
+    @staticmethod
+    def plot_density(counts, xedges, yedges, ax, title, cmap=None,
+                     norm="log"):
+        '''Plot 2D histogram counts (x bins, y bins) as an image.'''
+        counts = np.ma.masked_equal(counts, 0)
+        if norm == "log" and counts.count():
+            norm = LogNorm(vmin=1, vmax=counts.max())
+        else:
+            norm = None
+        image = ax.pcolormesh(xedges, yedges, counts.T, cmap=cmap,
+                              norm=norm)
+        ax.set_title(title)
+        return image
+
+    def _density(self, radar, field_horizontal, field_vertical, sweeps,
+                 gatefilter, xscale, yscale):
+        '''Return cached or compute counts, xedges and yedges.'''
+        xdata = radar.fields[field_horizontal]['data']
+        ydata = radar.fields[field_vertical]['data']
+        if gatefilter is None:
+            gatefilter_key = None
+        else:
+            gatefilter_key = hashlib.sha1(
+                np.packbits(gatefilter.gate_excluded).data).hexdigest()
+        key = (id(radar), radar_version(radar), field_horizontal,
+               field_vertical, id(xdata), id(ydata),
+               None if sweeps is None else tuple(sweeps), gatefilter_key,
+               xscale, yscale, self.parameters['bins'])
+        if key in self._densityCache:
+            self._densityCache[key] = self._densityCache.pop(key)
+            return self._densityCache[key][1]
+        xvalues, yvalues = self._get_xy_values(
+            radar, field_horizontal, field_vertical, sweeps, gatefilter)
+        result = correlation_stats.density(
+            xvalues, yvalues, self.parameters['bins'], xscale, yscale)
+        # keep data referenced so its id is not reused
+        self._densityCache[key] = ((xdata, ydata), result)
+        while len(self._densityCache) > self.maxDensityCache:
+            self._densityCache.popitem(last=False)
+        return result
+
     @staticmethod
     def plot_regression(radar, field_horizontal, field_vertical,
                         sweeps, gatefilter, ax, vmin, vmax, xscale="linear",
@@ -561,7 +634,14 @@ class Correlation(Component):
 
         m, b, r, _, _ = scipy.stats.linregress(xvalues[~xvalues.mask],
                                                yvalues[~xvalues.mask])
+        Correlation.plot_fit(m, b, r, ax, vmin, vmax, xscale, yscale,
+                             **kwargs)
+        return (m,b)
 
+    @staticmethod
+    def plot_fit(m, b, r, ax, vmin, vmax, xscale="linear", yscale="linear",
+                 **kwargs):
+        '''Plot regression line y = m x + b (in scaled values).'''
         if xscale=="log":
             x = np.linspace(max(vmin,0.0001),vmax,50)
             y = m * np.log10(x) + b
@@ -576,11 +656,128 @@ class Correlation(Component):
                        label='y = %f x + %f\n'%(m,b) +
                              'r value = %f'%(r), **kwargs)
         ax.legend()
-        return (m,b)
+
+    def accumulateFiles(self):
+        '''
+        Compute the statistics of the current fields and sweeps over the
+        files of Vfilelist, one worker job per file.
+        '''
+        files = self.Vfilelist.value
+        if not files:
+            common.ShowWarning("File list is empty, nothing to accumulate")
+            return
+        field_horizontal = self.VfieldHorizontal.value
+        field_vertical = self.VfieldVertical.value
+        xscale = str(self.horizontal_scale_menu_group.checkedAction().text())
+        yscale = str(self.vertical_scale_menu_group.checkedAction().text())
+        sweeps = self._sweeps()
+
+        # all files must share the bins, use the limits if set or the
+        # range of the current radar
+        limits = [self.parameters[key] for key in
+                  ("xmin", "xmax", "ymin", "ymax")]
+        if None in limits:
+            radar = self.Vradar.value
+            if (radar is None or field_horizontal not in radar.fields or
+                    field_vertical not in radar.fields):
+                common.ShowWarning(
+                    "Set the X and Y limits or open a radar with both "
+                    "fields to define the bins.")
+                return
+            counts, xedges, yedges = self._density(
+                radar, field_horizontal, field_vertical, sweeps, None,
+                xscale, yscale)
+        if None not in limits[:2]:
+            xedges = correlation_stats.bin_edges(
+                limits[0], limits[1], self.parameters['bins'], xscale)
+        if None not in limits[2:]:
+            yedges = correlation_stats.bin_edges(
+                limits[2], limits[3], self.parameters['bins'], yscale)
+
+        self._accumulation += 1
+        total = correlation_stats.CorrelationStats(xedges, yedges,
+                                                   xscale, yscale)
+        state = {'total': total, 'done': 0, 'failed': [],
+                 'generation': self._accumulation, 'files': list(files),
+                 'fields': (field_horizontal, field_vertical)}
+        runner = get_job_runner()
+        for filename in files:
+            runner.submit(
+                "%s: %s" % (self.name, os.path.basename(filename)),
+                correlation_stats.file_statistics,
+                args=(filename, field_horizontal, field_vertical, sweeps,
+                      xedges, yedges, xscale, yscale),
+                callback=lambda stats, f=filename: self._accumulate(
+                    state, f, stats),
+                errback=lambda error, f=filename: self._accumulate(
+                    state, f, None, error))
+        self.statusbar.showMessage(
+            "Accumulating %i files ..." % len(files))
+
+    def _accumulate(self, state, filename, stats, error=None):
+        '''Job callback, merge statistics of a file.'''
+        if state['generation'] != self._accumulation:
+            return
+        state['done'] += 1
+        if stats is None:
+            state['failed'].append(filename)
+            print("accumulation of %s fails\n%s" % (filename, error),
+                  file=log.error)
+        else:
+            state['total'].merge(stats)
+        self.statusbar.showMessage("Accumulated %i of %i files" %
+                                   (state['done'], len(state['files'])))
+        if state['done'] < len(state['files']):
+            return
+        self._accumulated = state
+        self.accumulatedToggle.setEnabled(True)
+        self.accumulatedToggle.setChecked(True)
+        self._update_plot()
+        if state['failed']:
+            common.ShowLongText(
+                "Accumulation failed for %i files:\n\n" %
+                len(state['failed']) + "\n".join(state['failed']))
+
+    def _plot_accumulated(self):
+        '''Plot density and regression line of accumulated statistics.'''
+        total = self._accumulated['total']
+        field_horizontal, field_vertical = self._accumulated['fields']
+        self.plot_density(
+            total.counts, total.xedges, total.yedges, self.ax,
+            "%s (%i files, %i gates)" % (self.title, total.files, total.n),
+            self.parameters["cmap"], self.parameters["density_norm"])
+        self.ax.set_xscale(total.xscale)
+        self.ax.set_yscale(total.yscale)
+        self.ax.set_xlabel(field_horizontal)
+        self.ax.set_ylabel(field_vertical)
+        self.ax.set_xlim(self.parameters["xmin"], self.parameters["xmax"])
+        self.ax.set_ylim(self.parameters["ymin"], self.parameters["ymax"])
+        m, b, r = total.regression()
+        if self.regressionLineToggle.isChecked() and np.isfinite(m):
+            vmin, vmax = self.ax.get_xlim()
+            self.plot_fit(m, b, r, self.ax, vmin + 0.05 * (vmax-vmin),
+                          vmax - 0.05 * (vmax-vmin), total.xscale,
+                          total.yscale, color=self.parameters["color"])
+
+    def _sweeps(self):
+        '''Return list of checked sweeps or None for all.'''
+        if (not getattr(self, 'sweep_actions', None) or
+                self.sweep_actions[0].isChecked()):
+            return None
+        return [sweep for sweep, action in enumerate(self.sweep_actions[1:])
+                if action.isChecked()]
 
     def _update_plot(self):
         '''Draw/Redraw the plot.'''
 
+        if (self.accumulatedToggle.isChecked() and
+                self._accumulated is not None):
+            self.ax.cla()
+            self.VplotAxes.update()
+            self._plot_accumulated()
+            self.canvas.draw()
+            return
+
         if self.Vradar.value is None:
             return
 
@@ -608,26 +805,27 @@ class Correlation(Component):
         else:
             gatefilter = None
 
-        if self.sweep_actions[0].isChecked():
-            sweeps = None
+        sweeps = self._sweeps()
+
+        xscale = str(self.horizontal_scale_menu_group.checkedAction().text())
+        yscale = str(self.vertical_scale_menu_group.checkedAction().text())
+        if self.densityToggle.isChecked():
+            counts, xedges, yedges = self._density(
+                self.Vradar.value, self.VfieldHorizontal.value,
+                self.VfieldVertical.value, sweeps, gatefilter, xscale, yscale)
+            self.plot_density(counts, xedges, yedges, self.ax, self.title,
+                              self.parameters["cmap"],
+                              self.parameters["density_norm"])
         else:
-            sweeps = []
-            for sweep, action in enumerate(self.sweep_actions[1:]):
-                if action.isChecked():
-                    sweeps.append(sweep)
-
-        self.plot_correlation(
-            self.Vradar.value, self.VfieldHorizontal.value,
-            self.VfieldVertical.value, sweeps, gatefilter, self.ax, self.title,
-            **{k: self.parameters[k] for k in
-               ('s','facecolors', 'edgecolors', 'marker')}
-            )
-
-
-        self.ax.set_xscale(
-            str(self.horizontal_scale_menu_group.checkedAction().text()))
-        self.ax.set_yscale(
-            str(self.vertical_scale_menu_group.checkedAction().text()))
+            self.plot_correlation(
+                self.Vradar.value, self.VfieldHorizontal.value,
+                self.VfieldVertical.value, sweeps, gatefilter, self.ax,
+                self.title, **{k: self.parameters[k] for k in
+                               ('s','facecolors', 'edgecolors', 'marker')}
+                )
+
+        self.ax.set_xscale(xscale)
+        self.ax.set_yscale(yscale)
 
         self.ax.set_xlabel(self.unitsHorizontal)
         self.ax.set_ylabel(self.unitsVertical)
@@ -16,7 +16,7 @@ from matplotlib.lines import Line2D
 import csv
 
 from ..core import (Variable, Component, common, VariableChoose,
-                    componentsList, QtWidgets, QtCore)
+                    componentsList, QtWidgets, QtCore, submit_save)
 from ..core.points import Points, write_points_csv, read_points_csv
 
 
@@ -401,8 +401,7 @@ class DisplaySelectRegion(Component):
                     radar.fields[field]['data'].mask = np.logical_or(
                         self.Vgatefilter.value._gate_excluded,
                         radar.fields[field]['data'].mask)
-            pyart.io.write_cfradial(filename, radar)
-            print("Saved %s" % (filename))
+            submit_save(filename, radar)
 
     ######################
     #   Filter Methods   #
@@ -9,10 +9,10 @@ import pyart
 
 import os
 import sys
-import glob
 
 from ..core import (Variable, Component, common, QtWidgets, QtCore,
-                    componentsList, log)
+                    componentsList, log, submit_save, delta, reopen_cache,
+                    sidecar, session, file_metadata, file_list)
 
 
 class Menu(Component):
@@ -21,9 +21,11 @@ class Menu(Component):
     Vradar = None  #: see :ref:`shared_variable`
     Vgrid = None  #: see :ref:`shared_variable`
     Vfilelist = None  #: see :ref:`shared_variable`
+    Vgatefilter = None  #: see :ref:`shared_variable`
 
     def __init__(self, pathDir=None, filename=None, Vradar=None, Vgrid=None,
-                 Vfilelist=None, mode=["Radar"], name="Menu", parent=None):
+                 Vfilelist=None, Vgatefilter=None, mode=["Radar"],
+                 name="Menu", parent=None):
         '''
         Initialize the class to create the interface.
 
@@ -41,6 +43,10 @@ class Menu(Component):
         Vgrid : :py:class:`~artview.core.core.Variable` instance
             Grid signal variable.
             A value of None initializes an empty Variable.
+        Vgatefilter : :py:class:`~artview.core.core.Variable` instance
+            GateFilter signal variable, set from the sidecar file of an
+            opened radar file.
+            A value of None initializes an empty Variable.
         mode : list
             List with strings "Radar" or "Grid". Determine which type of files
             will be open
@@ -75,9 +81,11 @@ class Menu(Component):
         self.current_container = self.Vradar
         self.Vgrid = Vgrid
         self.Vfilelist = Vfilelist
+        self.Vgatefilter = Vgatefilter
         self.sharedVariables = {"Vradar": None,
                                 "Vgrid": None,
-                                "Vfilelist": None}
+                                "Vfilelist": None,
+                                "Vgatefilter": None}
 
         # Show an "Open" dialog box and return the path to the selected file
         # Just do that if Vradar was not given
@@ -87,6 +95,8 @@ class Menu(Component):
             self.Vgrid = Variable(None)
         if self.Vfilelist is None:
             self.Vfilelist = Variable(None)
+        if self.Vgatefilter is None:
+            self.Vgatefilter = Variable(None)
         if Vradar is None and Vgrid is None and self.mode:
             if filename is None:
                 self.showFileDialog()
@@ -203,8 +213,18 @@ class Menu(Component):
         if filename == '' or self.Vradar.value is None:
             return
         else:
-            pyart.io.write_cfradial(filename, self.Vradar.value)
-            print("Saved %s" % (filename))
+            # written in background, editing may go on
+            submit_save(filename, self.Vradar.value)
+
+    def saveDelta(self):
+        '''Save only the edited fields of radar beside its file.'''
+        radar = self.Vradar.value
+        if radar is None or getattr(radar, 'filename', None) is None:
+            common.ShowWarning("Radar was not read from a file")
+            return
+        # written in background, editing may go on
+        if delta.submit_delta_save(radar) is None:
+            common.ShowWarning("No field was edited since reading")
 
     def saveGrid(self):
         '''Open a dialog box to save grid file.'''
@@ -217,7 +237,40 @@ class Menu(Component):
         if filename == '' or self.Vgrid.value is None:
             return
         else:
-            pyart.io.write_grid(filename, self.Vgrid.value)
+            submit_save(filename, self.Vgrid.value)
+
+    def saveSession(self):
+        '''Open a dialog box to save the session of all components.'''
+        filename = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Save Session', self.dirIn, 'Session (*.json)')
+        if isinstance(filename, tuple): # PyQt5
+            filename = filename[0]
+        filename = str(filename)
+        if filename == '':
+            return
+        session.save_session(filename)
+
+    def restoreSession(self):
+        '''Open a dialog box to restore a saved session.'''
+        filename = QtWidgets.QFileDialog.getOpenFileName(
+            self, 'Restore Session', self.dirIn, 'Session (*.json)')
+        if isinstance(filename, tuple): # PyQt5
+            filename = filename[0]
+        filename = str(filename)
+        if filename == '':
+            return
+        try:
+            session.restore_session(filename)
+        except Exception as error:
+            common.ShowWarning("Could not restore session: %s" % error)
+
+    def saveOptions(self):
+        '''Open dialog of field compression and packing for saving.'''
+        fields = set()
+        for container in (self.Vradar.value, self.Vgrid.value):
+            if container is not None:
+                fields.update(container.fields.keys())
+        common.save_options_dialog(sorted(fields))
 
     def addLayoutWidget(self, widget):
         '''
@@ -313,11 +366,32 @@ class Menu(Component):
             saveRadar.setStatusTip('Save Radar to Cf/Radial NetCDF')
             saveRadar.triggered.connect(self.saveRadar)
             self.filemenu.addAction(saveRadar)
+            saveDelta = QtWidgets.QAction('Save Edits', self)
+            saveDelta.setStatusTip(
+                'Save edited fields only, merged when the file is opened')
+            saveDelta.triggered.connect(self.saveDelta)
+            self.filemenu.addAction(saveDelta)
         if "grid" in self.mode:
             saveGrid = QtWidgets.QAction('Save Grid', self)
             saveGrid.setStatusTip('Save Grid NetCDF')
             saveGrid.triggered.connect(self.saveGrid)
             self.filemenu.addAction(saveGrid)
+        if "radar" in self.mode or "grid" in self.mode:
+            saveOptions = QtWidgets.QAction('Save Options', self)
+            saveOptions.setStatusTip(
+                'Compression and packing of fields when saving')
+            saveOptions.triggered.connect(self.saveOptions)
+            self.filemenu.addAction(saveOptions)
+
+        # Create session actions
+        saveSession = QtWidgets.QAction('Save Session', self)
+        saveSession.setStatusTip('Save components, links and variables')
+        saveSession.triggered.connect(self.saveSession)
+        self.filemenu.addAction(saveSession)
+        restoreSession = QtWidgets.QAction('Restore Session', self)
+        restoreSession.setStatusTip('Restore a saved session')
+        restoreSession.triggered.connect(self.restoreSession)
+        self.filemenu.addAction(restoreSession)
 
         # Create About ARTView action
         aboutApp = QtWidgets.QAction('ARTView...', self)
@@ -488,90 +562,16 @@ class Menu(Component):
     # XXX Remove once FileDetails is made live
     def _get_RadarShortInfo(self):
         '''Print out some basic info about the radar.'''
-        # For any missing data
-        infoNA = "Info not available"
-
-        try:
-            rname = self.Vradar.value.metadata['instrument_name']
-        except:
-            rname = infoNA
-        try:
-            rlon = str(self.Vradar.value.longitude['data'][0])
-        except:
-            rlon = infoNA
-        try:
-            rlat = str(self.Vradar.value.latitude['data'][0])
-        except:
-            rlat = infoNA
-        try:
-            ralt = str(self.Vradar.value.altitude['data'][0])
-            raltu = self.Vradar.value.altitude['units'][0]
-        except:
-            ralt = infoNA
-            raltu = " "
-        try:
-            maxr = str(self.Vradar.value.instrument_parameters[
-                'unambiguous_range']['data'][0])
-            maxru = self.Vradar.value.instrument_parameters[
-                'unambiguous_range']['units'][0]
-        except:
-            maxr = infoNA
-            maxru = " "
-        try:
-            nyq = str(self.Vradar.value.instrument_parameters[
-                'nyquist_velocity']['data'][0])
-            nyqu = self.Vradar.value.instrument_parameters[
-                'nyquist_velocity']['units'][0]
-        except:
-            nyq = infoNA
-            nyqu = " "
-        try:
-            bwh = str(self.Vradar.value.instrument_parameters[
-                'radar_beam_width_h']['data'][0])
-            bwhu = self.Vradar.value.instrument_parameters[
-                'radar_beam_width_h']['units'][0]
-        except:
-            bwh = infoNA
-            bwhu = " "
-        try:
-            bwv = str(self.Vradar.value.instrument_parameters[
-                'radar_beam_width_v']['data'][0])
-            bwvu = self.Vradar.value.instrument_parameters[
-                'radar_beam_width_v']['units'][0]
-        except:
-            bwv = infoNA
-            bwvu = " "
-        try:
-            pw = str(self.Vradar.value.instrument_parameters[
-                'pulse_width']['data'][0])
-            pwu = self.Vradar.value.instrument_parameters[
-                'pulse_width']['units'][0]
-        except:
-            pw = infoNA
-            pwu = " "
-        try:
-            ngates = str(self.Vradar.value.ngates)
-        except:
-            ngates = infoNA
-        try:
-            nsweeps = str(self.Vradar.value.nsweeps)
-        except:
-            nsweeps = infoNA
-
-        txOut = (('Radar Name: %s\n' % rname) +
-                 ('Radar longitude: %s\n' % rlon) +
-                 ('Radar latitude: %s\n' % rlat) +
-                 ('Radar altitude: %s %s\n' % (ralt, raltu)) +
-                 ('    \n') +
-                 ('Unambiguous range: %s %s\n' % (maxr, maxru)) +
-                 ('Nyquist velocity: %s %s\n' % (nyq, nyqu)) +
-                 ('    \n') +
-                 ('Radar Beamwidth, horiz: %s %s\n' % (bwh, bwhu)) +
-                 ('Radar Beamwidth, vert: %s %s\n' % (bwv, bwvu)) +
-                 ('Pulsewidth: %s %s \n' % (pw, pwu)) +
-                 ('    \n') +
-                 ('Number of gates: %s\n' % ngates) +
-                 ('Number of sweeps: %s\n' % nsweeps))
+        # the open radar, else the headers of the file
+        if self.Vradar.value is not None:
+            meta = file_metadata.radar_metadata(self.Vradar.value)
+        else:
+            try:
+                meta = file_metadata.read_metadata(self.filename)
+            except Exception:
+                common.ShowWarning("No radar information available")
+                return
+        txOut = file_metadata.short_info(meta)
 
         QtWidgets.QMessageBox.information(self, "Short Radar Info", txOut)
 
@@ -632,9 +632,7 @@ class Menu(Component):
         self.dirIn = os.path.dirname(self.filename)
 
         # Get a list of files (and only files) in the working directory
-        filelist = [path for path in glob.glob(os.path.join(self.dirIn, '*'))
-                    if os.path.isfile(path)]
-        filelist.sort()
+        filelist = file_list.list_files(self.dirIn)
         self.Vfilelist.change(filelist)
 
         if self.filename in self.Vfilelist.value:
@@ -648,19 +646,24 @@ class Menu(Component):
         grid_warning = False
         if "radar" in self.mode:
             try:
-                radar = pyart.io.read(self.filename, delay_field_loading=True)
+                radar = reopen_cache.read(self.filename,
+                                          delay_field_loading=True)
                 # Add the filename for Display
                 radar.filename = self.filename
+                delta.load_delta(radar)
                 self.Vradar.change(radar)
                 self.current_container = self.Vradar
+                self._loadSidecar(radar)
                 return
             except:
                 try:
                     radar = pyart.io.read(self.filename)
                     # Add the filename for Display
                     radar.filename = self.filename
+                    delta.load_delta(radar)
                     self.Vradar.change(radar)
                     self.current_container = self.Vradar
+                    self._loadSidecar(radar)
                     return
                 except:
                     import traceback
@@ -670,12 +673,14 @@ class Menu(Component):
             try:
                 grid = pyart.io.read_grid(
                     self.filename, delay_field_loading=True)
+                grid.filename = self.filename
                 self.Vgrid.change(grid)
                 self.current_container = self.Vgrid
                 return
             except:
                 try:
                     grid = pyart.io.read_grid(self.filename)
+                    grid.filename = self.filename
                     self.Vgrid.change(grid)
                     self.current_container = self.Vgrid
                     return
@@ -691,3 +696,10 @@ class Menu(Component):
             msg = "Could not open file, invalid mode!"
             common.ShowWarning(msg)
         return
+
+    def _loadSidecar(self, radar):
+        '''Restore Vgatefilter from the sidecar file of radar, if any.'''
+        def restore(gatefilter):
+            if radar is self.Vradar.value:
+                self.Vgatefilter.change(gatefilter)
+        sidecar.submit_load_gatefilter(radar, restore)
@@ -10,13 +10,14 @@ the GNU Lesser General Public License.
 from __future__ import print_function
 # Load the needed packages
 from functools import partial
-import os, glob
+import os
 import numpy as np
 import pyart
 import time
 
 from ..core import (Component, Variable, common, QtWidgets, QtCore, QtGui,
-                    log)
+                    log, submit_save, delta, reopen_cache, sidecar,
+                    session, file_metadata, file_list)
 
 class FileNavigator(Component):
     '''
@@ -26,6 +27,7 @@ class FileNavigator(Component):
     Vradar = None  #: see :ref:`shared_variable`
     Vgrid = None  #: see :ref:`shared_variable`
     Vfilelist = None  #: see :ref:`shared_variable`
+    Vgatefilter = None  #: see :ref:`shared_variable`
 
     @classmethod
     def guiStart(self, parent=None):
@@ -36,7 +38,8 @@ class FileNavigator(Component):
         return self(**kwargs), independent
 
     def __init__(self, pathDir=None, filename=None, Vradar=None, Vgrid=None,
-                 Vfilelist=None, name="FileNavigator", parent=None):
+                 Vfilelist=None, Vgatefilter=None, name="FileNavigator",
+                 parent=None):
         '''Initialize the class to create the interface.
 
         Parameters
@@ -53,6 +56,10 @@ class FileNavigator(Component):
         Vgrid : :py:class:`~artview.core.core.Variable` instance
             Grid signal variable.
             A value of None initializes an empty Variable.
+        Vgatefilter : :py:class:`~artview.core.core.Variable` instance
+            GateFilter signal variable, set from the sidecar file of an
+            opened radar file.
+            A value of None initializes an empty Variable.
         mode : list
             List with strings "Radar" or "Grid". Determine which type of files
             will be open
@@ -86,10 +93,15 @@ class FileNavigator(Component):
             self.Vfilelist = Variable([])
         else:
             self.Vfilelist = Vfilelist
+        if Vgatefilter is None:
+            self.Vgatefilter = Variable(None)
+        else:
+            self.Vgatefilter = Vgatefilter
 
         self.sharedVariables = {"Vradar": self.NewFile,
                                 "Vgrid": self.NewFile,
-                                "Vfilelist": self.NewFilelist}
+                                "Vfilelist": self.NewFilelist,
+                                "Vgatefilter": None}
         # Connect the components
         self.connectAllVariables()
 
@@ -97,6 +109,14 @@ class FileNavigator(Component):
         self.createUI()
 
         self.filename = ''
+        # follow mode, see startFollow
+        self.followParameters = {'stable_time': 2000, 'max_files': 500}
+        self.watcher = None
+        self._pending = {}
+        self._known = set()
+        self.stableTimer = QtCore.QTimer(self)
+        self.stableTimer.timeout.connect(self._checkPending)
+
         if Vradar is None and Vgrid is None:
             if filename is None:
                 self._openfile(filename)
@@ -176,6 +196,17 @@ class FileNavigator(Component):
                                triggered=lambda: self._openfile())
         self.openMenu.addAction(action)
 
+        self.followAction = QtWidgets.QAction("Follow Directory", self,
+                                          checkable=True)
+        self.followAction.setStatusTip(
+            'Show new files of the directory as they arrive')
+        self.followAction.toggled.connect(self._followToggled)
+        self.openMenu.addAction(self.followAction)
+        self.openMenu.addAction(QtWidgets.QAction(
+            "Follow Options", self, triggered=self.followOptions))
+        self.openMenu.addAction(QtWidgets.QAction(
+            "Restore Session", self, triggered=self.restoreSession))
+
         self.saveMenu = QtWidgets.QMenu()
         self.saveButton.setMenu(self.saveMenu)
 
@@ -185,12 +216,23 @@ class FileNavigator(Component):
             self.saveRadarAction.setEnabled(False)
         self.saveMenu.addAction(self.saveRadarAction)
 
+        self.saveDeltaAction = QtWidgets.QAction("Save Edits", self,
+                                             triggered=self.saveDelta)
+        if self.Vradar.value is None:
+            self.saveDeltaAction.setEnabled(False)
+        self.saveMenu.addAction(self.saveDeltaAction)
+
         self.saveGridAction = QtWidgets.QAction("Save Grid", self,
                                             triggered=self.saveGrid)
         if self.Vgrid.value is None:
             self.saveGridAction.setEnabled(False)
         self.saveMenu.addAction(self.saveGridAction)
 
+        self.saveMenu.addAction(QtWidgets.QAction(
+            "Save Options", self, triggered=self.saveOptions))
+        self.saveMenu.addAction(QtWidgets.QAction(
+            "Save Session", self, triggered=self.saveSession))
+
         action = QtWidgets.QAction("Help", self,
                                triggered=self._show_help)
         self.openMenu.addAction(action)
@@ -227,7 +269,7 @@ class FileNavigator(Component):
             self.act_prev.setEnabled(True)
             self.act_prev.setToolTip(
                 'Previous file: %s' %
-                os.path.basename(filelist[self.fileindex - 1]))
+                self._fileTip(filelist[self.fileindex - 1]))
         else:
             self.act_prev.setEnabled(False)
             self.act_prev.setToolTip('Previous file:')
@@ -236,7 +278,7 @@ class FileNavigator(Component):
             self.act_next.setEnabled(True)
             self.act_next.setToolTip(
                 'Next file: %s' %
-                os.path.basename(filelist[self.fileindex + 1]))
+                self._fileTip(filelist[self.fileindex + 1]))
         else:
             self.act_next.setEnabled(False)
             self.act_next.setToolTip('Next file:')
@@ -244,13 +286,11 @@ class FileNavigator(Component):
         if filelist:
             self.act_first.setEnabled(True)
             self.act_first.setToolTip(
-                "First file: %s" %
-                os.path.basename(filelist[0]))
+                "First file: %s" % self._fileTip(filelist[0]))
 
             self.act_last.setEnabled(True)
             self.act_last.setToolTip(
-                "Last file: %s" %
-                os.path.basename(filelist[-1]))
+                "Last file: %s" % self._fileTip(filelist[-1]))
         else:
             self.act_first.setEnabled(False)
             self.act_first.setToolTip("First file:")
@@ -258,6 +298,10 @@ class FileNavigator(Component):
             self.act_last.setEnabled(False)
             self.act_last.setToolTip("Last file:")
 
+    def _fileTip(self, filename):
+        '''Tooltip of file: name and header metadata.'''
+        return file_metadata.tooltip(filename)
+
     #########################
     #   Selection Methods   #
     #########################
@@ -313,17 +357,21 @@ class FileNavigator(Component):
         grid_warning = False
 
         try:
-            radar = pyart.io.read(filename, delay_field_loading=True)
+            radar = reopen_cache.read(filename, delay_field_loading=True)
             # Add the filename for Display
             radar.filename = filename
+            delta.load_delta(radar)
             self.replaceRadar(radar)
+            self._loadSidecar(radar)
             return
         except:
             try:
                 radar = pyart.io.read(filename)
                 # Add the filename for Display
                 radar.filename = filename
+                delta.load_delta(radar)
                 self.replaceRadar(radar)
+                self._loadSidecar(radar)
                 return
             except:
                 import traceback
@@ -333,11 +381,13 @@ class FileNavigator(Component):
         try:
             grid = pyart.io.read_grid(
                 filename, delay_field_loading=True)
+            grid.filename = filename
             self.replaceGrid(grid)
             return
         except:
             try:
                 grid = pyart.io.read_grid(filename)
+                grid.filename = filename
                 self.replaceGrid(grid)
                 return
             except:
@@ -353,6 +403,131 @@ class FileNavigator(Component):
             common.ShowWarning(msg)
         return
 
+    def _loadSidecar(self, radar):
+        '''Restore Vgatefilter from the sidecar file of radar, if any.'''
+        if radar is not self.Vradar.value:
+            return  # replacing was cancelled
+
+        def restore(gatefilter):
+            if radar is self.Vradar.value:
+                self.Vgatefilter.change(gatefilter)
+        sidecar.submit_load_gatefilter(radar, restore)
+
+    #########################
+    #   Follow Methods      #
+    #########################
+
+    def _followToggled(self, checked):
+        '''Only reaction to followAction, start or stop following.'''
+        if checked:
+            self.startFollow()
+        else:
+            self.stopFollow()
+
+    def _setFollowChecked(self, checked):
+        '''Check followAction without emitting toggled.'''
+        # blockSignals as QSignalBlocker is not in PyQt4
+        blocked = self.followAction.blockSignals(True)
+        self.followAction.setChecked(checked)
+        self.followAction.blockSignals(blocked)
+
+    def followOptions(self):
+        '''Open dialog of follow mode parameters.'''
+        self.followParameters = common.get_options(
+            (('stable_time', int, 'stable size time (ms)'),
+             ('max_files', int, 'files kept in list')),
+            self.followParameters)
+        self.stableTimer.setInterval(self.followParameters['stable_time'])
+
+    def startFollow(self, dirIn=None):
+        '''
+        Follow directory dirIn (default current): new files are added to
+        Vfilelist when their size is stable for stable_time ms, read in a
+        worker (filling the :py:mod:`~artview.core.reopen_cache`) and shown
+        when they are the last of the list. Vfilelist keeps the last
+        max_files files. Files that stay empty are skipped until the
+        directory changes again.
+        '''
+        if dirIn is None:
+            dirIn = str(self.directoryAction.text())
+        if self.watcher is not None:
+            self.stopFollow()
+        self.followDir = dirIn
+        self._known = set(os.listdir(dirIn))
+        self.watcher = QtCore.QFileSystemWatcher([dirIn], self)
+        self.watcher.directoryChanged.connect(self._directoryChanged)
+        self.stableTimer.setInterval(self.followParameters['stable_time'])
+        self._setFollowChecked(True)
+        print("Following " + dirIn, file=log.info)
+
+    def stopFollow(self):
+        '''Stop following directory.'''
+        if self.watcher is not None:
+            self.watcher.directoryChanged.disconnect(self._directoryChanged)
+            self.watcher.deleteLater()
+            self.watcher = None
+        self.stableTimer.stop()
+        self._pending = {}
+        self._setFollowChecked(False)
+
+    def _directoryChanged(self, dirIn):
+        '''Queue the new files of dirIn for size stability check.'''
+        names = set(os.listdir(dirIn))
+        for name in names - self._known:
+            path = os.path.join(dirIn, name)
+            if file_list.is_data_file(path):
+                self._pending[path] = None
+        # only present names, so it does not grow over a long session
+        self._known = names
+        if self._pending and not self.stableTimer.isActive():
+            self.stableTimer.start()
+
+    def _checkPending(self):
+        '''Accept pending files whose size did not change since last.'''
+        for path, size in list(self._pending.items()):
+            try:
+                new_size = os.path.getsize(path)
+            except OSError:  # removed
+                del self._pending[path]
+                continue
+            if new_size == size:
+                del self._pending[path]
+                if size > 0:
+                    self._addFollowedFile(path)
+                else:
+                    # checked again at next directory change
+                    self._known.discard(os.path.basename(path))
+            else:
+                self._pending[path] = new_size
+        if not self._pending:
+            self.stableTimer.stop()
+
+    def _addFollowedFile(self, path):
+        '''Append path to Vfilelist and read it in background.'''
+        filelist = list(self.Vfilelist.value or [])
+        if path not in filelist:
+            filelist.append(path)
+            filelist.sort()
+            del filelist[:-self.followParameters['max_files']]
+            self.Vfilelist.change(filelist)
+        reopen_cache.submit_build(
+            path, callback=partial(self._followedFileReady, path),
+            errback=partial(self._followedFileReady, path))
+
+    def _followedFileReady(self, path, result=None):
+        '''Show path if still following and it is the last file.'''
+        if self.watcher is None:
+            return
+        filelist = self.Vfilelist.value or []
+        if not filelist or filelist[-1] != path:
+            return
+        container = self.Vradar.value
+        if getattr(container, 'changed', False):
+            print("Not showing %s, current radar has unsaved changes" %
+                  path, file=log.info)
+            return
+        self._openfile(path)
+
     def NewFilelist(self, variable, strong):
         '''respond to change in filelist.'''
         if strong:
@@ -368,9 +543,7 @@ class FileNavigator(Component):
             self.fileAction.setText(os.path.basename(self.filename))
             if (self.Vfilelist.value is None or
                 self.filename not in self.Vfilelist.value):
-                filelist = [path for path in glob.glob(os.path.join(dirIn, '*'))
-                            if os.path.isfile(path)]
-                filelist.sort()
+                filelist = file_list.list_files(dirIn)
                 self.fileindex = filelist.index(self.filename)
                 self.Vfilelist.change(filelist)
             else:
@@ -378,6 +551,7 @@ class FileNavigator(Component):
                 self._update_tools()
         if variable == self.Vradar:
             self.saveRadarAction.setEnabled(variable.value is not None)
+            self.saveDeltaAction.setEnabled(variable.value is not None)
         else:
             self.saveGridAction.setEnabled(variable.value is not None)
 
@@ -421,8 +595,18 @@ class FileNavigator(Component):
         if filename == '' or self.Vradar.value is None:
             return
         else:
-            pyart.io.write_cfradial(filename, self.Vradar.value)
-            print("Saved %s" % (filename), file=log.info)
+            # written in background, editing may go on
+            submit_save(filename, self.Vradar.value)
+
+    def saveDelta(self):
+        '''Save only the edited fields of radar beside its file.'''
+        radar = self.Vradar.value
+        if radar is None or getattr(radar, 'filename', None) is None:
+            common.ShowWarning("Radar was not read from a file")
+            return
+        # written in background, editing may go on
+        if delta.submit_delta_save(radar) is None:
+            common.ShowWarning("No field was edited since reading")
 
     def saveGrid(self):
         '''Open a dialog box to save grid file.'''
@@ -435,7 +619,40 @@ class FileNavigator(Component):
         if filename == '' or self.Vgrid.value is None:
             return
         else:
-            pyart.io.write_grid(filename, self.Vgrid.value)
+            submit_save(filename, self.Vgrid.value)
+
+    def saveSession(self):
+        '''Open a dialog box to save the session of all components.'''
+        filename = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Save Session', str(self.directoryAction.text()), 'Session (*.json)')
+        if isinstance(filename, tuple): # PyQt5
+            filename = filename[0]
+        filename = str(filename)
+        if filename == '':
+            return
+        session.save_session(filename)
+
+    def restoreSession(self):
+        '''Open a dialog box to restore a saved session.'''
+        filename = QtWidgets.QFileDialog.getOpenFileName(
+            self, 'Restore Session', str(self.directoryAction.text()), 'Session (*.json)')
+        if isinstance(filename, tuple): # PyQt5
+            filename = filename[0]
+        filename = str(filename)
+        if filename == '':
+            return
+        try:
+            session.restore_session(filename)
+        except Exception as error:
+            common.ShowWarning("Could not restore session: %s" % error)
+
+    def saveOptions(self):
+        '''Open dialog of field compression and packing for saving.'''
+        fields = set()
+        for container in (self.Vradar.value, self.Vgrid.value):
+            if container is not None:
+                fields.update(container.fields.keys())
+        common.save_options_dialog(sorted(fields))
 
 
 _plugins = [FileNavigator]
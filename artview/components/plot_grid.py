@@ -244,6 +244,7 @@ class GridDisplay(Component):
         self.layout.addWidget(self.dispButton, 0, 2)
         self.layout.addWidget(self.toolsButton, 0, 3)
         self.layout.addWidget(self.infolabel, 0, 4)
+        self.layout.addWidget(self.previewLabel, 0, 5)
 
     #############################
     # Functionality methods #
@@ -464,6 +465,14 @@ class GridDisplay(Component):
                                       "Level: ", self)
         self.infolabel.setStyleSheet('color: red; font: italic 10px')
         self.infolabel.setToolTip("Filename not loaded")
+        # badge of reduced resolution grids (progressive mapping)
+        self.previewLabel = QtWidgets.QLabel("preview", self)
+        self.previewLabel.setStyleSheet(
+            'color: white; background-color: orange; font: bold 10px; '
+            'padding: 2px')
+        self.previewLabel.setToolTip(
+            "Reduced resolution grid, to be replaced when mapping finishes")
+        self.previewLabel.hide()
 
     def _update_infolabel(self):
         if self.Vgrid.value is None:
@@ -493,6 +502,8 @@ class GridDisplay(Component):
         * Reset units and title
         * If strong update: update plot
         '''
+        self.previewLabel.setVisible(
+            getattr(self.Vgrid.value, 'preview', False))
         # test for None
         if self.Vgrid.value is None:
             self.fieldBox.clear()
@@ -754,7 +765,8 @@ class GridDisplay(Component):
 
         fields = {self.Vfield.value: field}
 
-        points = Points(fields, axes, grid.metadata.copy(), xy.shape[0])
+        points = Points(fields, axes, grid.metadata.copy(), xy.shape[0],
+                        source=grid)
 
         return points
 
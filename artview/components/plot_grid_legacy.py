@@ -686,7 +686,8 @@ class GridDisplay(Component):
 
         fields = {self.Vfield.value: field}
 
-        points = Points(fields, axes, grid.metadata.copy(), xy.shape[0])
+        points = Points(fields, axes, grid.metadata.copy(), xy.shape[0],
+                        source=grid)
 
         return points
 
@@ -21,6 +21,7 @@ from matplotlib.colorbar import ColorbarBase as mlabColorbarBase
 from matplotlib.pyplot import cm
 
 from ..core import Variable, Component, common, VariableChoose, QtWidgets, QtCore
+from ..core.statistics import StatisticsCache
 
 # Save image file type and DPI (resolution)
 IMAGE_EXT = 'png'
@@ -130,6 +131,7 @@ class PointsDisplay(Component):
         self.plot_type = None
         self.statistics = None
         self.table = None
+        self.statsCache = StatisticsCache()
         self.changePlotType(plot_type)
 
         self.show()
@@ -429,10 +431,13 @@ class PointsDisplay(Component):
             self.statusbar.clearMessage()
 
         if self.plot_type == "histogram" and len(points.fields[field]['data'])>0:
+            # histogram from cached base histogram, the data is only
+            # processed again if Vpoints or Vfield changes
+            stats = self.statsCache.get(points, field)
+            counts, edges = stats.histogram(
+                bins=25, range=(cmap['vmin'], cmap['vmax']))
             self.plot = self.ax.hist(
-                points.fields[field]['data'], bins=25,
-                range=(cmap['vmin'], cmap['vmax']),
-                figure=self.fig)
+                edges[:-1], bins=edges, weights=counts, figure=self.fig)
             self.ax.set_ylabel("Counts")
 
             # If limits exists, update the axes otherwise retrieve
@@ -462,8 +467,8 @@ class PointsDisplay(Component):
             else:
                 points = self.Vpoints.value
                 field = self.Vfield.value
-                SelectRegionstats = common._array_stats(
-                    points.fields[field]['data'])
+                SelectRegionstats = self.statsCache.get(
+                    points, field).as_dict()
                 text = ("<b>Basic statistics for the selected Region</b>"
                         "<br><br>")
                 for stat in SelectRegionstats:
@@ -24,6 +24,7 @@ from matplotlib.pyplot import cm
 from ..core import (Variable, Component, common, VariableChoose, QtCore,
                     QtGui, QtWidgets, log)
 from ..core.points import Points
+from ..core.journal import radar_version
 
 # Save image file type and DPI (resolution)
 IMAGE_EXT = 'png'
@@ -158,6 +159,16 @@ class RadarDisplay(Component):
         # Create tool dictionary
         self.tools = {}
 
+        # Region selection over all sweeps, see getPathInteriorValues
+        self.volumeSelection = False
+        self.volumeHeightRange = (None, None)
+        # radar instance (and its edit version) the current pyart display
+        # was created for
+        self._displayedRadar = None
+        self._displayedVersion = None
+        # GateFilter drawn instead of Vgatefilter, see setPreviewGatefilter
+        self.previewGatefilter = None
+
         # Create display image text dictionary
         self.disp_text = {}
 
@@ -306,6 +317,24 @@ class RadarDisplay(Component):
         self._check_file_type()
         self._update_display()
 
+    def _VolumeSelectionToggleAction(self):
+        '''Define action for VolumeSelectionToggle menu selection.'''
+        self.volumeSelection = self.volumeSelectionToggle.isChecked()
+        self.VpathInteriorFunc.update(True)
+
+    def _volumeHeightRange_input(self):
+        '''Retrieve height range for volume selection.'''
+        options_type = [
+            ('zmin', common.float_or_none, "Minimum height (km)"),
+            ('zmax', common.float_or_none, "Maximum height (km)"),
+            ]
+        values = {'zmin': self.volumeHeightRange[0],
+                  'zmax': self.volumeHeightRange[1]}
+        values = common.get_options(options_type, values)
+        self.volumeHeightRange = (values['zmin'], values['zmax'])
+        if self.volumeSelection:
+            self.VpathInteriorFunc.update(True)
+
     def _title_input(self):
         '''Retrieve new plot title.'''
         val, entry = common.string_dialog_with_reset(
@@ -388,6 +417,16 @@ class RadarDisplay(Component):
             triggered=self._UseMapToggleAction)
         dispmenu.addAction(self.useMapToggle)
         self.useMapToggle.setChecked(False)
+        self.volumeSelectionToggle = QtWidgets.QAction(
+            'Volume Selection', dispmenu, checkable=True,
+            triggered=self._VolumeSelectionToggleAction)
+        self.volumeSelectionToggle.setToolTip(
+            "Region selection takes all sweeps under the drawn polygon")
+        dispmenu.addAction(self.volumeSelectionToggle)
+        self.volumeSelectionToggle.setChecked(False)
+        dispHeightRange = dispmenu.addAction("Volume Selection Heights")
+        dispHeightRange.setToolTip(
+            "Set height range (km) used by Volume Selection")
         dispTitle = dispmenu.addAction("Change Title")
         dispTitle.setToolTip("Change plot title")
         dispUnit = dispmenu.addAction("Change Units")
@@ -413,6 +452,7 @@ class RadarDisplay(Component):
         dispTitle.triggered.connect(self._title_input)
         dispUnit.triggered.connect(self._units_input)
         changeAxesPosition.triggered.connect(self._change_axes_position)
+        dispHeightRange.triggered.connect(self._volumeHeightRange_input)
         self.dispImageText.triggered.connect(self._add_ImageText)
         dispQuickSave.triggered.connect(self._quick_savefile)
         dispSaveFile.triggered.connect(self._savefile)
@@ -506,6 +546,20 @@ class RadarDisplay(Component):
             self.tiltBox.clear()
             return
 
+        # in place edit of the displayed radar through its EditJournal (e.g.
+        # ManualEdit, notified as a weak change so other components skip
+        # costly work), geometry and display are unchanged, only fields need
+        # to be redrawn; other updates may have changed anything
+        version = radar_version(self.Vradar.value)
+        if (self.Vradar.value is self._displayedRadar and
+                version != self._displayedVersion):
+            self._displayedVersion = version
+            self.fieldnames = self.Vradar.value.fields.keys()
+            self._fillFieldBox()
+            self._update_plot()
+            self.VpathInteriorFunc.update(True)
+            return
+
         # Get the tilt angles
         self.rTilts = self.Vradar.value.sweep_number['data'][:]
         # Get field names
@@ -584,6 +638,17 @@ class RadarDisplay(Component):
         if strong:
             self._update_plot()
 
+    def setPreviewGatefilter(self, gatefilter):
+        '''
+        Draw gatefilter (e.g. a live preview) instead of Vgatefilter, which
+        is left unchanged; None draws Vgatefilter again. It is ignored once
+        the radar changes.
+        '''
+        if gatefilter is None and self.previewGatefilter is None:
+            return
+        self.previewGatefilter = gatefilter
+        self._update_plot()
+
     def NewTilt(self, variable, strong):
         '''
         Slot for 'ValueChanged' signal of
@@ -600,7 +665,8 @@ class RadarDisplay(Component):
             self.title = self._get_default_title()
             self._update_plot()
             self._update_infolabel()
-            self.VpathInteriorFunc.update(True)
+            if not self._isVolumeSelection():
+                self.VpathInteriorFunc.update(True)
 
     def NewDisplay(self, variable, strong):
         '''
@@ -723,6 +789,9 @@ class RadarDisplay(Component):
         Notes
         -----
             If Vradar.value is None, returns None
+
+            If volume selection is active (PPI only), bins of all sweeps
+            are returned, see :py:meth:`getPathInteriorVolumeValues`.
         '''
         from .toolbox import interior_radar
         radar = self.Vradar.value
@@ -735,6 +804,9 @@ class RadarDisplay(Component):
         except:
             paths = [paths]
 
+        if self._isVolumeSelection():
+            return self.getPathInteriorVolumeValues(paths)
+
         xy = np.empty((0, 2))
         idx = np.empty((0, 2), dtype=np.int)
 
@@ -794,6 +866,61 @@ class RadarDisplay(Component):
             xy = np.concatenate((xy, _xy))
             idx = np.concatenate((idx, _idx))
 
+        return self._make_points(radar, xy, idx)
+
+    def _isVolumeSelection(self):
+        '''Test if region selection should cover all sweeps.'''
+        return self.volumeSelection and self.plot_type == "radarPpi"
+
+    def getPathInteriorVolumeValues(self, paths):
+        '''
+        Return the bins values inside paths for all sweeps of the radar.
+
+        Gates are selected by their ground footprint (x, y), optionally
+        restricted to the height range in volumeHeightRange.
+
+        Parameters
+        ----------
+        paths : list of :py:class:`matplotlib.path.Path` instances
+
+        Returns
+        -------
+        points : :py:class`artview.core.points.Points`
+            Points object containing all bins of the current radar inside
+            path. Axes : 'x_disp', 'y_disp', 'z_disp', 'ray_index',
+            'range_index', 'azimuth', 'elevation', 'range'.
+            Fields: just current field
+
+        Notes
+        -----
+            If Vradar.value is None, returns None
+        '''
+        from .toolbox import interior_radar_volume
+        radar = self.Vradar.value
+        if radar is None:
+            return None
+
+        try:
+            iter(paths)
+        except:
+            paths = [paths]
+
+        xy, idx = interior_radar_volume(paths, radar, self.volumeHeightRange)
+        points = self._make_points(radar, xy, idx)
+
+        zaxis = {'data': radar.gate_z['data'][idx[:, 0], idx[:, 1]],
+                 'long_name': 'Z-coordinate in Cartesian system',
+                 'axis': 'Z',
+                 'units': 'm'}
+        ele = radar.elevation.copy()
+        ele['data'] = radar.elevation['data'][idx[:, 0]]
+        points.axes['z_disp'] = zaxis
+        points.axes['elevation'] = ele
+
+        return points
+
+    def _make_points(self, radar, xy, idx):
+        '''Create Points from x, y (km) and ray, range indexes.'''
         xaxis = {'data':  xy[:, 0] * 1000.,
                  'long_name': 'X-coordinate in Cartesian system',
                  'axis': 'X',
@@ -828,7 +955,8 @@ class RadarDisplay(Component):
 
         fields = {self.Vfield.value: field}
 
-        points = Points(fields, axes, radar.metadata.copy(), xy.shape[0])
+        points = Points(fields, axes, radar.metadata.copy(), xy.shape[0],
+                        source=radar)
 
         return points
 
@@ -917,6 +1045,8 @@ class RadarDisplay(Component):
             display = pyart.graph.RadarDisplay(self.Vradar.value)
         elif self.plot_type == "radarRhi":
             display = pyart.graph.RadarDisplay(self.Vradar.value)
+        self._displayedRadar = self.Vradar.value
+        self._displayedVersion = radar_version(self.Vradar.value)
         self.VpyartDisplay.change(display)
 
     def _update_plot(self):
@@ -950,6 +1080,10 @@ class RadarDisplay(Component):
         display = self.VpyartDisplay.value
         if self.gatefilterToggle.isChecked():
             gatefilter = self.Vgatefilter.value
+            preview = self.previewGatefilter
+            if (preview is not None and
+                    getattr(preview, '_radar', None) is self.Vradar.value):
+                gatefilter = preview
         else:
             gatefilter = None
         if self.ignoreEdgesToggle.isChecked():
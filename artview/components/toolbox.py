@@ -397,6 +397,62 @@ def interior_radar(path, radar, tilt):
     return (xys[ind], index.transpose().astype(np.int))
 
 
+def interior_radar_volume(paths, radar, height_range=None):
+    """
+    Return the bins of all sweeps of the Radar whose ground footprint is in
+    the interior of any of the paths.
+
+    All sweeps are handled in a single vectorized pass: gates outside the
+    bounding box of a path are discarded before the point in polygon test.
+
+    Parameters
+    ----------
+    paths - list of Matplotlib Path instances
+        Paths in Cartesian coordinates (km) from the radar.
+    radar - Pyart Radar Instance
+    height_range - tuple (zmin, zmax) or None
+        If given, only bins with height above the radar (km) in this range
+        are considered, None in any position means no limit.
+
+    Returns
+    -------
+    xy : Numpy Array
+        Array of the shape (bins,2) containing the x,y
+        coordinate for every bin inside paths
+    index : Numpy Array
+        Array of the shape (bins,2) containing the ray and range
+        coordinate for every bin inside paths
+    """
+    ngates = radar.ngates
+    x = np.ravel(radar.gate_x['data']) / 1000.
+    y = np.ravel(radar.gate_y['data']) / 1000.
+    valid = np.ones(x.shape, dtype=bool)
+    if height_range is not None:
+        z = np.ravel(radar.gate_z['data']) / 1000.
+        if height_range[0] is not None:
+            valid &= z >= height_range[0]
+        if height_range[1] is not None:
+            valid &= z <= height_range[1]
+
+    inside = np.zeros(x.shape, dtype=bool)
+    for path in paths:
+        (xmin, ymin), (xmax, ymax) = (path.vertices.min(axis=0),
+                                      path.vertices.max(axis=0))
+        candidate = np.nonzero(valid & ~inside &
+                               (x >= xmin) & (x <= xmax) &
+                               (y >= ymin) & (y <= ymax))[0]
+        if candidate.size == 0:
+            continue
+        contains = path.contains_points(
+            np.column_stack((x[candidate], y[candidate])))
+        inside[candidate[contains]] = True
+
+    ind = np.nonzero(inside)[0]
+    xy = np.column_stack((x[ind], y[ind]))
+    index = np.column_stack((ind // ngates, ind % ngates)).astype(int)
+    return xy, index
+
+
 def interior_grid(path, grid, basemap, level, plot_type):
     '''
     Return the bins of the Radar in the interior of the path.
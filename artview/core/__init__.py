@@ -13,6 +13,11 @@ ARTview is based in the abstract Component class and shared Variables.
 
     ~core.Variable
     ~core.Component
+    ~gatemask.GateMask
+    ~journal.EditJournal
+    ~filter_pipeline.FilterPipeline
+    ~jobs.JobRunner
+    ~result_cache.ResultCache
     ~PyQt4.QtCore
     ~PyQt4.QtGui
 
@@ -22,3 +27,20 @@ from . import common
 from .core import Variable, componentsList, Component, QtWidgets, QtCore, QtGui
 from .core import log
 from .variable_choose import VariableChoose
+from .gatemask import GateMask
+from . import sidecar
+from .journal import (EditJournal, EditOperation, MaskOperation,
+                      get_journal)
+from .filter_pipeline import FilterPipeline, FILTER_OPERATORS
+from .jobs import JobRunner, get_job_runner
+from . import batch
+from . import sweep
+from . import gridding
+from . import correlation_stats
+from .result_cache import ResultCache, get_result_cache, submit_cached
+from .save_service import submit_save
+from . import delta
+from . import reopen_cache
+from . import session
+from . import file_metadata
+from . import file_list
@@ -0,0 +1,319 @@
+"""
+batch.py
+
+Headless batch execution of a correction pipeline (gatefilter, despeckle,
+dealiasing, phase processing, attenuation) over many radar files.
+
+A pipeline spec is a JSON file::
+
+    {"steps": [
+        {"step": "gatefilter",
+         "parameters": {"criteria": [["reflectivity", "<", [-10.0]]]}},
+        {"step": "despeckle", "parameters": {"field": "reflectivity", ...}},
+        {"step": "dealias_region_based", "parameters": {...}},
+        {"step": "phase_proc_lp", "parameters": {...}},
+        {"step": "calculate_attenuation", "parameters": {...}}],
+     "apply_gatefilter": true}
+
+where the parameters are the ``parameters`` dict of the equivalent plugin,
+which can append its current parameters to a spec file.
+"""
+
+from __future__ import print_function
+import os
+import sys
+import glob
+import json
+import time
+import traceback
+from functools import partial
+
+import numpy as np
+
+from .filter_pipeline import FilterPipeline
+
+# plugin parameters that are not part of a spec
+_RUNTIME_PARAMETERS = ('radar', 'radars', 'gatefilter')
+
+
+######################
+#   Pipeline steps   #
+######################
+
+def _step_gatefilter(radar, gatefilter, parameters):
+    criteria = [(field, operator, tuple(values)) for field, operator, values
+                in parameters['criteria']]
+    excluded = FilterPipeline(radar).evaluate(criteria)
+    if gatefilter is None:
+        return excluded.to_gatefilter(radar)
+    # add to the gates excluded by the previous steps, as the 'or' op of
+    # the pyart GateFilter methods
+    gatefilter._gate_excluded = np.logical_or(gatefilter._gate_excluded,
+                                              excluded.to_array())
+    return gatefilter
+
+
+def _step_despeckle(radar, gatefilter, parameters):
+    import pyart
+    if parameters.get('threshold_max', 'Inf') == 'Inf':
+        threshold = parameters['threshold_min']
+    else:
+        threshold = (parameters['threshold_min'],
+                     float(parameters['threshold_max']))
+    return pyart.correct.despeckle_field(
+        radar, parameters['field'], label_dict=None, threshold=threshold,
+        size=parameters['size'], gatefilter=gatefilter,
+        delta=parameters['delta'])
+
+
+def _step_dealias_region_based(radar, gatefilter, parameters):
+    import pyart
+    field = pyart.correct.dealias_region_based(
+        radar=radar, gatefilter=gatefilter, **parameters)
+    radar.add_field(parameters['corr_vel_field'], field, True)
+    return gatefilter
+
+
+def _step_dealias_unwrap_phase(radar, gatefilter, parameters):
+    import pyart
+    field = pyart.correct.dealias_unwrap_phase(
+        radar=radar, gatefilter=gatefilter, **parameters)
+    name = parameters.get('corr_vel_field') or "dealiased_velocity"
+    radar.add_field(name, field, True)
+    return gatefilter
+
+
+def _step_phase_proc_lp(radar, gatefilter, parameters):
+    import pyart
+    parameters = dict(parameters)
+    reproc_phase_name = parameters.pop('reproc_phase')
+    sob_kdp_name = parameters.pop('sob_kdp')
+    reproc_phase, sob_kdp = pyart.correct.phase_proc_lp(
+        radar=radar, **parameters)
+    radar.add_field(reproc_phase_name, reproc_phase, True)
+    radar.add_field(sob_kdp_name, sob_kdp, True)
+    return gatefilter
+
+
+def _step_calculate_attenuation(radar, gatefilter, parameters):
+    import pyart
+    spec_at, cor_z = pyart.correct.calculate_attenuation(
+        radar=radar, **parameters)
+    radar.add_field(parameters['spec_at_field'], spec_at, True)
+    radar.add_field(parameters['corr_refl_field'], cor_z, True)
+    return gatefilter
+
+
+PIPELINE_STEPS = {
+    'gatefilter': _step_gatefilter,
+    'despeckle': _step_despeckle,
+    'dealias_region_based': _step_dealias_region_based,
+    'dealias_unwrap_phase': _step_dealias_unwrap_phase,
+    'phase_proc_lp': _step_phase_proc_lp,
+    'calculate_attenuation': _step_calculate_attenuation,
+    }
+''' step name and function(radar, gatefilter, parameters) -> gatefilter '''
+
+
+######################
+#   Spec files       #
+######################
+
+def step_parameters(parameters):
+    '''
+    Return json serializable copy of a plugin parameters dict, without the
+    runtime objects (radar, gatefilter) and with unset values ("") as None.
+    '''
+    result = {}
+    for key, value in parameters.items():
+        if key in _RUNTIME_PARAMETERS:
+            continue
+        if isinstance(value, str) and value == '':
+            value = None
+        elif isinstance(value, np.generic):
+            value = value.item()
+        elif isinstance(value, tuple):
+            value = list(value)
+        result[key] = value
+    return result
+
+
+def load_spec(filename):
+    '''Load and check a pipeline spec file.'''
+    with open(filename) as f:
+        spec = json.load(f)
+    for step in spec.get('steps', []):
+        if step['step'] not in PIPELINE_STEPS:
+            raise ValueError("Unknown pipeline step: %s" % step['step'])
+    return spec
+
+
+def save_spec(filename, spec):
+    '''Save pipeline spec file.'''
+    with open(filename, 'w') as f:
+        json.dump(spec, f, indent=2, sort_keys=True)
+
+
+def append_step(filename, step, parameters):
+    '''
+    Append a step to the spec file (created if needed), parameters are
+    passed through :py:func:`step_parameters`.
+    '''
+    if step not in PIPELINE_STEPS:
+        raise ValueError("Unknown pipeline step: %s" % step)
+    if os.path.isfile(filename):
+        spec = load_spec(filename)
+    else:
+        spec = {'steps': [], 'apply_gatefilter': True}
+    spec.setdefault('steps', []).append(
+        {'step': step, 'parameters': step_parameters(parameters)})
+    save_spec(filename, spec)
+    return spec
+
+
+######################
+#   Execution        #
+######################
+
+def output_filename(filename, output_dir=None, suffix='_qc'):
+    '''Return CfRadial output path for filename.'''
+    base = os.path.splitext(os.path.basename(filename))[0]
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(filename))
+    return os.path.join(output_dir, base + suffix + '.nc')
+
+
+def run_file(filename, spec, output_dir=None, suffix='_qc'):
+    '''
+    Run pipeline spec over one radar file and write the result as
+    CfRadial.
+
+    Returns
+    -------
+    report : dict
+        'file', 'output', 'steps' (list of [name, seconds]), 'time' and
+        'error' (traceback text or None).
+    '''
+    import pyart
+    t0 = time.time()
+    report = {'file': filename, 'output': None, 'steps': [], 'error': None}
+    try:
+        t = time.time()
+        radar = pyart.io.read(filename)
+        report['steps'].append(['read', time.time() - t])
+        gatefilter = None
+        for step in spec.get('steps', []):
+            t = time.time()
+            gatefilter = PIPELINE_STEPS[step['step']](
+                radar, gatefilter, dict(step.get('parameters', {})))
+            report['steps'].append([step['step'], time.time() - t])
+
+        t = time.time()
+        if gatefilter is not None and spec.get('apply_gatefilter', True):
+            for field in radar.fields.values():
+                field['data'] = np.ma.masked_where(
+                    gatefilter.gate_excluded, field['data'])
+        output = output_filename(filename, output_dir, suffix)
+        pyart.io.write_cfradial(output, radar)
+        report['steps'].append(['write', time.time() - t])
+        report['output'] = output
+    except Exception:
+        report['error'] = traceback.format_exc()
+    report['time'] = time.time() - t0
+    return report
+
+
+def format_report(report):
+    '''One line summary of a :py:func:`run_file` report.'''
+    steps = ", ".join("%s %.1fs" % (name, t) for name, t in report['steps'])
+    if report['error'] is None:
+        return "OK     %s (%.1fs: %s)" % (report['file'], report['time'],
+                                          steps)
+    error = report['error'].strip().splitlines()[-1]
+    return "FAILED %s (%.1fs: %s) %s" % (report['file'], report['time'],
+                                         steps, error)
+
+
+def run_batch(files, spec, output_dir=None, suffix='_qc', processes=None,
+              verbose=True):
+    '''
+    Run pipeline spec over files in a process pool.
+
+    Parameters
+    ----------
+    files : list of str
+        Radar files.
+    spec : dict
+        Pipeline spec, see :py:func:`load_spec`.
+    output_dir : str or None
+        Directory of outputs, None writes next to the inputs.
+    suffix : str
+        Appended to the input base name for the output name.
+    processes : int or None
+        Number of worker processes, None uses the number of CPUs.
+    verbose : bool
+        Print a line per file as they finish.
+
+    Returns
+    -------
+    reports : list of dict
+        Reports of :py:func:`run_file`, in completion order.
+    '''
+    import multiprocessing
+    if output_dir is not None and not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    func = partial(run_file, spec=spec, output_dir=output_dir, suffix=suffix)
+    reports = []
+    pool = multiprocessing.Pool(processes)
+    try:
+        for report in pool.imap_unordered(func, files):
+            reports.append(report)
+            if verbose:
+                print(format_report(report))
+    finally:
+        pool.close()
+        pool.join()
+    return reports
+
+
+def _expand_inputs(inputs):
+    '''Expand directories and glob patterns into a sorted file list.'''
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(os.path.join(item, name) for name in
+                         os.listdir(item) if not name.startswith('.'))
+        else:
+            files.extend(glob.glob(item) or [item])
+    return sorted(f for f in files if os.path.isfile(f))
+
+
+def main(argv=None):
+    '''Command line entry point, see ``artview_batch --help``.'''
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Run an ARTview correction pipeline over radar files.")
+    parser.add_argument('spec', type=str, help='Pipeline spec (json) file')
+    parser.add_argument('inputs', type=str, nargs='+',
+                        help='Radar files, directories or glob patterns')
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help='Output directory, default next to inputs')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='Number of worker processes, default all CPUs')
+    parser.add_argument('--suffix', type=str, default='_qc',
+                        help='Suffix of output file names')
+    if argv is None:
+        argv = sys.argv
+    args = parser.parse_args(argv[1:])
+
+    spec = load_spec(args.spec)
+    files = _expand_inputs(args.inputs)
+    t0 = time.time()
+    reports = run_batch(files, spec, args.output, args.suffix,
+                        args.processes)
+    failed = [report for report in reports if report['error'] is not None]
+    print("%i files processed in %.1fs, %i failed" %
+          (len(reports), time.time() - t0, len(failed)))
+    for report in failed:
+        print("\n" + report['file'] + "\n" + report['error'])
+    return 1 if failed else 0
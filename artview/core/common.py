@@ -6,6 +6,7 @@ Common routines run throughout ARTView.
 from __future__ import print_function
 # Load the needed packages
 from .core import QtWidgets, QtCore, QtGui, log
+from .statistics import ArrayStatistics
 import numpy as np
 import os
 import glob
@@ -300,6 +301,77 @@ def get_options(options_type, values):
 
 
 
+def export_pipeline_step(parent, step, parameters):
+    '''
+    Ask for a batch pipeline spec file and append step with parameters to
+    it, see :py:func:`artview.core.batch.append_step`.
+    '''
+    from . import batch
+    filename = QtWidgets.QFileDialog.getSaveFileName(
+        parent, 'Add to Batch Pipeline', '', 'Pipeline spec (*.json)',
+        options=QtWidgets.QFileDialog.DontConfirmOverwrite)
+    if isinstance(filename, tuple):  # PyQt5
+        filename = filename[0]
+    filename = str(filename)
+    if filename == '':
+        return
+    try:
+        spec = batch.append_step(filename, step, parameters)
+    except:
+        import traceback
+        ShowLongText("Exporting pipeline step fails with following "
+                     "error\n\n" + traceback.format_exc())
+        return
+    print("Added %s as step %i of %s" % (step, len(spec['steps']), filename),
+          file=log.info)
+
+
+def save_options_dialog(fields):
+    '''
+    Edit the session save options (compression level and packing) of
+    fields, see :py:data:`artview.core.save_service.field_options`.
+    '''
+    from . import save_service
+    fields = list(fields)
+    dialog = QtWidgets.QDialog()
+    dialog.setWindowTitle("Save Options")
+    gridLayout = QtWidgets.QGridLayout(dialog)
+    gridLayout.addWidget(QtWidgets.QLabel("field"), 0, 0)
+    gridLayout.addWidget(QtWidgets.QLabel("zlib level"), 0, 1)
+    gridLayout.addWidget(QtWidgets.QLabel("packing"), 0, 2)
+    entrys = {}
+    for i, field in enumerate(fields):
+        options = save_service.get_field_options(field)
+        zlib = QtWidgets.QSpinBox(dialog)
+        zlib.setRange(0, 9)
+        zlib.setValue(options['zlib'])
+        zlib.setToolTip("0 for no compression, fastest")
+        packing = QtWidgets.QComboBox(dialog)
+        packing.addItems(save_service.PACKINGS)
+        packing.setCurrentIndex(
+            save_service.PACKINGS.index(options['packing']))
+        packing.setToolTip("Storage of floating point data, int16 is "
+                           "scaled to the data range")
+        gridLayout.addWidget(QtWidgets.QLabel(field), i + 1, 0)
+        gridLayout.addWidget(zlib, i + 1, 1)
+        gridLayout.addWidget(packing, i + 1, 2)
+        entrys[field] = (zlib, packing)
+
+    buttonBox = QtWidgets.QDialogButtonBox(dialog)
+    buttonBox.setOrientation(QtCore.Qt.Horizontal)
+    buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Cancel |
+                                 QtWidgets.QDialogButtonBox.Ok)
+    gridLayout.addWidget(buttonBox, len(fields) + 1, 0, 1, -1)
+    buttonBox.accepted.connect(dialog.accept)
+    buttonBox.rejected.connect(dialog.reject)
+
+    if dialog.exec_() == QtWidgets.QDialog.Accepted:
+        for field, (zlib, packing) in entrys.items():
+            save_service.field_options[field] = {
+                'zlib': zlib.value(),
+                'packing': save_service.PACKINGS[packing.currentIndex()]}
+
+
 ########################
 # Start methods #
 ########################
@@ -351,56 +423,165 @@ class _SimplePluginStart(QtWidgets.QDialog):
 ########################
 
 
-class CreateTable(QtWidgets.QTableWidget):
-    """Creates a custom table widget."""
+class PointsTableModel(QtCore.QAbstractTableModel):
+    """
+    Table model backed directly by the arrays of a
+    :py:class:`~artview.core.points.Points` instance.
+
+    No per cell object is created: values are formatted only when the view
+    asks for them, which means only for the visible rows. Sorting is done
+    with :py:func:`numpy.ma.argsort` over the chosen column and kept as a
+    permutation of the rows, the data arrays are never reordered.
+    """
+
+    def __init__(self, points, fmt="%8.3f", parent=None):
+        super(PointsTableModel, self).__init__(parent)
+        self.fmt = fmt
+        self.setPoints(points)
+
+    def setPoints(self, points):
+        """Reset model to display points (may be None)."""
+        self.beginResetModel()
+        self.points = points
+        self.colnames = []
+        self.columns = []
+        if points is not None:
+            for name in points.axes.keys():
+                self.colnames.append(name)
+                self.columns.append(points.axes[name]['data'])
+            for name in points.fields.keys():
+                self.colnames.append(name)
+                self.columns.append(points.fields[name]['data'])
+        self.order = None
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if self.points is None or parent.isValid():
+            return 0
+        return self.points.npoints
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.colnames)
+
+    def _rows(self, rows):
+        """Map view rows (int or array) to rows of the points arrays."""
+        if self.order is None:
+            return rows
+        return self.order[rows]
+
+    def _column(self, column, rows):
+        """Get values of column at rows, broadcasting (1,) shaped axes."""
+        data = self.columns[column]
+        if np.size(data) == 1:
+            return np.ma.resize(data, np.shape(rows))
+        return data[rows]
+
+    def _format(self, value):
+        if value is np.ma.masked or value is None:
+            return "--"
+        try:
+            return self.fmt % value
+        except TypeError:
+            return str(value)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role != QtCore.Qt.DisplayRole:
+            return None
+        column = self.columns[index.column()]
+        if np.size(column) == 1:
+            value = np.ma.ravel(column)[0]
+        else:
+            value = column[self._rows(index.row())]
+        return self._format(value)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            if section < len(self.colnames):
+                return self.colnames[section]
+            return None
+        return str(section + 1)
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        """Sort rows by column using numpy, -1 restores original order."""
+        if self.points is None:
+            return
+        self.layoutAboutToBeChanged.emit()
+        if column < 0 or np.size(self.columns[column]) == 1:
+            self.order = None
+        else:
+            self.order = np.ma.argsort(self.columns[column],
+                                       kind='mergesort')
+            if order == QtCore.Qt.DescendingOrder:
+                self.order = self.order[::-1]
+        self.layoutChanged.emit()
+
+    def rangeText(self, top, bottom, left, right):
+        """
+        Return tab separated text of the block of cells from row top to
+        bottom and column left to right (inclusive), as seen in the view.
+        """
+        rows = self._rows(np.arange(top, bottom + 1))
+        columns = []
+        for j in range(left, right + 1):
+            values = self._column(j, rows)
+            text = np.char.mod(self.fmt, np.ma.getdata(values))
+            text[np.ma.getmaskarray(values)] = "--"
+            columns.append(text)
+        lines = ["\t".join(self.colnames[left:right + 1])]
+        lines.extend("\t".join(line) for line in zip(*columns))
+        return "\n".join(lines)
+
+
+class CreateTable(QtWidgets.QTableView):
+    """
+    Creates a custom table view over a
+    :py:class:`~artview.core.points.Points` instance, see
+    :py:class:`PointsTableModel`.
+    """
     def __init__(self, points, name="Table",
                  textcolor="black", bgcolor="gray", parent=None, *args):
-        QtWidgets.QTableWidget.__init__(self, *args)
+        QtWidgets.QTableView.__init__(self, *args)
         self.points = points
         self.setSelectionMode(self.ContiguousSelection)
         self.setGeometry(0, 0, 700, 400)
         self.setShowGrid(True)
         self.textcolor = textcolor
         self.bgcolor = bgcolor
+        self.tableModel = PointsTableModel(None, parent=self)
+        self.setModel(self.tableModel)
 
     def display(self):
-        """Reads in data from a 2D array and formats and displays it in
-            the table."""
+        """Attach points to the model and display it in the table."""
+        self.tableModel.setPoints(self.points)
+        header = self.horizontalHeader()
+        header.setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.setSortingEnabled(True)
 
-        if self.points is None:
-            data = ["No data for selected."]
-            nrows = 0
-            ncols = 0
-        else:
-            nrows = self.points.npoints
-            colnames = (list(self.points.axes.keys()) +
-                        list(self.points.fields.keys()))
-            ncols = len(colnames)
-
-        self.setRowCount(nrows)
-        self.setColumnCount(ncols)
-        colnames = list(self.points.axes.keys()) + list(self.points.fields.keys())
-        self.setHorizontalHeaderLabels(colnames)
-
-        for i in range(nrows):
-            # Set each cell to be a QTableWidgetItem from _process_row method
-            for j, name in enumerate(colnames):
-                if name in self.points.axes:
-                    item = QtWidgets.QTableWidgetItem(
-                        "%8.3f" % self.points.axes[name]['data'][i])
-                else:
-                    item = QtWidgets.QTableWidgetItem(
-                        "%8.3f" % self.points.fields[name]['data'][i])
-
-                item.setBackgroundColor = QtGui.QColor(self.bgcolor)
-                item.setTextColor = QtGui.QColor(self.textcolor)
-                self.setItem(i, j, item)
-
-        # Format column width
+        # Format column width, this only looks at the visible rows
         self.resizeColumnsToContents()
 
         return
 
+    def copySelection(self):
+        """Copy selected range to clipboard as tab separated text."""
+        blocks = []
+        for sel in self.selectionModel().selection():
+            blocks.append(self.tableModel.rangeText(
+                sel.top(), sel.bottom(), sel.left(), sel.right()))
+        if blocks:
+            QtWidgets.QApplication.clipboard().setText("\n\n".join(blocks))
+
+    def keyPressEvent(self, event):
+        """Reimplementation, copy selection on standard copy keys."""
+        if event.matches(QtGui.QKeySequence.Copy):
+            self.copySelection()
+        else:
+            super(CreateTable, self).keyPressEvent(event)
+
 ########################
 #  Arithmetic methods  #
 ########################
@@ -408,15 +589,7 @@ class CreateTable(QtWidgets.QTableWidget):
 
 def _array_stats(data):
     """Return a dictionary of statistics from a Numpy array"""
-    statdict = {}
-    statdict['Minimum'] = np.ma.min(data)
-    statdict['Maximum'] = np.ma.max(data)
-    statdict['Mean'] = np.ma.mean(data)
-    statdict['Median'] = np.ma.median(data)
-    statdict['Standard_Deviation'] = np.ma.std(data)
-    statdict['Variance'] = np.ma.var(data)
-
-    return statdict
+    return ArrayStatistics(data, exact_median=True).as_dict()
 
 
 ########################
@@ -0,0 +1,240 @@
+"""
+correlation_stats.py
+
+Selection, binning and mergeable statistics of field pairs, used by the
+density and accumulation modes of
+:py:class:`~artview.components.Correlation`.
+"""
+
+import numpy as np
+
+
+def correlation_values(radar, field_horizontal, field_vertical, sweeps,
+                       gatefilter):
+    '''
+    Return horizontal and vertical field values as masked arrays, masked
+    outside sweeps (list of sweep numbers or None for all) and where
+    gatefilter (or the fields mask if None) excludes.
+    '''
+    xvalues = radar.fields[field_horizontal]['data']
+    yvalues = radar.fields[field_vertical]['data']
+
+    if gatefilter is None:
+        gates = np.ma.getmaskarray(xvalues) | np.ma.getmaskarray(yvalues)
+    else:
+        gates = gatefilter.gate_excluded
+
+    if sweeps is not None:
+        sweep_filter = gates | True
+        for sweep, (start, end) in enumerate(radar.iter_start_end()):
+            if sweep in sweeps:
+                sweep_filter[start:end+1, :] = False
+        gates = gates | sweep_filter
+
+    xvalues = np.ma.MaskedArray(xvalues, mask=gates)
+    yvalues = np.ma.MaskedArray(yvalues, mask=gates)
+
+    return xvalues, yvalues
+
+
+def valid_pairs(xvalues, yvalues, xscale='linear', yscale='linear'):
+    '''
+    Return 1D arrays of the unmasked, finite (and positive for 'log'
+    scale) value pairs, log scaled values are returned as log10.
+    '''
+    x = np.ma.filled(np.ma.asarray(xvalues, dtype=float), np.nan).ravel()
+    y = np.ma.filled(np.ma.asarray(yvalues, dtype=float), np.nan).ravel()
+    valid = np.isfinite(x) & np.isfinite(y)
+    if xscale == 'log':
+        valid &= x > 0
+    if yscale == 'log':
+        valid &= y > 0
+    x, y = x[valid], y[valid]
+    if xscale == 'log':
+        x = np.log10(x)
+    if yscale == 'log':
+        y = np.log10(y)
+    return x, y
+
+
+def bin_edges(vmin, vmax, bins, scale='linear'):
+    '''
+    Return bins + 1 edges between vmin and vmax (data values), evenly
+    spaced in the log10 of the values for 'log' scale.
+    '''
+    if scale == 'log':
+        return 10 ** np.linspace(np.log10(vmin), np.log10(vmax), bins + 1)
+    return np.linspace(vmin, vmax, bins + 1)
+
+
+def _bin_index(values, edges, scale):
+    '''Bin of each (scaled) value in evenly spaced edges, -1 outside.'''
+    if scale == 'log':
+        edges = np.log10(edges)
+    bins = len(edges) - 1
+    width = (edges[-1] - edges[0]) / bins or 1.
+    index = np.floor((values - edges[0]) / width).astype(np.intp)
+    # the last edge is part of the last bin, as in np.histogram; the
+    # outer edges are matched within eps as the log10 round trip of
+    # bin_edges may move them off the data range
+    eps = 1e-9 * abs(edges[-1] - edges[0])
+    index[np.abs(values - edges[-1]) <= eps] = bins - 1
+    index[np.abs(values - edges[0]) <= eps] = 0
+    index[(index < 0) | (index >= bins)] = -1
+    return index
+
+
+def histogram2d(x, y, xedges, yedges, xscale='linear', yscale='linear'):
+    '''
+    Counts of (x, y) pairs, as returned by :py:func:`valid_pairs`, in the
+    bins of :py:func:`bin_edges`. Equivalent to :py:func:`np.histogram2d`
+    but a single np.bincount as bins are evenly spaced.
+
+    Returns
+    -------
+    counts : array of shape (len(xedges) - 1, len(yedges) - 1)
+    '''
+    nx, ny = len(xedges) - 1, len(yedges) - 1
+    ix = _bin_index(x, xedges, xscale)
+    iy = _bin_index(y, yedges, yscale)
+    inside = (ix >= 0) & (iy >= 0)
+    counts = np.bincount(ix[inside] * ny + iy[inside], minlength=nx * ny)
+    return counts.reshape(nx, ny)
+
+
+def density(xvalues, yvalues, bins=200, xscale='linear', yscale='linear'):
+    '''
+    Return 2D histogram of masked arrays xvalues and yvalues over their
+    whole range.
+
+    Returns
+    -------
+    counts, xedges, yedges : arrays
+        See :py:func:`histogram2d` and :py:func:`bin_edges`.
+    '''
+    x, y = valid_pairs(xvalues, yvalues, xscale, yscale)
+    edges = []
+    for values, scale in ((x, xscale), (y, yscale)):
+        if values.size:
+            vmin, vmax = values.min(), values.max()
+        else:
+            vmin, vmax = 0., 1.
+        if vmin == vmax:
+            vmin, vmax = vmin - 0.5, vmax + 0.5
+        if scale == 'log':
+            vmin, vmax = 10 ** vmin, 10 ** vmax
+        edges.append(bin_edges(vmin, vmax, bins, scale))
+    counts = histogram2d(x, y, edges[0], edges[1], xscale, yscale)
+    return counts, edges[0], edges[1]
+
+
+class CorrelationStats(object):
+    '''
+    Mergeable statistics of field pairs: 2D histogram counts and the sums
+    n, sum x, sum y, sum x*x, sum y*y and sum x*y of the (log10 for 'log'
+    scale) values, enough for the linear regression.
+
+    Parameters
+    ----------
+    xedges, yedges : array
+        Bin edges, see :py:func:`bin_edges`. Pairs outside are part of the
+        sums but not of the counts.
+    xscale, yscale : 'linear' or 'log'
+        Scale of the values.
+    '''
+
+    def __init__(self, xedges, yedges, xscale='linear', yscale='linear'):
+        self.xedges = np.asarray(xedges)
+        self.yedges = np.asarray(yedges)
+        self.xscale = xscale
+        self.yscale = yscale
+        self.counts = np.zeros((len(xedges) - 1, len(yedges) - 1),
+                               dtype=np.int64)
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.
+        self.files = 0
+
+    def add(self, xvalues, yvalues):
+        '''Add masked arrays of values.'''
+        x, y = valid_pairs(xvalues, yvalues, self.xscale, self.yscale)
+        self.counts += histogram2d(x, y, self.xedges, self.yedges,
+                                   self.xscale, self.yscale)
+        self.n += x.size
+        self.sx += x.sum()
+        self.sy += y.sum()
+        self.sxx += np.dot(x, x)
+        self.syy += np.dot(y, y)
+        self.sxy += np.dot(x, y)
+
+    def merge(self, other):
+        '''Add the statistics of other, with the same bins and scales.'''
+        if (self.xscale, self.yscale) != (other.xscale, other.yscale) or \
+                not np.array_equal(self.xedges, other.xedges) or \
+                not np.array_equal(self.yedges, other.yedges):
+            raise ValueError("Can not merge statistics of different bins")
+        self.counts += other.counts
+        self.n += other.n
+        self.sx += other.sx
+        self.sy += other.sy
+        self.sxx += other.sxx
+        self.syy += other.syy
+        self.sxy += other.sxy
+        self.files += other.files
+
+    def regression(self):
+        '''
+        Return slope, intercept and correlation coefficient of the least
+        squares line (in scaled values), as scipy.stats.linregress.
+        '''
+        n = float(self.n)
+        cov = n * self.sxy - self.sx * self.sy
+        varx = n * self.sxx - self.sx ** 2
+        vary = n * self.syy - self.sy ** 2
+        if n < 2 or varx <= 0:
+            return np.nan, np.nan, np.nan
+        m = cov / varx
+        b = (self.sy - m * self.sx) / n
+        r = cov / np.sqrt(varx * vary) if vary > 0 else np.nan
+        return m, b, r
+
+
+def file_statistics(filename, field_horizontal, field_vertical, sweeps,
+                    xedges, yedges, xscale='linear', yscale='linear'):
+    '''
+    Read radar file and return its :py:class:`CorrelationStats`, gates
+    are selected as :py:func:`correlation_values` without gatefilter.
+    '''
+    import pyart
+    radar = pyart.io.read(filename)
+    stats = CorrelationStats(xedges, yedges, xscale, yscale)
+    if sweeps is not None:
+        sweeps = [sweep for sweep in sweeps if sweep < radar.nsweeps]
+    stats.add(*correlation_values(radar, field_horizontal, field_vertical,
+                                  sweeps, None))
+    stats.files = 1
+    return stats
+
+
+def _file_statistics(args):
+    return file_statistics(*args)
+
+
+def accumulate_files(files, field_horizontal, field_vertical, sweeps,
+                     xedges, yedges, xscale='linear', yscale='linear',
+                     processes=None):
+    '''
+    Return merged :py:func:`file_statistics` of files computed in a process
+    pool, for scripts.
+    '''
+    import multiprocessing
+    total = CorrelationStats(xedges, yedges, xscale, yscale)
+    args = [(filename, field_horizontal, field_vertical, sweeps, xedges,
+             yedges, xscale, yscale) for filename in files]
+    pool = multiprocessing.Pool(processes)
+    try:
+        for stats in pool.imap_unordered(_file_statistics, args):
+            total.merge(stats)
+    finally:
+        pool.close()
+        pool.join()
+    return total
@@ -0,0 +1,245 @@
+"""
+delta.py
+
+Delta save of a radar: only the fields modified since the file was read
+are written, to a companion netCDF of the radar file, and merged back when
+the file is read again.
+
+Fields changed only in their masks (e.g. by
+:py:class:`~artview.core.journal.MaskOperation`) are stored as a mask.
+"""
+
+from __future__ import print_function
+import os
+import time
+
+import numpy as np
+
+from .core import log
+from . import sidecar
+from .journal import get_journal, MaskOperation
+from .jobs import get_job_runner
+from .save_service import write_field, get_field_options
+
+DELTA_EXT = '.delta.nc'
+''' extension of delta files '''
+
+MASK_SUFFIX = '__mask'
+''' name suffix of mask only variables '''
+
+
+def delta_paths(filename, create=True):
+    '''
+    Candidate delta paths: next to file, then in cache directory under the
+    :py:func:`~artview.core.sidecar.file_key` of the file.
+    '''
+    return [filename + DELTA_EXT,
+            os.path.join(sidecar.get_cache_dir('delta', create),
+                         sidecar.file_key(filename) + DELTA_EXT)]
+
+
+class _LoadRecorder(object):
+    '''
+    Lazy loader of a pyart LazyLoadDict that records the loaded field as
+    read from file, see :py:func:`mark_loaded`.
+    '''
+
+    def __init__(self, loader, loaded, name):
+        self.loader = loader
+        self.loaded = loaded
+        self.name = name
+
+    def __call__(self):
+        field = self.loader()
+        self.loaded[self.name] = field
+        return field
+
+
+def mark_loaded(radar):
+    '''
+    Record the fields of radar as read from file, call after reading (and
+    :py:func:`merge_delta`).
+
+    Lazy fields (radar.fields a pyart LazyLoadDict) are not loaded, they
+    are recorded when first accessed.
+    '''
+    fields = radar.fields
+    lazy = getattr(fields, '_lazyload', {})
+    loaded = dict(getattr(fields, '_dic', fields))
+    for name, loader in list(lazy.items()):
+        lazy[name] = _LoadRecorder(loader, loaded, name)
+    radar.loaded_fields = loaded
+
+
+def modified_fields(radar):
+    '''
+    Return sets of fields changed since :py:func:`mark_loaded`: those with
+    changed data and those with only changed masks.
+
+    Fields edited through the radar :py:class:`EditJournal`, added or
+    replaced since reading, or merged from a previous delta are modified.
+    '''
+    loaded = getattr(radar, 'loaded_fields', {})
+    data_fields, mask_fields = getattr(radar, 'delta_fields',
+                                       (set(), set()))
+    data_fields = set(data_fields)
+    mask_fields = set(mask_fields)
+    fields = radar.fields
+    # fields still lazy are as read, and are not loaded to be compared
+    for name, field in getattr(fields, '_dic', fields).items():
+        if loaded.get(name) is not field:
+            data_fields.add(name)
+    for description, operations in get_journal(radar).undo_stack:
+        for op in operations:
+            if isinstance(op, MaskOperation):
+                mask_fields.update(op.fields)
+            elif op.new_data is not None:
+                data_fields.add(op.field)
+            else:
+                mask_fields.add(op.field)
+    mask_fields -= data_fields
+    return (data_fields & set(radar.fields),
+            mask_fields & set(radar.fields))
+
+
+def write_delta(path, source, digest, nrays, ngates, fields, masks,
+                options=None):
+    '''
+    Write delta file.
+
+    Parameters
+    ----------
+    path : str
+        Output path.
+    source : str
+        Radar file name the delta belongs to.
+    digest : str or None
+        Content hash of source, computed if None.
+    nrays, ngates : int
+        Radar shape.
+    fields : dict
+        Field dicts written as a whole.
+    masks : dict
+        Boolean gate masks by field name.
+    options : dict or None
+        Save options by field name, see
+        :py:data:`~artview.core.save_service.field_options`.
+    '''
+    from netCDF4 import Dataset
+    options = options or {}
+    if digest is None:
+        digest = sidecar.file_hash(source)
+    tmp = path + '.tmp%i' % os.getpid()
+    try:
+        with Dataset(tmp, 'w', format='NETCDF4') as dataset:
+            dataset.source_file = os.path.basename(source)
+            dataset.source_file_hash = digest
+            dataset.created = time.strftime('%Y-%m-%dT%H:%M:%S')
+            dataset.createDimension('time', nrays)
+            dataset.createDimension('range', ngates)
+            for name, field in fields.items():
+                write_field(dataset, name, field, ('time', 'range'),
+                            **options.get(name, {}))
+            for name, mask in masks.items():
+                var = dataset.createVariable(name + MASK_SUFFIX, 'u1',
+                                             ('time', 'range'), zlib=True)
+                var.artview_mask_of = name
+                var[:] = np.asarray(mask, dtype='u1')
+        os.rename(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def submit_delta_save(radar, callback=None):
+    '''
+    Write the fields modified in radar to its delta file in a worker
+    process, see :py:func:`write_delta`. The job starts at once, so the
+    radar may be edited while it writes.
+
+    Returns
+    -------
+    job : :py:class:`~artview.core.jobs.Job` or None if nothing changed.
+    '''
+    filename = radar.filename
+    data_fields, mask_fields = modified_fields(radar)
+    if not data_fields and not mask_fields:
+        return None
+    fields = dict((name, radar.fields[name]) for name in data_fields)
+    masks = dict((name, np.ma.getmaskarray(radar.fields[name]['data']))
+                 for name in mask_fields)
+    options = dict((name, get_field_options(name)) for name in data_fields)
+
+    path = filename + DELTA_EXT
+    if not os.access(os.path.dirname(os.path.abspath(path)), os.W_OK):
+        path = delta_paths(filename)[1]
+    if callback is None:
+        def callback(path):
+            print("Saved %s" % path, file=log.info)
+    # the file is hashed in the worker, not on the GUI thread
+    return get_job_runner().submit(
+        "Save delta %s" % os.path.basename(filename), write_delta,
+        args=(path, filename, None, radar.nrays, radar.ngates, fields,
+              masks, options),
+        callback=callback, immediate=True, daemon=False)
+
+
+def _merge(radar, path, digest):
+    '''Merge delta file path into radar if made for digest.'''
+    from netCDF4 import Dataset
+    with Dataset(path, 'r') as dataset:
+        if getattr(dataset, 'source_file_hash', None) != digest:
+            return False
+        data_fields, mask_fields = set(), set()
+        for name, var in dataset.variables.items():
+            if hasattr(var, 'artview_mask_of'):
+                field = var.artview_mask_of
+                if field in radar.fields.keys():
+                    radar.fields[field]['data'] = np.ma.array(
+                        radar.fields[field]['data'],
+                        mask=np.asarray(var[:], dtype=bool))
+                    mask_fields.add(field)
+                continue
+            field = dict((key, var.getncattr(key)) for key in var.ncattrs()
+                         if key not in ('scale_factor', 'add_offset'))
+            field['data'] = var[:]
+            radar.add_field(name, field, replace_existing=True)
+            data_fields.add(name)
+    radar.delta_fields = (data_fields, mask_fields)
+    return True
+
+
+def merge_delta(radar):
+    '''
+    Merge the delta file of radar.filename, if any for this file content,
+    into radar. Returns the path of the merged file or None.
+    '''
+    filename = getattr(radar, 'filename', None)
+    if filename is None or not os.path.isfile(filename):
+        return None
+    paths = [path for path in delta_paths(filename, create=False)
+             if os.path.isfile(path)]
+    if not paths:
+        # the file is hashed only if there is a delta to check
+        return None
+    digest = sidecar.file_hash(filename)
+    for path in paths:
+        try:
+            if _merge(radar, path, digest):
+                print("Merged %s" % path, file=log.info)
+                return path
+        except Exception:
+            import traceback
+            print(traceback.format_exc(), file=log.error)
+    return None
+
+
+def load_delta(radar):
+    '''
+    Merge the delta file of a radar just read and mark its fields as
+    loaded, see :py:func:`merge_delta` and :py:func:`mark_loaded`.
+    '''
+    path = merge_delta(radar)
+    mark_loaded(radar)
+    return path
@@ -0,0 +1,30 @@
+"""
+file_list.py
+
+Data files of a directory for the file list (Vfilelist), without the
+companion files ARTview writes next to them: delta files, sidecars, saved
+sessions and unfinished saves.
+"""
+
+import os
+import glob
+
+from .sidecar import SIDECAR_EXT
+from .delta import DELTA_EXT
+
+SESSION_EXT = '.json'
+''' extension of saved sessions '''
+
+COMPANION_EXTS = (DELTA_EXT, SIDECAR_EXT, SESSION_EXT, '.tmp')
+''' extensions of files that are not data files '''
+
+
+def is_data_file(path):
+    '''Return whether path is a file and not an ARTview companion file.'''
+    return os.path.isfile(path) and not path.endswith(COMPANION_EXTS)
+
+
+def list_files(directory):
+    '''Return sorted paths of the data files in directory.'''
+    return sorted(path for path in glob.glob(os.path.join(directory, '*'))
+                  if is_data_file(path))
@@ -0,0 +1,273 @@
+"""
+file_metadata.py
+
+Radar file metadata (instrument, location, instrument parameters, sizes)
+read from the file headers only, for CfRadial/netCDF, NEXRAD Level II and
+Sigmet files, without reading the data. Other formats fall back to a full
+read where asked (info dialogs), never for tooltips. Results are cached by
+path and modification time.
+"""
+
+from __future__ import print_function
+import os
+import struct
+import datetime
+from collections import OrderedDict
+
+import numpy as np
+
+from .core import log
+
+INFO_NA = "Info not available"
+
+maxCache = 1000
+''' number of files kept in the metadata cache '''
+
+_cache = OrderedDict()
+
+# instrument_parameters reported, all as (value, units)
+_PARAMETERS = ('unambiguous_range', 'nyquist_velocity',
+               'radar_beam_width_h', 'radar_beam_width_v', 'pulse_width')
+
+
+def _empty(filename, file_format):
+    meta = {'filename': filename, 'format': file_format,
+            'instrument_name': None, 'time': None,
+            'latitude': None, 'longitude': None, 'altitude': None,
+            'ngates': None, 'nrays': None, 'nsweeps': None, 'fields': None}
+    for key in _PARAMETERS:
+        meta[key] = None
+    return meta
+
+
+def _first(dic):
+    '''Return (first value, units) of pyart dict or netCDF variable.'''
+    if hasattr(dic, 'ncattrs'):
+        units = getattr(dic, 'units', '')
+        data = dic[0] if dic.shape else dic[...]
+    else:
+        units = dic.get('units', '')
+        data = np.ravel(dic['data'])[0]
+    return np.asarray(data).item(), units
+
+
+def _char_string(variable):
+    '''Return str value of a netCDF char variable.'''
+    from netCDF4 import chartostring
+    data = variable[:]
+    if data.dtype.kind == 'S' and data.ndim:
+        # without _Encoding attribute netCDF4 returns the characters
+        data = chartostring(np.ma.filled(data, b''))
+    return str(data).strip() or None
+
+
+def radar_metadata(radar):
+    '''Return metadata dict of an open pyart Radar.'''
+    meta = _empty(getattr(radar, 'filename', None), 'Radar')
+    meta['instrument_name'] = radar.metadata.get('instrument_name', None)
+    for key in ('latitude', 'longitude', 'altitude'):
+        try:
+            meta[key] = _first(getattr(radar, key))
+        except Exception:
+            pass
+    parameters = radar.instrument_parameters or {}
+    for key in _PARAMETERS:
+        if key in parameters:
+            try:
+                meta[key] = _first(parameters[key])
+            except Exception:
+                pass
+    meta['time'] = radar.time.get('units', '').replace(
+        'seconds since ', '') or None
+    meta['ngates'] = radar.ngates
+    meta['nrays'] = radar.nrays
+    meta['nsweeps'] = radar.nsweeps
+    meta['fields'] = sorted(radar.fields.keys())
+    return meta
+
+
+def _read_netcdf(filename):
+    '''CfRadial (or other netCDF) attributes and dimensions.'''
+    from netCDF4 import Dataset
+    meta = _empty(filename, 'netCDF')
+    with Dataset(filename, 'r') as dataset:
+        variables = dataset.variables
+        dimensions = dataset.dimensions
+        meta['format'] = getattr(dataset, 'Conventions', 'netCDF')
+        meta['instrument_name'] = getattr(dataset, 'instrument_name', None)
+        meta['time'] = getattr(dataset, 'time_coverage_start', None)
+        if meta['time'] is None and 'time_coverage_start' in variables:
+            # CfRadial stores it as char variable
+            try:
+                meta['time'] = _char_string(variables['time_coverage_start'])
+            except Exception:
+                pass
+        for key, dim in (('ngates', 'range'), ('nrays', 'time'),
+                         ('nsweeps', 'sweep')):
+            if dim in dimensions:
+                meta[key] = len(dimensions[dim])
+        for key in ('latitude', 'longitude', 'altitude') + _PARAMETERS:
+            if key in variables:
+                try:
+                    meta[key] = _first(variables[key])
+                except Exception:
+                    pass
+        meta['fields'] = sorted(
+            name for name, var in variables.items()
+            if var.dimensions == ('time', 'range'))
+    return meta
+
+
+def _read_nexrad(filename):
+    '''NEXRAD Level II 24 byte volume header: station and time.'''
+    meta = _empty(filename, 'NEXRAD Level II')
+    with open(filename, 'rb') as f:
+        header = f.read(24)
+    version, _, days, msecs, icao = struct.unpack('>9s3sII4s', header)
+    meta['format'] = 'NEXRAD Level II %s' % version[4:8].decode('ascii')
+    meta['instrument_name'] = icao.decode('ascii', 'replace').strip()
+    time = (datetime.datetime(1970, 1, 1) +
+            datetime.timedelta(days=days - 1, milliseconds=msecs))
+    meta['time'] = time.strftime('%Y-%m-%dT%H:%M:%SZ')
+    return meta
+
+
+def _read_sigmet(filename):
+    '''Sigmet product and ingest headers.'''
+    from pyart.io._sigmetfile import SigmetFile, bin4_to_angle
+    meta = _empty(filename, 'Sigmet')
+    # only the header records are read until read_data
+    sigmetfile = SigmetFile(filename)
+    try:
+        ingest = sigmetfile.ingest_header
+        config = ingest['ingest_configuration']
+        task = ingest['task_configuration']
+        meta['instrument_name'] = config['site_name'].decode(
+            'ascii', 'replace').strip()
+        meta['latitude'] = (float(bin4_to_angle(config['latitude_radar'])),
+                            'degrees_north')
+        longitude = float(bin4_to_angle(config['longitude_radar']))
+        if longitude > 180:
+            longitude -= 360
+        meta['longitude'] = (longitude, 'degrees_east')
+        meta['altitude'] = (float(config['height_site']), 'meters')
+        meta['nsweeps'] = int(task['task_scan_info']['number_sweeps'])
+        meta['ngates'] = int(task['task_range_info']['number_bins_out'])
+        start = config['volume_scan_start_time']
+        meta['time'] = '%04i-%02i-%02i' % (start['year'], start['month'],
+                                          start['day'])
+    finally:
+        sigmetfile.close()
+    return meta
+
+
+def _read_full(filename):
+    '''Unknown format: full read with pyart.'''
+    import pyart
+    radar = pyart.io.read(filename, delay_field_loading=True)
+    radar.filename = filename
+    return radar_metadata(radar)
+
+
+def _reader(filename):
+    '''Return header reader of file from its magic bytes.'''
+    with open(filename, 'rb') as f:
+        begin = f.read(8)
+    if begin[:3] == b'CDF' or begin[:8] == b'\x89HDF\r\n\x1a\n':
+        return _read_netcdf
+    if begin[:4] == b'AR2V':
+        return _read_nexrad
+    if begin[:2] == b'\x1b\x00':
+        return _read_sigmet
+    return _read_full
+
+
+def read_metadata(filename, full=True):
+    '''
+    Return metadata dict of radar file, from its headers if the format is
+    known, else from a full read if full (else ValueError is raised).
+    Missing information is None, values with units are (value, units)
+    tuples.
+    '''
+    key = (os.path.abspath(filename), os.path.getmtime(filename))
+    if key not in _cache:
+        reader = _reader(filename)
+        meta = None
+        if reader is not _read_full:
+            try:
+                meta = reader(filename)
+            except Exception:
+                import traceback
+                print(traceback.format_exc(), file=log.debug)
+        if meta is None:
+            if not full:
+                raise ValueError("No header metadata in %s" % filename)
+            try:
+                meta = _read_full(filename)
+            except Exception:
+                # not a radar, cached too so it is not read again
+                meta = None
+        _cache[key] = meta
+        while len(_cache) > maxCache:
+            _cache.popitem(last=False)
+    if _cache[key] is None:
+        raise ValueError("Could not read metadata of %s" % filename)
+    return _cache[key]
+
+
+def _with_units(value):
+    if value is None:
+        return INFO_NA
+    return '%s %s' % value
+
+
+def short_info(meta):
+    '''Return text with the basic metadata.'''
+    def get(key):
+        value = meta.get(key)
+        return INFO_NA if value is None else str(value)
+
+    def number(key):
+        value = meta.get(key)
+        return INFO_NA if value is None else str(value[0])
+
+    return (('Radar Name: %s\n' % get('instrument_name')) +
+            ('Radar longitude: %s\n' % number('longitude')) +
+            ('Radar latitude: %s\n' % number('latitude')) +
+            ('Radar altitude: %s\n' % _with_units(meta['altitude'])) +
+            ('    \n') +
+            ('Unambiguous range: %s\n' %
+             _with_units(meta['unambiguous_range'])) +
+            ('Nyquist velocity: %s\n' %
+             _with_units(meta['nyquist_velocity'])) +
+            ('    \n') +
+            ('Radar Beamwidth, horiz: %s\n' %
+             _with_units(meta['radar_beam_width_h'])) +
+            ('Radar Beamwidth, vert: %s\n' %
+             _with_units(meta['radar_beam_width_v'])) +
+            ('Pulsewidth: %s\n' % _with_units(meta['pulse_width'])) +
+            ('    \n') +
+            ('Number of gates: %s\n' % get('ngates')) +
+            ('Number of sweeps: %s\n' % get('nsweeps')))
+
+
+def tooltip(filename):
+    '''
+    Return file name and a one line description from its headers, only
+    the name if they can't be read (the file is never read in full).
+    '''
+    name = os.path.basename(filename)
+    try:
+        meta = read_metadata(filename, full=False)
+    except Exception:
+        return name
+    parts = [meta['format'] or '']
+    if meta['instrument_name']:
+        parts.append(meta['instrument_name'])
+    if meta['time']:
+        parts.append(str(meta['time']))
+    if meta['nsweeps'] is not None:
+        parts.append('%i sweeps' % meta['nsweeps'])
+    if meta['fields']:
+        parts.append(', '.join(meta['fields']))
+    return '%s\n%s' % (name, ' | '.join(parts))
@@ -0,0 +1,184 @@
+"""
+filter_pipeline.py
+
+Incremental evaluation of gate filter criteria, the exclusion mask of every
+criterion is cached so changing one threshold only recomputes that
+criterion.
+"""
+
+from collections import OrderedDict
+import threading
+import numpy as np
+
+from .gatemask import GateMask
+from .journal import radar_version
+
+FILTER_OPERATORS = {"=": "exclude_equal",
+                    "!=": "exclude_not_equal",
+                    "<": "exclude_below",
+                    "<=": "exclude_below",
+                    ">": "exclude_above",
+                    ">=": "exclude_above",
+                    "inside": "exclude_inside",
+                    "outside": "exclude_outside",
+                    }
+''' operators and the equivalent pyart GateFilter method '''
+
+
+def evaluate_criterion(data, operator, values):
+    '''
+    Return boolean array of the gates excluded by one criterion.
+
+    Semantics are the same as the :py:class:`pyart.filters.GateFilter`
+    method of :py:data:`FILTER_OPERATORS` with default arguments (masked
+    gates are excluded, inside is inclusive and outside exclusive), but
+    data may be any slice of the field, e.g. a single sweep. Non finite
+    values are masked, so they are always excluded (as after
+    :py:meth:`pyart.filters.GateFilter.exclude_invalid`).
+
+    Parameters
+    ----------
+    data : array
+        Field data (or a slice of it).
+    operator : str
+        Key of :py:data:`FILTER_OPERATORS`.
+    values : tuple of float
+        Threshold, (low, high) for 'inside' and 'outside'.
+    '''
+    data = np.ma.masked_invalid(data, copy=False)
+    if operator == "=":
+        marked = data == values[0]
+    elif operator == "!=":
+        marked = data != values[0]
+    elif operator == "<":
+        marked = data < values[0]
+    elif operator == "<=":
+        marked = data <= values[0]
+    elif operator == ">":
+        marked = data > values[0]
+    elif operator == ">=":
+        marked = data >= values[0]
+    elif operator in ("inside", "outside"):
+        # pyart accepts the limits in any order
+        low, high = sorted(values[:2])
+        if operator == "inside":
+            marked = (data >= low) & (data <= high)
+        else:
+            marked = (data < low) | (data > high)
+    else:
+        raise ValueError("Unknown filter operator: %s" % operator)
+    return np.ma.filled(marked, True)
+
+
+class FilterPipeline(object):
+    '''
+    Cached per criterion exclusion masks of a radar.
+
+    A criterion is a tuple (field, operator, values). Its mask is kept as a
+    :py:class:`~artview.core.gatemask.GateMask` together with the field
+    data array and radar edit version it was computed from, so it is reused
+    until the field is replaced or edited. Masks may be computed for the
+    whole volume or for a single sweep (used for previews), and the cache
+    may be used from a background thread.
+
+    Parameters
+    ----------
+    radar : Radar or None
+        Radar the criteria are evaluated on.
+    maxsize : int
+        Maximum number of cached criteria masks.
+    '''
+
+    def __init__(self, radar=None, maxsize=32):
+        self.radar = radar
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_radar(self, radar):
+        '''Change radar, clearing the cache if it is a different one.'''
+        with self._lock:
+            if radar is not self.radar:
+                self.radar = radar
+                # a new dict, snapshots keep the old one
+                self._cache = OrderedDict()
+
+    def snapshot(self):
+        '''
+        Return a pipeline fixed on the current radar and sharing its cache,
+        for a background thread while this one may change radar.
+        '''
+        with self._lock:
+            other = FilterPipeline(self.radar, self.maxsize)
+            other._cache = self._cache
+            other._lock = self._lock
+        return other
+
+    def sweep_slice(self, sweep):
+        '''Return slice of the rays of sweep.'''
+        start = self.radar.sweep_start_ray_index['data'][sweep]
+        end = self.radar.sweep_end_ray_index['data'][sweep]
+        return slice(int(start), int(end) + 1)
+
+    def criterion_mask(self, field, operator, values, sweep=None):
+        '''
+        Return GateMask of gates excluded by criterion, in the whole volume
+        or only in sweep.
+        '''
+        radar = self.radar
+        data = radar.fields[field]['data']
+        version = radar_version(radar)
+        key = (field, operator, tuple(values), sweep)
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None and entry[0] is data and entry[1] == version:
+            mask = entry[2]
+        else:
+            if sweep is not None:
+                data_slice = data[self.sweep_slice(sweep)]
+            else:
+                data_slice = data
+            mask = GateMask.from_array(
+                evaluate_criterion(data_slice, operator, values))
+        with self._lock:
+            if radar is self.radar:
+                self._cache.pop(key, None)
+                self._cache[key] = (data, version, mask)
+                while len(self._cache) > self.maxsize:
+                    self._cache.popitem(last=False)
+        return mask
+
+    def evaluate(self, criteria, sweep=None):
+        '''
+        Return GateMask of gates excluded by any of the criteria, in the
+        whole volume or only in sweep.
+        '''
+        if sweep is None:
+            nrays = self.radar.nrays
+        else:
+            sl = self.sweep_slice(sweep)
+            nrays = sl.stop - sl.start
+        combined = GateMask((nrays, self.radar.ngates))
+        for field, operator, values in criteria:
+            combined |= self.criterion_mask(field, operator, values, sweep)
+        return combined
+
+    def gatefilter(self, criteria, gatefilter=None):
+        '''
+        Return pyart GateFilter excluding the gates of criteria, see
+        :py:meth:`~artview.core.gatemask.GateMask.to_gatefilter`.
+        '''
+        return self.evaluate(criteria).to_gatefilter(self.radar, gatefilter)
+
+    def preview_gatefilter(self, criteria, sweep):
+        '''
+        Return pyart GateFilter excluding the gates of criteria in sweep
+        only, other sweeps are not evaluated and have no excluded gates.
+        The GateFilter has the attribute ``preview`` set to the sweep.
+        '''
+        import pyart
+        gatefilter = pyart.filters.GateFilter(self.radar, exclude_based=True)
+        gatefilter._gate_excluded[self.sweep_slice(sweep)] = \
+            self.evaluate(criteria, sweep).to_array()
+        gatefilter.preview = sweep
+        return gatefilter
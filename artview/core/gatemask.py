@@ -0,0 +1,209 @@
+"""
+gatemask.py
+
+Compact bit-packed representation of gate shaped boolean arrays.
+"""
+
+import numpy as np
+
+# number of set bits for every byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class GateMask(object):
+    '''
+    Boolean array of shape (nrays, ngates) stored with one bit per gate.
+
+    This is 8 times smaller than the numpy bool array used in
+    :py:class:`pyart.filters.GateFilter` and in field masks, so it is used
+    wherever ARTview needs to keep masks or gate selections around (original
+    masks, cached filters, undo information, sidecar files).
+
+    Logical operators ``&``, ``|``, ``^`` and ``~`` work directly on the packed
+    bytes.
+
+    Parameters
+    ----------
+    shape : tuple
+        (nrays, ngates) of the represented array.
+    packed : array of uint8 or None
+        Packed bits as returned by :py:func:`numpy.packbits` of the
+        flattened array. None creates an all False mask.
+    '''
+
+    def __init__(self, shape, packed=None):
+        self.shape = tuple(int(n) for n in shape)
+        self.size = int(np.prod(self.shape))
+        nbytes = (self.size + 7) // 8
+        if packed is None:
+            packed = np.zeros(nbytes, dtype=np.uint8)
+        elif packed.size != nbytes:
+            raise ValueError("packed has %i bytes, %i expected for shape %s"
+                             % (packed.size, nbytes, self.shape))
+        self.packed = packed
+
+    ######################
+    #   Constructors     #
+    ######################
+
+    @classmethod
+    def from_array(cls, array):
+        '''Create GateMask from a boolean array (or a masked array mask).'''
+        array = np.asarray(array, dtype=bool)
+        return cls(array.shape, np.packbits(array.ravel()))
+
+    @classmethod
+    def from_indices(cls, shape, ray_index, range_index):
+        '''Create GateMask which is True at the given ray and gate indexes.'''
+        mask = cls(shape)
+        mask.set_indices(ray_index, range_index)
+        return mask
+
+    @classmethod
+    def from_points(cls, points, shape):
+        '''
+        Create GateMask from the 'ray_index' and 'range_index' axes of a
+        :py:class:`~artview.core.points.Points` instance.
+        '''
+        return cls.from_indices(shape,
+                                points.axes['ray_index']['data'],
+                                points.axes['range_index']['data'])
+
+    @classmethod
+    def from_gatefilter(cls, gatefilter):
+        '''Create GateMask from excluded gates of a pyart GateFilter.'''
+        return cls.from_array(gatefilter._gate_excluded)
+
+    @classmethod
+    def from_field(cls, data):
+        '''Create GateMask from the mask of a (masked) field data array.'''
+        mask = np.ma.getmask(data)
+        if mask is np.ma.nomask:
+            return cls(np.shape(data))
+        return cls.from_array(mask)
+
+    ######################
+    #   Conversions      #
+    ######################
+
+    def to_array(self):
+        '''Return the full boolean array.'''
+        bits = np.unpackbits(self.packed)[:self.size]
+        return bits.view(bool).reshape(self.shape)
+
+    def to_gatefilter(self, radar, gatefilter=None):
+        '''
+        Return a pyart GateFilter excluding the gates of this mask. If
+        gatefilter is given it is modified in place and returned.
+        '''
+        if gatefilter is None:
+            import pyart
+            gatefilter = pyart.filters.GateFilter(radar, exclude_based=True)
+        gatefilter._gate_excluded = self.to_array()
+        return gatefilter
+
+    def indices(self):
+        '''
+        Return (ray_index, range_index) arrays of the True gates, only the
+        non zero bytes are unpacked.
+        '''
+        nonzero = np.nonzero(self.packed)[0]
+        bits = np.unpackbits(self.packed[nonzero]).reshape(-1, 8)
+        byte, bit = np.nonzero(bits)
+        flat = nonzero[byte].astype(np.int64) * 8 + bit
+        ngates = self.shape[-1]
+        return flat // ngates, flat % ngates
+
+    ######################
+    #   Modification     #
+    ######################
+
+    def set_indices(self, ray_index, range_index, value=True):
+        '''Set the given ray and gate indexes to value, in place.'''
+        flat = (np.asarray(ray_index, dtype=np.int64) * self.shape[-1] +
+                np.asarray(range_index, dtype=np.int64))
+        bits = (128 >> (flat & 7)).astype(np.uint8)
+        if value:
+            np.bitwise_or.at(self.packed, flat >> 3, bits)
+        else:
+            np.bitwise_and.at(self.packed, flat >> 3, ~bits)
+
+    def copy(self):
+        ''' Return a copy of the mask. '''
+        return GateMask(self.shape, self.packed.copy())
+
+    def count(self):
+        '''Number of True gates.'''
+        return int(_POPCOUNT[self.packed].sum(dtype=np.int64))
+
+    def any(self):
+        ''' Test if any gate is True. '''
+        return bool(self.packed.any())
+
+    @property
+    def nbytes(self):
+        ''' Memory used by the packed bits. '''
+        return self.packed.nbytes
+
+    ######################
+    #   Operators        #
+    ######################
+
+    def _check(self, other):
+        if not isinstance(other, GateMask):
+            other = GateMask.from_array(other)
+        if other.shape != self.shape:
+            raise ValueError("GateMask shapes differ: %s and %s"
+                             % (self.shape, other.shape))
+        return other
+
+    def _clear_padding(self, packed):
+        '''Zero the unused bits of the last byte.'''
+        extra = packed.size * 8 - self.size
+        if extra:
+            packed[-1] &= np.uint8((0xFF << extra) & 0xFF)
+        return packed
+
+    def __and__(self, other):
+        other = self._check(other)
+        return GateMask(self.shape, self.packed & other.packed)
+
+    def __or__(self, other):
+        other = self._check(other)
+        return GateMask(self.shape, self.packed | other.packed)
+
+    def __xor__(self, other):
+        other = self._check(other)
+        return GateMask(self.shape, self.packed ^ other.packed)
+
+    def __invert__(self):
+        return GateMask(self.shape, self._clear_padding(~self.packed))
+
+    def __iand__(self, other):
+        self.packed &= self._check(other).packed
+        return self
+
+    def __ior__(self, other):
+        self.packed |= self._check(other).packed
+        return self
+
+    def __ixor__(self, other):
+        self.packed ^= self._check(other).packed
+        return self
+
+    def __eq__(self, other):
+        if not isinstance(other, GateMask):
+            return NotImplemented
+        return (self.shape == other.shape and
+                np.array_equal(self.packed, other.packed))
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "GateMask(shape=%s, count=%i)" % (self.shape, self.count())
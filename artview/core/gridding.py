@@ -0,0 +1,546 @@
+"""
+gridding.py
+
+Tiled execution of :py:func:`pyart.map.grid_from_radars`: the horizontal
+grid is split in Y/X tiles gridded in parallel and stitched back.
+
+Each grid point only depends on the gates within its radius of influence,
+so a tile gridded on its own equals the same points of the full grid.
+
+The gate to grid point neighbours of map_gates_to_grid can also be kept in
+the cache directory (:py:func:`grid_from_radars_cached`), so gridding again
+the same radar geometry on the same grid with other fields or weighting
+function is a sparse matrix-vector product per field.
+"""
+
+import os
+import json
+import hashlib
+from functools import partial
+
+import numpy as np
+
+from . import sidecar
+from .jobs import get_job_runner
+
+WEIGHTING_FUNCTIONS = ('Barnes', 'Barnes2', 'Cressman')
+''' weighting functions supported by :py:func:`grid_from_radars_cached` '''
+
+max_bytes = 2 * 2 ** 30
+''' size of the geometry cache directory kept by :py:func:`load_geometry` '''
+
+ROI_BAND_RATIO = 1.25
+''' ratio of largest to smallest gate radius of influence queried at once '''
+
+# defaults of pyart.map.map_gates_to_grid
+_ROI_DEFAULTS = {'roi_func': 'dist_beam', 'constant_roi': None,
+                 'z_factor': 0.05, 'xy_factor': 0.02, 'min_radius': 250.,
+                 'h_factor': [1.0, 1.0, 1.0], 'nb': 1.0, 'bsp': 1.0,
+                 'toa': 17000.}
+
+
+def _axis_tiles(size, parts):
+    '''Split range(size) in up to parts contiguous slices.'''
+    parts = max(1, min(int(parts), size))
+    bounds = np.linspace(0, size, parts + 1).astype(int)
+    return [slice(start, stop) for start, stop in
+            zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def tile_specs(grid_shape, grid_limits, tiles):
+    '''
+    Split a grid in Y/X tiles.
+
+    Parameters
+    ----------
+    grid_shape : 3-tuple of int
+        (nz, ny, nx) of the full grid.
+    grid_limits : 3-tuple of 2-tuple
+        Limits of the full grid, as in
+        :py:func:`pyart.map.grid_from_radars`.
+    tiles : 2-tuple of int
+        Number of tiles along Y and X.
+
+    Returns
+    -------
+    specs : list of ((y_slice, x_slice), grid_shape, grid_limits)
+        Position of each tile in the full grid and its own shape and
+        limits.
+    '''
+    nz, ny, nx = grid_shape
+    y = np.linspace(grid_limits[1][0], grid_limits[1][1], ny)
+    x = np.linspace(grid_limits[2][0], grid_limits[2][1], nx)
+    specs = []
+    for ys in _axis_tiles(ny, tiles[0]):
+        for xs in _axis_tiles(nx, tiles[1]):
+            shape = (nz, ys.stop - ys.start, xs.stop - xs.start)
+            limits = (tuple(grid_limits[0]),
+                      (float(y[ys.start]), float(y[ys.stop - 1])),
+                      (float(x[xs.start]), float(x[xs.stop - 1])))
+            specs.append(((ys, xs), shape, limits))
+    return specs
+
+
+def stitch_tiles(grid_shape, grid_limits, tiles):
+    '''
+    Return the full grid made of tiles, a list of ((y_slice, x_slice),
+    grid) as given by :py:func:`tile_specs`.
+    '''
+    import pyart
+    template = tiles[0][1]
+    nz, ny, nx = grid_shape
+    fields = {}
+    for name, field in template.fields.items():
+        data = np.ma.masked_all(grid_shape,
+                                dtype=np.asarray(field['data']).dtype)
+        for (ys, xs), grid in tiles:
+            data[:, ys, xs] = grid.fields[name]['data']
+        fields[name] = dict((key, value) for key, value in field.items()
+                            if key != 'data')
+        fields[name]['data'] = data
+
+    x = dict(template.x)
+    x['data'] = np.linspace(grid_limits[2][0], grid_limits[2][1], nx)
+    y = dict(template.y)
+    y['data'] = np.linspace(grid_limits[1][0], grid_limits[1][1], ny)
+    return pyart.core.Grid(
+        template.time, fields, template.metadata,
+        template.origin_latitude, template.origin_longitude,
+        template.origin_altitude, x, y, template.z,
+        projection=template.projection,
+        radar_latitude=template.radar_latitude,
+        radar_longitude=template.radar_longitude,
+        radar_altitude=template.radar_altitude,
+        radar_time=template.radar_time,
+        radar_name=template.radar_name)
+
+
+def _grid_tile(kwargs):
+    import pyart
+    return pyart.map.grid_from_radars(**kwargs)
+
+
+def _grid_tile_cached(kwargs):
+    return grid_from_radars_cached(**kwargs)
+
+
+def grid_from_radars_tiled(tiles=(2, 2), processes=None, **kwargs):
+    '''
+    :py:func:`pyart.map.grid_from_radars` over Y/X tiles gridded in a
+    process pool, for scripts. kwargs must include grid_shape and
+    grid_limits.
+    '''
+    import multiprocessing
+    specs = tile_specs(kwargs['grid_shape'], kwargs['grid_limits'], tiles)
+    tile_kwargs = [dict(kwargs, grid_shape=shape, grid_limits=limits)
+                   for slices, shape, limits in specs]
+    pool = multiprocessing.Pool(processes)
+    try:
+        grids = pool.map(_grid_tile, tile_kwargs)
+    finally:
+        pool.close()
+        pool.join()
+    return stitch_tiles(kwargs['grid_shape'], kwargs['grid_limits'],
+                        [(spec[0], grid) for spec, grid in zip(specs, grids)])
+
+
+def submit_grid(name, kwargs, tiles=(1, 1), callback=None,
+                reuse_geometry=False):
+    '''
+    Submit :py:func:`pyart.map.grid_from_radars` to the
+    :py:class:`~artview.core.jobs.JobRunner`, one job per Y/X tile, and
+    call callback with the stitched grid when all tiles are done. If a
+    tile fails the remaining ones are cancelled. If reuse_geometry each
+    tile uses :py:func:`grid_from_radars_cached`.
+
+    Returns
+    -------
+    jobs : list of :py:class:`~artview.core.jobs.Job`
+    '''
+    runner = get_job_runner()
+    func = _grid_tile_cached if reuse_geometry else _grid_tile
+    specs = tile_specs(kwargs['grid_shape'], kwargs['grid_limits'], tiles)
+    if len(specs) == 1:
+        return [runner.submit(name, func, args=(kwargs, ),
+                              callback=callback)]
+
+    results = {}
+    jobs = []
+
+    def collect(index, grid):
+        results[index] = grid
+        if len(results) == len(specs) and callback is not None:
+            callback(stitch_tiles(
+                kwargs['grid_shape'], kwargs['grid_limits'],
+                [(specs[i][0], results[i]) for i in range(len(specs))]))
+
+    def fail(index, error):
+        for job in jobs:
+            runner.cancel(job)
+        from . import common
+        common.ShowLongText("Job %s fails with following error\n\n" %
+                            jobs[index].name + error)
+
+    for index, (slices, shape, limits) in enumerate(specs):
+        tile_kwargs = dict(kwargs, grid_shape=shape, grid_limits=limits)
+        jobs.append(runner.submit(
+            "%s (tile %i/%i)" % (name, index + 1, len(specs)), func,
+            args=(tile_kwargs, ), callback=partial(collect, index),
+            errback=partial(fail, index)))
+    return jobs
+
+
+###########################
+#   Gate neighbour cache  #
+###########################
+
+def _roi(parameters, x, y, z, offsets):
+    '''
+    Radius of influence at points x, y, z as the ConstantRoI, DistRoI and
+    DistBeamRoI classes of pyart.map (the smallest over the radars at
+    offsets), see :py:func:`_grid_spec` for the parameters.
+    '''
+    roi_func = parameters['roi_func']
+    if roi_func == 'constant':
+        return np.full(np.shape(x), float(parameters['constant_roi']))
+    roi = None
+    for oz, oy, ox in offsets:
+        if roi_func == 'dist':
+            r = (parameters['z_factor'] * (z - oz) +
+                 parameters['xy_factor'] * np.sqrt((x - ox) ** 2 +
+                                                   (y - oy) ** 2))
+        elif roi_func == 'dist_beam':
+            hz, hy, hx = parameters['h_factor']
+            beam = np.tan(parameters['nb'] * parameters['bsp'] * np.pi / 180.)
+            r = np.sqrt((hz * (z - oz)) ** 2 + (hy * (y - oy)) ** 2 +
+                        (hx * (x - ox)) ** 2) * beam
+        else:
+            raise ValueError("Unknown roi_func: %s" % roi_func)
+        roi = r if roi is None else np.minimum(roi, r)
+    return np.maximum(roi, parameters['min_radius'])
+
+
+def _scalar(dic):
+    '''First value of a pyart dict (e.g. a one element latitude).'''
+    return float(np.ravel(dic['data'])[0])
+
+
+def _gate_coordinates(radars, grid_origin, grid_origin_alt):
+    '''Gate z, y, x of all radars (flattened) and radar offsets.'''
+    import pyart
+    projparams = {'proj': 'pyart_aeqd', 'lon_0': grid_origin[1],
+                  'lat_0': grid_origin[0]}
+    coords = [], [], []
+    offsets = []
+    for radar in radars:
+        x_disp, y_disp = pyart.core.geographic_to_cartesian(
+            radar.longitude['data'], radar.latitude['data'], projparams)
+        z_disp = _scalar(radar.altitude) - grid_origin_alt
+        offset = (z_disp, float(np.ravel(y_disp)[0]),
+                  float(np.ravel(x_disp)[0]))
+        offsets.append(offset)
+        for coord, data, disp in zip(
+                coords, (radar.gate_z, radar.gate_y, radar.gate_x), offset):
+            coord.append(np.asarray(data['data'], dtype=float).ravel() + disp)
+    return [np.concatenate(coord) for coord in coords] + [offsets]
+
+
+def _grid_spec(radars, kwargs):
+    '''
+    Geometry parameters of a grid_from_radars call, resolved as by
+    pyart.map.map_gates_to_grid: a constant_roi selects the constant
+    function, ARM SACR and SAPR radars use a min_radius of 100 and
+    h_factor has one value per dimension.
+    '''
+    spec = dict(_ROI_DEFAULTS)
+    spec.update((key, kwargs[key]) for key in _ROI_DEFAULTS
+                if kwargs.get(key) is not None)
+    if spec['constant_roi'] is not None:
+        spec['roi_func'] = 'constant'
+    elif spec['roi_func'] == 'constant':
+        spec['constant_roi'] = 500.
+    platform = str(radars[0].metadata.get('platform_id', '')).lower()
+    if 'sacr' in platform or 'sapr' in platform:
+        spec['min_radius'] = 100.
+    spec['h_factor'] = [float(v) for v in
+                        np.broadcast_to(spec['h_factor'], (3,))]
+    spec['grid_shape'] = [int(n) for n in kwargs['grid_shape']]
+    spec['grid_limits'] = [[float(v) for v in limit]
+                           for limit in kwargs['grid_limits']]
+    grid_origin = kwargs.get('grid_origin')
+    if grid_origin is None:
+        grid_origin = (_scalar(radars[0].latitude),
+                       _scalar(radars[0].longitude))
+    spec['grid_origin'] = [float(v) for v in grid_origin]
+    grid_origin_alt = kwargs.get('grid_origin_alt')
+    if grid_origin_alt is None:
+        grid_origin_alt = _scalar(radars[0].altitude)
+    spec['grid_origin_alt'] = float(grid_origin_alt)
+    return spec
+
+
+def geometry_key(radars, spec):
+    '''Hex key of radar gate geometry and grid spec.'''
+    sha = hashlib.sha1(json.dumps(spec, sort_keys=True).encode('utf-8'))
+    for radar in radars:
+        for attr in ('azimuth', 'elevation', 'range', 'latitude',
+                     'longitude', 'altitude'):
+            sha.update(np.ascontiguousarray(
+                getattr(radar, attr)['data'], dtype=float).data)
+    return sha.hexdigest()
+
+
+def build_geometry(radars, spec):
+    '''
+    Return gate to grid point neighbours as a dict of arrays: 'point' and
+    'gate' (flat indices), 'dist2' (squared distance) and 'roi2' (squared
+    radius of influence of the gate) of each pair closer than the gate
+    radius of influence, and 'point_roi' (radius of influence of each grid
+    point).
+    '''
+    from scipy.spatial import cKDTree
+    gz, gy, gx, offsets = _gate_coordinates(
+        radars, spec['grid_origin'], spec['grid_origin_alt'])
+    groi = _roi(spec, gx, gy, gz, offsets)
+
+    # only gates that may reach the grid
+    (zmin, zmax), (ymin, ymax), (xmin, xmax) = spec['grid_limits']
+    near = ((gz <= spec['toa']) &
+            (gz + groi >= zmin) & (gz - groi <= zmax) &
+            (gy + groi >= ymin) & (gy - groi <= ymax) &
+            (gx + groi >= xmin) & (gx - groi <= xmax))
+    gates = np.flatnonzero(near)
+
+    nz, ny, nx = spec['grid_shape']
+    z, y, x = np.meshgrid(np.linspace(zmin, zmax, nz),
+                          np.linspace(ymin, ymax, ny),
+                          np.linspace(xmin, xmax, nx), indexing='ij')
+    points = np.column_stack((z.ravel(), y.ravel(), x.ravel()))
+    point_roi = _roi(spec, x.ravel(), y.ravel(), z.ravel(), offsets)
+
+    # gates are queried in bands of similar radius of influence, so near
+    # gates with a small radius are not searched with the largest one
+    point_tree = cKDTree(points)
+    band = np.zeros(gates.size, dtype=int)
+    if gates.size:
+        roi_min = groi[gates].min()
+        band = np.floor(np.log(groi[gates] / roi_min) /
+                        np.log(ROI_BAND_RATIO)).astype(int)
+    point, gate, dist = [], [], []
+    for n in np.unique(band):
+        members = gates[band == n]
+        gate_tree = cKDTree(np.column_stack((gz[members], gy[members],
+                                             gx[members])))
+        pairs = point_tree.sparse_distance_matrix(
+            gate_tree, groi[members].max(), output_type='ndarray')
+        keep = pairs['v'] <= groi[members[pairs['j']]]
+        point.append(pairs['i'][keep])
+        gate.append(members[pairs['j'][keep]])
+        dist.append(pairs['v'][keep])
+    point = np.concatenate(point) if point else np.zeros(0, np.int64)
+    gate = np.concatenate(gate) if gate else np.zeros(0, np.int64)
+    dist = np.concatenate(dist) if dist else np.zeros(0)
+    return {'point': point.astype(np.int64),
+            'gate': gate.astype(np.int64),
+            'dist2': (dist ** 2).astype(np.float32),
+            'roi2': (groi[gate] ** 2).astype(np.float32),
+            'point_roi': point_roi.astype(np.float32)}
+
+
+def _evict(directory, size):
+    '''Remove least recently used geometry files above size bytes.'''
+    entries = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith('.npz') and '.tmp' not in name:
+            try:
+                entries.append((os.path.getmtime(path),
+                                os.path.getsize(path), path))
+            except OSError:
+                pass
+    entries.sort(reverse=True)
+    total = 0
+    for used, nbytes, path in entries:
+        total += nbytes
+        if total > size:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def load_geometry(radars, spec, cache_dir=None, size=None):
+    '''
+    Return :py:func:`build_geometry` from the cache directory (``gridding``
+    in the ARTview cache directory by default), building and storing it
+    if needed. Least recently used geometries above size bytes (default
+    :py:data:`max_bytes`) are removed.
+    '''
+    if cache_dir is None:
+        cache_dir = sidecar.get_cache_dir('gridding')
+    path = os.path.join(cache_dir, geometry_key(radars, spec) + '.npz')
+    if os.path.isfile(path):
+        with np.load(path) as data:
+            geometry = dict(data)
+        os.utime(path, None)  # mark as recently used
+        return geometry
+    geometry = build_geometry(radars, spec)
+    tmp = path + '.tmp%i.npz' % os.getpid()
+    try:
+        np.savez(tmp, **geometry)
+        os.rename(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _evict(cache_dir, max_bytes if size is None else size)
+    return geometry
+
+
+def _weights(geometry, weighting_function):
+    '''Weight of each neighbour pair, as pyart.map.map_gates_to_grid.'''
+    dist2, roi2 = geometry['dist2'], geometry['roi2']
+    if weighting_function == 'Barnes':
+        return np.exp(-dist2 / (2.0 * roi2)) + 1e-5
+    elif weighting_function == 'Barnes2':
+        return np.exp(-dist2 / (roi2 / 4.0)) + 1e-5
+    elif weighting_function == 'Cressman':
+        return (roi2 - dist2) / (roi2 + dist2)
+    raise ValueError("Unknown weighting_function: %s" % weighting_function)
+
+
+def _make_grid(radars, spec, fields):
+    '''Grid of fields with metadata as pyart.map.grid_from_radars.'''
+    import pyart
+    from pyart.config import get_metadata
+    first = radars[0]
+    time = get_metadata('grid_time')
+    time['data'] = np.array([first.time['data'][0]])
+    time['units'] = first.time['units']
+
+    origin = {}
+    for name, value in zip(('origin_latitude', 'origin_longitude',
+                            'origin_altitude'),
+                           spec['grid_origin'] + [spec['grid_origin_alt']]):
+        origin[name] = get_metadata(name)
+        origin[name]['data'] = np.array([value])
+
+    (zmin, zmax), (ymin, ymax), (xmin, xmax) = spec['grid_limits']
+    nz, ny, nx = spec['grid_shape']
+    axes = {}
+    for name, lmin, lmax, n in (('x', xmin, xmax, nx), ('y', ymin, ymax, ny),
+                                ('z', zmin, zmax, nz)):
+        axes[name] = get_metadata(name)
+        axes[name]['data'] = np.linspace(lmin, lmax, n)
+
+    radar_metadata = {}
+    for name, attr in (('radar_latitude', 'latitude'),
+                       ('radar_longitude', 'longitude'),
+                       ('radar_altitude', 'altitude')):
+        radar_metadata[name] = get_metadata(name)
+        radar_metadata[name]['data'] = np.array(
+            [_scalar(getattr(radar, attr)) for radar in radars])
+    radar_time = get_metadata('radar_time')
+    radar_time['data'] = np.array([radar.time['data'][0] for radar in radars])
+    radar_time['units'] = first.time['units']
+    radar_name = get_metadata('radar_name')
+    radar_name['data'] = np.array([radar.metadata.get('instrument_name', '')
+                                   for radar in radars])
+
+    return pyart.core.Grid(
+        time, fields, dict(first.metadata), origin['origin_latitude'],
+        origin['origin_longitude'], origin['origin_altitude'],
+        axes['x'], axes['y'], axes['z'],
+        projection={'proj': 'pyart_aeqd', '_include_lon_0_lat_0': True},
+        radar_latitude=radar_metadata['radar_latitude'],
+        radar_longitude=radar_metadata['radar_longitude'],
+        radar_altitude=radar_metadata['radar_altitude'],
+        radar_time=radar_time, radar_name=radar_name)
+
+
+def grid_from_radars_cached(radars, grid_shape, grid_limits, cache_dir=None,
+                            **kwargs):
+    '''
+    :py:func:`pyart.map.grid_from_radars` for the map_gates_to_grid
+    algorithm using gate neighbours from :py:func:`load_geometry`, falls
+    back to pyart for other algorithms and weighting functions, gate
+    filters, custom RoIFunction objects and scaled dist_factor.
+
+    Only the radar geometry, grid spec and roi parameters are part of the
+    cache key, so fields, weighting_function, filter_transitions,
+    refl_filter_flag and max_refl may change between calls.
+
+    Gates are excluded as by the moment based filter of pyart: rays in
+    antenna transition if filter_transitions (default True) and, if
+    refl_filter_flag (default True), gates whose refl_field is masked,
+    invalid or above max_refl.
+    '''
+    import pyart
+    if (kwargs.get('gridding_algo', 'map_gates_to_grid') !=
+            'map_gates_to_grid' or
+            kwargs.get('weighting_function', 'Barnes') not in
+            WEIGHTING_FUNCTIONS or kwargs.get('gatefilters') or
+            np.any(np.asarray(kwargs.get('dist_factor', 1.)) != 1.) or
+            not isinstance(kwargs.get('roi_func', 'dist_beam'), str)):
+        return pyart.map.grid_from_radars(radars, grid_shape, grid_limits,
+                                          **kwargs)
+    kwargs['grid_shape'] = grid_shape
+    kwargs['grid_limits'] = grid_limits
+    spec = _grid_spec(radars, kwargs)
+    geometry = load_geometry(radars, spec, cache_dir)
+
+    from scipy.sparse import csr_matrix
+    npoints = int(np.prod(spec['grid_shape']))
+    ngates = sum(radar.nrays * radar.ngates for radar in radars)
+    matrix = csr_matrix(
+        (_weights(geometry, kwargs.get('weighting_function', 'Barnes')),
+         (geometry['point'], geometry['gate'])), shape=(npoints, ngates))
+
+    valid = np.ones(ngates, dtype=bool)
+    if kwargs.get('filter_transitions', True):
+        transition = []
+        for radar in radars:
+            rays = np.zeros(radar.nrays, dtype=bool)
+            if radar.antenna_transition is not None:
+                rays = np.asarray(radar.antenna_transition['data']) == 1
+            transition.append(np.repeat(rays, radar.ngates))
+        valid &= ~np.concatenate(transition)
+    refl_field = kwargs.get('refl_field')
+    if (kwargs.get('refl_filter_flag', True) and refl_field is not None and
+            all(refl_field in radar.fields for radar in radars)):
+        refl = np.ma.concatenate([np.ma.asarray(
+            radar.fields[refl_field]['data']).ravel() for radar in radars])
+        refl = np.ma.masked_invalid(refl)
+        max_refl = kwargs.get('max_refl', 100.)
+        if max_refl is not None:
+            refl = np.ma.masked_greater(refl, max_refl)
+        # masked reflectivity gates are invalid
+        valid &= ~np.ma.getmaskarray(refl)
+
+    fields = kwargs.get('fields')
+    if fields is None:
+        fields = [field for field in radars[0].fields if
+                  all(field in radar.fields for radar in radars[1:])]
+    grid_fields = {}
+    for field in fields:
+        data = np.ma.concatenate([np.ma.asarray(
+            radar.fields[field]['data']).ravel() for radar in radars])
+        values = np.ma.filled(data.astype(float), np.nan)
+        gate_valid = (valid & ~np.ma.getmaskarray(data) &
+                      np.isfinite(values)).astype(float)
+        wsum = matrix.dot(gate_valid)
+        vsum = matrix.dot(np.where(gate_valid > 0, values, 0.))
+        result = np.ma.masked_equal(wsum, 0.)
+        result = np.ma.masked_where(np.ma.getmaskarray(result),
+                                    vsum / np.where(wsum > 0, wsum, 1.))
+        grid_fields[field] = dict(
+            (key, value) for key, value in radars[0].fields[field].items()
+            if key != 'data')
+        grid_fields[field]['data'] = result.reshape(
+            spec['grid_shape']).astype(np.float32)
+
+    if kwargs.get('map_roi', True):
+        roi = pyart.config.get_metadata('ROI')
+        roi['data'] = np.ma.asarray(
+            geometry['point_roi'].reshape(spec['grid_shape']))
+        grid_fields['ROI'] = roi
+    return _make_grid(radars, spec, grid_fields)
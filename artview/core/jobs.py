@@ -0,0 +1,312 @@
+"""
+jobs.py
+
+Run long computations (pyart corrections, gridding) in worker processes, so
+they neither block the GUI nor compete with it for the GIL.
+"""
+
+from __future__ import print_function
+import time
+import threading
+import traceback
+import multiprocessing
+
+from .core import QtCore, log
+
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED = 'finished'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+PROGRESS = 'progress'
+
+_progress_conn = None  # in worker processes
+
+
+def report_progress(fraction):
+    '''
+    Report progress (0 to 1) of the job executing in this worker process,
+    shown in the job list. Does nothing outside of a job.
+    '''
+    if _progress_conn is not None:
+        _progress_conn.send((PROGRESS, float(fraction)))
+
+
+def _run(conn, func, args, kwargs):
+    '''Worker process target, send (state, result or traceback).'''
+    global _progress_conn
+    _progress_conn = conn
+    try:
+        message = (FINISHED, func(*args, **kwargs))
+    except BaseException:
+        message = (FAILED, traceback.format_exc())
+    try:
+        conn.send(message)
+    except Exception:
+        # e.g. result can not be pickled
+        conn.send((FAILED, traceback.format_exc()))
+    conn.close()
+
+
+def _receive(job):
+    '''
+    Receiver thread target: read the messages of the job worker, so large
+    results are transferred and unpickled outside of the GUI thread. The
+    final (state, value) is left in job._message, value is None if the
+    worker ended without sending it.
+    '''
+    while True:
+        try:
+            state, value = job._conn.recv()
+        except (EOFError, OSError):
+            state, value = FAILED, None
+        if state != PROGRESS:
+            job._message = (state, value)
+            return
+        job.progress = value
+
+
+class Job(object):
+    '''
+    A computation executed by :py:class:`JobRunner`.
+
+    Parameters
+    ----------
+    name : str
+        Name shown in the job list.
+    func : callable
+        Function executed in the worker process, it and its result must be
+        picklable.
+    args, kwargs : tuple and dict
+        Arguments of func.
+    callback : callable or None
+        Called in the GUI thread with the result of func.
+    errback : callable or None
+        Called in the GUI thread with the traceback text if func fails, if
+        None the error is shown in a message box.
+    daemon : bool
+        Worker process is a daemon, killed when ARTview quits. Jobs that
+        must complete (e.g. saving files) are not daemons and quitting
+        waits for them.
+    '''
+
+    def __init__(self, name, func, args=(), kwargs=None, callback=None,
+                 errback=None, daemon=True):
+        self.name = name
+        self.daemon = daemon
+        self.func = func
+        self.args = tuple(args)
+        self.kwargs = dict(kwargs or {})
+        self.callback = callback
+        self.errback = errback
+        self.state = QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.ended = None
+        self.result = None
+        self.error = None
+        self.progress = None
+        self._process = None
+        self._conn = None
+        self._thread = None
+        self._message = None
+        self._shown_progress = None
+
+    @property
+    def elapsed(self):
+        ''' Running time in seconds. '''
+        if self.started is None:
+            return 0.
+        if self.ended is None:
+            return time.time() - self.started
+        return self.ended - self.started
+
+    def done(self):
+        return self.state in (FINISHED, FAILED, CANCELLED)
+
+
+class JobRunner(QtCore.QObject):
+    '''
+    Queue of :py:class:`Job` executed in worker processes.
+
+    Results are collected by polling from the GUI thread, so callbacks
+    may freely change shared variables. Use :py:func:`get_job_runner` to
+    get the instance shared by all components.
+
+    Parameters
+    ----------
+    max_workers : int
+        Maximum number of jobs running at the same time.
+    interval : int
+        Polling interval in milliseconds.
+    max_done : int
+        Number of done jobs kept in the list, older ones are removed so
+        long sessions (e.g. following a directory) do not grow it.
+    '''
+
+    jobsChanged = QtCore.pyqtSignal(name="JobsChanged")
+
+    def __init__(self, max_workers=2, interval=200, max_done=100,
+                 parent=None):
+        super(JobRunner, self).__init__(parent)
+        self.max_workers = max_workers
+        self.max_done = max_done
+        self.jobs = []
+        self._timer = QtCore.QTimer(self)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self._poll)
+
+    def submit(self, name, func, args=(), kwargs=None, callback=None,
+               errback=None, immediate=False, daemon=True):
+        '''
+        Queue a new job and return it, see :py:class:`Job`.
+
+        If immediate the job starts now even above max_workers. The worker
+        then holds a snapshot of the arguments as they are at submission
+        (copy-on-write memory of the forked process, or pickled), so they
+        can be changed right after. See :py:class:`Job` for daemon.
+        '''
+        job = Job(name, func, args, kwargs, callback, errback, daemon)
+        self.jobs.append(job)
+        print("Job %s queued" % name, file=log.debug)
+        if immediate:
+            self._start(job)
+        self._start_queued()
+        self._timer.start()
+        self.jobsChanged.emit()
+        return job
+
+    def cancel(self, job):
+        '''Cancel a queued or running job, its callbacks are not called.'''
+        if job.done():
+            return
+        if job.state == RUNNING:
+            job._process.terminate()
+            job._process.join()
+            # the receiver gets end of file once the worker is gone
+            job._thread.join()
+            job._conn.close()
+        job.state = CANCELLED
+        job.ended = time.time()
+        self._release(job)
+        self._forget_done()
+        print("Job %s cancelled" % job.name, file=log.debug)
+        self._start_queued()
+        self.jobsChanged.emit()
+
+    def clear_finished(self):
+        '''Remove jobs that are done from the list.'''
+        self.jobs = [job for job in self.jobs if not job.done()]
+        self.jobsChanged.emit()
+
+    def running(self):
+        return [job for job in self.jobs if job.state == RUNNING]
+
+    def queued(self):
+        return [job for job in self.jobs if job.state == QUEUED]
+
+    def _start_queued(self):
+        '''Start queued jobs while there are free workers.'''
+        queued = self.queued()
+        while queued and len(self.running()) < self.max_workers:
+            self._start(queued.pop(0))
+
+    def _start(self, job):
+        recv_conn, send_conn = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=_run, args=(send_conn, job.func, job.args, job.kwargs))
+        process.daemon = job.daemon
+        job.started = time.time()
+        try:
+            process.start()
+        except Exception:
+            job.state = FAILED
+            job.ended = time.time()
+            job.error = traceback.format_exc()
+            self._finish(job)
+            return
+        send_conn.close()
+        job._process = process
+        job._conn = recv_conn
+        job._thread = threading.Thread(target=_receive, args=(job,))
+        job._thread.daemon = True
+        job._thread.start()
+        job.state = RUNNING
+
+    def _poll(self):
+        '''Collect results received from finished workers.'''
+        changed = False
+        for job in self.running():
+            if job.progress != job._shown_progress:
+                job._shown_progress = job.progress
+                changed = True
+            if job._message is None:
+                continue
+            state, value = job._message
+            job._message = None
+            job._thread.join()
+            job._process.join()
+            job._conn.close()
+            if value is None and state == FAILED:
+                value = "Worker process died (exit code %s)." % \
+                    job._process.exitcode
+            job.ended = time.time()
+            job.state = state
+            if state == FINISHED:
+                job.result = value
+            else:
+                job.error = value
+            self._finish(job)
+            changed = True
+        if changed:
+            self._start_queued()
+            self.jobsChanged.emit()
+        if not self.running() and not self.queued():
+            self._timer.stop()
+
+    def _finish(self, job):
+        '''Call job callbacks, in the GUI thread.'''
+        print("Job %s %s in %fs" % (job.name, job.state, job.elapsed),
+              file=log.debug)
+        try:
+            if job.state == FINISHED:
+                if job.callback is not None:
+                    job.callback(job.result)
+            elif job.errback is not None:
+                job.errback(job.error)
+            else:
+                from . import common
+                common.ShowLongText("Job %s fails with following error\n\n"
+                                    % job.name + job.error)
+        except Exception:
+            print(traceback.format_exc())
+        # the result is now owned by the callback
+        job.result = None
+        self._release(job)
+        self._forget_done()
+
+    def _release(self, job):
+        '''
+        Drop references of a done job to its arguments and callbacks, so
+        jobs kept in the list do not keep radars alive.
+        '''
+        job.args = job.kwargs = job.callback = job.errback = None
+
+    def _forget_done(self):
+        '''Remove oldest done jobs above max_done from the list.'''
+        done = [job for job in self.jobs if job.done()]
+        if len(done) > self.max_done:
+            old = set(done[:len(done) - self.max_done])
+            self.jobs = [job for job in self.jobs if job not in old]
+
+
+_runner = None
+
+
+def get_job_runner():
+    '''Return the JobRunner shared by all components.'''
+    global _runner
+    if _runner is None:
+        # one job per CPU, so tiled gridding uses the whole machine
+        _runner = JobRunner(max_workers=max(2, multiprocessing.cpu_count()))
+    return _runner
@@ -0,0 +1,489 @@
+"""
+journal.py
+
+Sparse undo/redo journal for manual edits of radar fields.
+"""
+
+import json
+import numpy as np
+
+from .gatemask import GateMask
+
+maxlen = 100
+''' number of undo groups kept by the journals of :py:func:`get_journal` '''
+
+maxbytes = 256 * 2 ** 20
+''' memory kept by the journals of :py:func:`get_journal` '''
+
+
+class _GateSelection(object):
+    '''
+    Edited gates of an operation: ray and range index arrays, or a
+    :py:class:`~artview.core.gatemask.GateMask` (with range_index None)
+    which keeps one bit per gate of the volume instead of two int32 per
+    edited gate.
+    '''
+
+    def _set_selection(self, ray_index, range_index):
+        if isinstance(ray_index, GateMask):
+            self.selection = ray_index
+            self._ray_index = self._range_index = None
+        else:
+            self.selection = None
+            self._ray_index = np.asarray(ray_index, dtype=np.int32)
+            self._range_index = np.asarray(range_index, dtype=np.int32)
+
+    @property
+    def index(self):
+        ''' (ray_index, range_index) of the gates. '''
+        if self.selection is not None:
+            return self.selection.indices()
+        return (self._ray_index, self._range_index)
+
+    @property
+    def ray_index(self):
+        return self.index[0]
+
+    @property
+    def range_index(self):
+        return self.index[1]
+
+    def _ngates(self):
+        '''Number of edited gates.'''
+        if self.selection is not None:
+            return self.selection.count()
+        return self._ray_index.size
+
+    @property
+    def _selection_nbytes(self):
+        if self.selection is not None:
+            return self.selection.nbytes
+        return self._ray_index.nbytes + self._range_index.nbytes
+
+
+def _gate_values(values, ngates, dtype=bool):
+    '''Per gate values, scalars are kept as 0-d arrays.'''
+    if np.ndim(values) == 0:
+        return np.array(values, dtype=dtype)
+    array = np.empty(ngates, dtype=dtype)
+    array[:] = values
+    return array
+
+
+class EditOperation(_GateSelection):
+    '''
+    Change of the gates (ray_index, range_index) of one radar field.
+
+    Only the touched gates are stored: old and new data values and old and
+    new mask values, so memory is proportional to the number of edited
+    gates.
+
+    Parameters
+    ----------
+    field : str
+        Name of the field.
+    ray_index, range_index : arrays
+        Indexes of the edited gates, or a GateMask of them and None.
+    data : array or None
+        New data values at the gates, None keeps the data.
+    mask : array, bool or None
+        New mask values at the gates, None keeps the mask.
+    source : str or None
+        If field does not exist in the radar it is created as a copy of
+        field source before applying the edit (undo removes it again).
+    '''
+
+    def __init__(self, field, ray_index, range_index, data=None, mask=None,
+                 source=None):
+        self.field = field
+        self._set_selection(ray_index, range_index)
+        self.new_data = None if data is None else np.ma.getdata(data).copy()
+        if mask is None:
+            self.new_mask = None
+        else:
+            self.new_mask = _gate_values(mask, self._ngates())
+        self.source = source
+        self.created = False
+        self.old_data = None
+        self.old_mask = None
+
+    @property
+    def nbytes(self):
+        ''' Memory used by this operation. '''
+        arrays = (self.new_data, self.new_mask, self.old_data, self.old_mask)
+        return self._selection_nbytes + sum(a.nbytes for a in arrays
+                                             if a is not None)
+
+    def capture(self, radar):
+        '''Store the current values of the gates, before applying.'''
+        if self.field not in radar.fields:
+            if self.source is None:
+                raise KeyError('Field not available: ' + self.field)
+            self.created = True
+            return
+        data = radar.fields[self.field]['data']
+        index = self.index
+        if self.new_data is not None:
+            self.old_data = np.ma.getdata(data)[index].copy()
+        mask = np.ma.getmask(data)
+        if mask is np.ma.nomask:
+            self.old_mask = np.array(False)
+        else:
+            self.old_mask = mask[index].copy()
+
+    def apply(self, radar):
+        '''Apply (or redo) the operation on radar.'''
+        if self.created:
+            radar.add_field_like(
+                self.source, self.field,
+                radar.fields[self.source]['data'].copy(),
+                replace_existing=True)
+        _set_gates(radar.fields[self.field], self.index, self.new_data,
+                   self.new_mask)
+
+    def revert(self, radar):
+        '''Undo the operation on radar.'''
+        if self.created:
+            del radar.fields[self.field]
+            return
+        _set_gates(radar.fields[self.field], self.index, self.old_data,
+                   self.old_mask)
+
+
+def _set_gates(field_dic, index, data, mask):
+    '''Set data and mask of the field at the gates index, in place.'''
+    array = field_dic['data']
+    if data is not None:
+        np.ma.getdata(array)[index] = data
+    if mask is None:
+        return
+    if not isinstance(array, np.ma.MaskedArray):
+        if not np.any(mask):
+            return
+        array = np.ma.array(array, mask=False)
+        field_dic['data'] = array
+    if array.mask is np.ma.nomask:
+        if not np.any(mask):
+            return
+        array.mask = np.zeros(array.shape, dtype=bool)
+    # masks may be shared with other fields (or a gatefilter)
+    array.unshare_mask()
+    array.mask[index] = mask
+
+
+def _memory(array):
+    '''Return id of the array owning the memory of array (or a view).'''
+    while array.base is not None:
+        array = array.base
+    return id(array)
+
+
+class MaskOperation(_GateSelection):
+    '''
+    Mask (or unmask) the gates (ray_index, range_index) of several fields.
+
+    Fields without a mask get a single overlay mask shared among them and
+    every distinct mask array is edited only once and in place, so masking a
+    region in a many field radar allocates at most one full size mask and
+    copies no field data. A mask whose memory is also used by fields
+    outside the operation is copied once for the fields of the operation,
+    so the edit never leaks to them. Journal edits unshare masks before
+    writing (see :py:func:`_set_gates`), other in place mask writes must
+    call ``unshare_mask()`` first.
+
+    Parameters
+    ----------
+    fields : list of str
+        Names of the fields.
+    ray_index, range_index : arrays
+        Indexes of the edited gates, or a GateMask of them and None.
+    mask : array or bool
+        New mask values at the gates.
+    '''
+
+    def __init__(self, fields, ray_index, range_index, mask=True):
+        self.fields = list(fields)
+        self._set_selection(ray_index, range_index)
+        self.new_mask = _gate_values(mask, self._ngates())
+        self.old_masks = {}
+
+    @property
+    def nbytes(self):
+        ''' Memory used by this operation. '''
+        unique = dict((id(a), a) for a in self.old_masks.values()
+                      if a is not None)
+        return (self._selection_nbytes + self.new_mask.nbytes +
+                sum(a.nbytes for a in unique.values()))
+
+    def _mask_groups(self, radar):
+        '''
+        Return list of (mask, fields) of the distinct masks of the fields,
+        giving the shared overlay mask to fields without one.
+        '''
+        fields = radar.fields
+        users = {}  # mask memory: all loaded fields using it
+        for name, dic in getattr(fields, '_dic', fields).items():
+            mask = np.ma.getmask(dic['data'])
+            if mask is not np.ma.nomask:
+                users.setdefault(_memory(mask), set()).add(name)
+        overlay = None
+        copies = {}
+        groups = []
+        ids = {}
+        for field in self.fields:
+            dic = fields[field]
+            data = dic['data']
+            mask = np.ma.getmask(data)
+            if mask is np.ma.nomask:
+                if overlay is None:
+                    overlay = np.zeros(np.shape(data), dtype=bool)
+                mask = overlay
+            elif not users[_memory(mask)] <= set(self.fields):
+                # shared with fields outside of the operation
+                if _memory(mask) not in copies:
+                    copies[_memory(mask)] = mask.copy()
+                mask = copies[_memory(mask)]
+            if mask is not np.ma.getmask(data):
+                dic['data'] = np.ma.MaskedArray(
+                    np.ma.getdata(data), mask=mask, copy=False,
+                    fill_value=getattr(data, 'fill_value', None))
+            if id(mask) not in ids:
+                ids[id(mask)] = len(groups)
+                groups.append((mask, []))
+            groups[ids[id(mask)]][1].append(field)
+        return groups
+
+    def capture(self, radar):
+        '''Store the current mask of the gates, before applying.'''
+        index = self.index
+        seen = {}
+        self.old_masks = {}
+        for field in self.fields:
+            mask = np.ma.getmask(radar.fields[field]['data'])
+            if mask is np.ma.nomask:
+                self.old_masks[field] = None
+            else:
+                if id(mask) not in seen:
+                    seen[id(mask)] = mask[index].copy()
+                self.old_masks[field] = seen[id(mask)]
+
+    def apply(self, radar):
+        '''Apply (or redo) the operation on radar.'''
+        index = self.index
+        for mask, fields in self._mask_groups(radar):
+            mask[index] = self.new_mask
+
+    def revert(self, radar):
+        '''Undo the operation on radar.'''
+        index = self.index
+        for mask, fields in self._mask_groups(radar):
+            old = self.old_masks.get(fields[0])
+            mask[index] = False if old is None else old
+
+
+class EditJournal(object):
+    '''
+    Multi-level undo/redo journal of :py:class:`EditOperation` and
+    :py:class:`MaskOperation` groups.
+
+    A group is the list of operations of one user action (e.g. masking a
+    region in all fields) and is undone and redone as a whole.
+
+    Parameters
+    ----------
+    maxlen : int or None
+        Maximum number of groups kept for undoing, None for no limit.
+    maxbytes : int or None
+        Maximum memory (see :py:attr:`nbytes`) kept for undoing, the oldest
+        groups are dropped above it but the last one is always kept. None
+        for no limit.
+    '''
+
+    def __init__(self, maxlen=None, maxbytes=None):
+        self.maxlen = maxlen
+        self.maxbytes = maxbytes
+        self.undo_stack = []
+        self.redo_stack = []
+
+    def edit(self, radar, operations, description=''):
+        '''
+        Capture the old values, apply operations to radar and record them
+        as one undoable group. This clears the redo stack.
+        '''
+        for op in operations:
+            op.capture(radar)
+            op.apply(radar)
+        _touch(radar)
+        self.undo_stack.append((description, operations))
+        self.redo_stack = []
+        self._trim()
+
+    def _trim(self):
+        '''Drop the oldest undo groups above maxlen or maxbytes.'''
+        if self.maxlen is not None:
+            del self.undo_stack[:max(len(self.undo_stack) - self.maxlen, 0)]
+        if self.maxbytes is not None:
+            sizes = [sum(op.nbytes for op in operations)
+                     for description, operations in self.undo_stack]
+            total = sum(sizes)
+            n = 0
+            while n < len(sizes) - 1 and total > self.maxbytes:
+                total -= sizes[n]
+                n += 1
+            del self.undo_stack[:n]
+
+    def can_undo(self):
+        return len(self.undo_stack) > 0
+
+    def can_redo(self):
+        return len(self.redo_stack) > 0
+
+    def undo(self, radar):
+        '''Undo last group, return its description or None.'''
+        if not self.undo_stack:
+            return None
+        description, operations = self.undo_stack.pop()
+        for op in reversed(operations):
+            op.revert(radar)
+        _touch(radar)
+        self.redo_stack.append((description, operations))
+        return description
+
+    def redo(self, radar):
+        '''Redo last undone group, return its description or None.'''
+        if not self.redo_stack:
+            return None
+        description, operations = self.redo_stack.pop()
+        for op in operations:
+            op.apply(radar)
+        _touch(radar)
+        self.undo_stack.append((description, operations))
+        return description
+
+    def fields(self):
+        '''Set of field names touched by the groups that can be undone.'''
+        fields = set()
+        for description, operations in self.undo_stack:
+            for op in operations:
+                if isinstance(op, MaskOperation):
+                    fields.update(op.fields)
+                else:
+                    fields.add(op.field)
+        return fields
+
+    @property
+    def nbytes(self):
+        ''' Memory used by the journal. '''
+        return sum(op.nbytes for stack in (self.undo_stack, self.redo_stack)
+                   for description, operations in stack
+                   for op in operations)
+
+    ######################
+    #   Disk methods     #
+    ######################
+
+    def save(self, filename):
+        '''
+        Save the groups that can be undone to a compressed npz file, they
+        can be replayed on a fresh read of the radar file with
+        :py:meth:`replay`.
+        '''
+        arrays = {}
+        groups = []
+        n = 0
+        for description, operations in self.undo_stack:
+            ops = []
+            for op in operations:
+                key = 'op%i_' % n
+                if op.selection is not None:
+                    arrays[key + 'packed'] = op.selection.packed
+                    arrays[key + 'shape'] = np.array(op.selection.shape)
+                else:
+                    arrays[key + 'ray'] = op.ray_index
+                    arrays[key + 'range'] = op.range_index
+                if isinstance(op, MaskOperation):
+                    arrays[key + 'mask'] = op.new_mask
+                    ops.append({'key': key, 'fields': op.fields})
+                    n = n + 1
+                    continue
+                if op.new_data is not None:
+                    arrays[key + 'data'] = op.new_data
+                if op.new_mask is not None:
+                    arrays[key + 'mask'] = op.new_mask
+                ops.append({'key': key, 'field': op.field,
+                            'source': op.source})
+                n = n + 1
+            groups.append({'description': description, 'operations': ops})
+        arrays['journal'] = np.array(json.dumps(groups))
+        with open(filename, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, filename, maxlen=None, maxbytes=None):
+        '''
+        Load a journal saved with :py:meth:`save`. Operations are not
+        applied, use :py:meth:`replay`.
+        '''
+        journal = cls(maxlen, maxbytes)
+        with np.load(filename) as npz:
+            groups = json.loads(str(npz['journal']))
+            for group in groups:
+                operations = []
+                for info in group['operations']:
+                    key = info['key']
+                    if key + 'packed' in npz:
+                        ray = GateMask(npz[key + 'shape'],
+                                       npz[key + 'packed'])
+                        rng = None
+                    else:
+                        ray, rng = npz[key + 'ray'], npz[key + 'range']
+                    if 'fields' in info:
+                        operations.append(MaskOperation(
+                            info['fields'], ray, rng, npz[key + 'mask']))
+                        continue
+                    operations.append(EditOperation(
+                        info['field'], ray, rng,
+                        npz[key + 'data'] if key + 'data' in npz else None,
+                        npz[key + 'mask'] if key + 'mask' in npz else None,
+                        info['source']))
+                journal.redo_stack.insert(0, (group['description'],
+                                              operations))
+        return journal
+
+    def replay(self, radar):
+        '''Redo all pending groups on radar, e.g. after :py:meth:`load`.'''
+        while self.redo_stack:
+            description, operations = self.redo_stack.pop()
+            for op in operations:
+                op.capture(radar)
+                op.apply(radar)
+            self.undo_stack.append((description, operations))
+        _touch(radar)
+
+
+def radar_version(radar):
+    '''
+    Return the edit version of radar, increased on every in place edit made
+    through a journal. Caches of values derived from the fields use it to
+    detect edits that keep the same data arrays.
+    '''
+    return getattr(radar, 'edit_version', 0)
+
+
+def _touch(radar):
+    '''Increase radar edit version.'''
+    radar.edit_version = radar_version(radar) + 1
+
+
+def get_journal(radar):
+    '''
+    Return the EditJournal of radar, created on first use. The journal is
+    kept as an attribute of the radar so it is shared by all plugins
+    editing it, and is limited by :py:data:`maxlen` and
+    :py:data:`maxbytes`.
+    '''
+    journal = getattr(radar, 'edit_journal', None)
+    if journal is None:
+        journal = EditJournal(maxlen, maxbytes)
+        radar.edit_journal = journal
+    return journal
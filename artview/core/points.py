@@ -12,7 +12,7 @@ class Points:
     class shall also be applied here. Just as :py:class:`~pyart.core.Grid` and
     :py:class:`~pyart.core.Radar` this is based in netCDF and the
     CF-conventions.
-    This class has 4 attributes
+    This class has 5 attributes
     * npoints: number of points
     * fields: dictionary of pyart variables, representing radar data. All with
       shape (npoints,).
@@ -33,6 +33,9 @@ class Points:
           shape: (npoints,).
         * ray_index, range_index: indexes in a Radar object, shape: (npoints,).
     * metadata: dictionary of global attributes
+    * source: Radar or Grid instance the points were taken from, or None.
+      Caches use its edit version (see
+      :py:func:`~artview.core.journal.radar_version`).
 
     Py-ART Variable
     ---------------
@@ -58,12 +61,13 @@ class Points:
                  'range_index']
     ''' recognised axes keys '''
 
-    def __init__(self, fields, axes, metadata, npoints):
+    def __init__(self, fields, axes, metadata, npoints, source=None):
         ''' Initalize object. '''
         self.fields = {}
         self.metadata = metadata
         self.axes = axes
         self.npoints = npoints
+        self.source = source
         for key in fields.keys():
             self.add_field(key, fields[key])
         return
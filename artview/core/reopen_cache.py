@@ -0,0 +1,288 @@
+"""
+reopen_cache.py
+
+Local conversion cache of radar files: the first read of a file stores its
+fields and coordinates as uncompressed .npy files with a json header, later
+reads of the same file (path, modification time and size) build the Radar
+from memory mapped views, so data pages in from the OS cache when used
+instead of being decompressed and decoded again.
+"""
+
+from __future__ import print_function
+import os
+import json
+import time
+import shutil
+
+import numpy as np
+
+from .core import log
+from .sidecar import get_cache_dir, file_key
+from .jobs import get_job_runner
+
+enabled = True
+''' use the cache in :py:func:`read` '''
+
+max_bytes = 4 * 2 ** 30
+''' size of the cache directory kept by :py:func:`prune` '''
+
+HEADER = 'header.json'
+
+# cache key: [(callback, errback)] waiting for the job filling the entry
+_building = {}
+# cache keys whose entry could not be filled, not tried again
+_failed = set()
+
+# Radar attributes as (name, required), dicts of arrays as 'data' key
+_ATTRIBUTES = (
+    ('time', True), ('range', True), ('metadata', True),
+    ('scan_type', True), ('latitude', True), ('longitude', True),
+    ('altitude', True), ('sweep_number', True), ('sweep_mode', True),
+    ('fixed_angle', True), ('sweep_start_ray_index', True),
+    ('sweep_end_ray_index', True), ('azimuth', True), ('elevation', True),
+    ('altitude_agl', False), ('target_scan_rate', False),
+    ('rays_are_indexed', False), ('ray_angle_res', False),
+    ('scan_rate', False), ('antenna_transition', False),
+    ('rotation', False), ('tilt', False), ('roll', False), ('drift', False),
+    ('heading', False), ('pitch', False), ('georefs_applied', False))
+# Radar attributes that are dicts of the above
+_GROUPS = ('fields', 'instrument_parameters', 'radar_calibration')
+
+
+def cache_key(filename):
+    '''Return key of file from its absolute path, mtime and size.'''
+    return file_key(filename)
+
+
+def _json_default(value):
+    '''Json encoding of numpy values in metadata.'''
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(repr(value))
+
+
+def _save_array(directory, name, data):
+    '''Save data as name.npy (and mask) in directory, return json entry.'''
+    entry = {'file': name + '.npy', 'mask': None}
+    data = np.ma.asanyarray(data)
+    array = np.ma.getdata(data)
+    # object arrays can not be mapped, they are loaded whole
+    entry['mmap'] = not array.dtype.hasobject
+    np.save(os.path.join(directory, entry['file']), array,
+            allow_pickle=not entry['mmap'])
+    if np.ma.is_masked(data):
+        entry['mask'] = name + '.mask.npy'
+        np.save(os.path.join(directory, entry['mask']),
+                np.ma.getmaskarray(data))
+    return entry
+
+
+def _load_array(directory, entry):
+    '''Load array described by entry, see :py:func:`_save_array`.'''
+    # copy on write mapping, editing the radar never touches the cache
+    mode = 'c' if entry['mmap'] else None
+    data = np.load(os.path.join(directory, entry['file']), mmap_mode=mode,
+                   allow_pickle=not entry['mmap'])
+    if entry['mask'] is not None:
+        mask = np.load(os.path.join(directory, entry['mask']),
+                       mmap_mode='c')
+        data = np.ma.MaskedArray(data, mask=mask, copy=False)
+    return data
+
+
+def _save_dict(directory, name, dic):
+    '''Save pyart dict: metadata in json entry, 'data' as array.'''
+    entry = {'meta': dict((key, value) for key, value in dic.items()
+                          if key != 'data')}
+    if 'data' in dic:
+        entry['data'] = _save_array(directory, name, dic['data'])
+    return entry
+
+
+def _load_dict(directory, entry):
+    dic = dict(entry['meta'])
+    if 'data' in entry:
+        dic['data'] = _load_array(directory, entry['data'])
+    return dic
+
+
+def write_radar(directory, radar):
+    '''
+    Write radar into directory (created), the header is written last so
+    a partial directory is never read.
+    '''
+    os.makedirs(directory)
+    header = {'attributes': {}, 'groups': {}, 'created': time.time()}
+    for name, required in _ATTRIBUTES:
+        value = getattr(radar, name, None)
+        if isinstance(value, dict):
+            value = _save_dict(directory, name, value)
+        header['attributes'][name] = value
+    for group in _GROUPS:
+        dicts = getattr(radar, group, None)
+        if dicts is None:
+            header['groups'][group] = None
+            continue
+        header['groups'][group] = dict(
+            (key, _save_dict(directory, '%s.%i' % (group, n), dic))
+            for n, (key, dic) in enumerate(dicts.items()))
+    with open(os.path.join(directory, HEADER), 'w') as f:
+        json.dump(header, f, default=_json_default)
+
+
+def read_radar(directory):
+    '''Return Radar with memory mapped arrays from directory.'''
+    import pyart
+    with open(os.path.join(directory, HEADER)) as f:
+        header = json.load(f)
+
+    def value(entry):
+        if isinstance(entry, dict) and 'meta' in entry:
+            return _load_dict(directory, entry)
+        return entry
+
+    args = [value(header['attributes'][name])
+            for name, required in _ATTRIBUTES if required]
+    kwargs = dict((name, value(header['attributes'].get(name)))
+                  for name, required in _ATTRIBUTES if not required)
+    groups = {}
+    for group, entries in header['groups'].items():
+        if entries is not None:
+            entries = dict((key, _load_dict(directory, entry))
+                           for key, entry in entries.items())
+        groups[group] = entries
+    # positional order of pyart.core.Radar
+    (time_, range_, metadata, scan_type, latitude, longitude, altitude,
+     sweep_number, sweep_mode, fixed_angle, sweep_start_ray_index,
+     sweep_end_ray_index, azimuth, elevation) = args
+    return pyart.core.Radar(
+        time_, range_, groups['fields'], metadata, scan_type, latitude,
+        longitude, altitude, sweep_number, sweep_mode, fixed_angle,
+        sweep_start_ray_index, sweep_end_ray_index, azimuth, elevation,
+        instrument_parameters=groups['instrument_parameters'],
+        radar_calibration=groups['radar_calibration'], **kwargs)
+
+
+def build_cache(filename, key=None):
+    '''
+    Read filename in full and write its cache entry, an entry written
+    meanwhile by other process is used as is.
+    '''
+    import pyart
+    key = key or cache_key(filename)
+    directory = os.path.join(get_cache_dir('reopen'), key)
+    if os.path.isdir(directory):
+        return directory
+    tmp = directory + '.tmp%i' % os.getpid()
+    try:
+        write_radar(tmp, pyart.io.read(filename))
+        try:
+            os.rename(tmp, directory)
+        except OSError:
+            # lost the race against other worker
+            if not os.path.isdir(directory):
+                raise
+    finally:
+        if os.path.isdir(tmp):
+            shutil.rmtree(tmp)
+    prune()
+    return directory
+
+
+def _entry_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for name in os.listdir(directory))
+
+
+def prune(size=None):
+    '''Remove least recently used entries above size (or max_bytes).'''
+    if size is None:
+        size = max_bytes
+    base = get_cache_dir('reopen')
+    entries = []
+    for name in os.listdir(base):
+        path = os.path.join(base, name)
+        header = os.path.join(path, HEADER)
+        if os.path.isfile(header):
+            entries.append((os.path.getmtime(header), _entry_size(path),
+                            path))
+    entries.sort(reverse=True)
+    total = 0
+    for used, nbytes, path in entries:
+        total += nbytes
+        if total > size:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def submit_build(filename, callback=None, errback=None):
+    '''
+    Fill the cache entry of filename in a worker process, unless it is
+    filled, already being filled or failed before.
+
+    callback(directory) is called in the GUI thread once the entry is
+    filled, errback(error) if it could not be. Both are called at once if
+    there is nothing to do (callback with None if the cache is disabled or
+    the entry failed before).
+    '''
+    if not enabled:
+        if callback is not None:
+            callback(None)
+        return
+    key = cache_key(filename)
+    directory = os.path.join(get_cache_dir('reopen', False), key)
+    if key in _failed or os.path.isfile(os.path.join(directory, HEADER)):
+        if callback is not None:
+            callback(None if key in _failed else directory)
+        return
+    if key in _building:
+        _building[key].append((callback, errback))
+        return
+    _building[key] = [(callback, errback)]
+
+    def finished(directory):
+        for callback, errback in _building.pop(key, []):
+            if callback is not None:
+                callback(directory)
+
+    def failed(error):
+        print("Caching %s failed:\n%s" % (filename, error), file=log.error)
+        _failed.add(key)
+        for callback, errback in _building.pop(key, []):
+            if errback is not None:
+                errback(error)
+
+    get_job_runner().submit(
+        "Cache %s" % os.path.basename(filename), build_cache,
+        args=(filename, key), callback=finished, errback=failed)
+
+
+def read(filename, **kwargs):
+    '''
+    Read radar file, from the cache if filled for this file, else with
+    pyart.io.read(filename, **kwargs) and fill the cache in a worker
+    process, see :py:func:`submit_build`.
+    '''
+    import pyart
+    if not enabled:
+        return pyart.io.read(filename, **kwargs)
+    key = cache_key(filename)
+    directory = os.path.join(get_cache_dir('reopen'), key)
+    header = os.path.join(directory, HEADER)
+    if os.path.isfile(header):
+        try:
+            radar = read_radar(directory)
+            # recently used for prune
+            os.utime(header, None)
+            print("Read %s from cache" % filename, file=log.debug)
+            return radar
+        except Exception:
+            import traceback
+            print(traceback.format_exc(), file=log.error)
+            shutil.rmtree(directory, ignore_errors=True)
+    radar = pyart.io.read(filename, **kwargs)
+    submit_build(filename)
+    return radar
@@ -0,0 +1,326 @@
+"""
+result_cache.py
+
+Content addressed on-disk cache of correction results (pyart field dicts),
+so re-running a correction with the same parameters on the same data reads
+the result instead of recomputing it.
+"""
+
+from __future__ import print_function
+import os
+import json
+import hashlib
+import traceback
+
+import numpy as np
+
+from .core import log
+from . import sidecar
+from .batch import step_parameters
+from .jobs import get_job_runner
+from .save_service import int16_scaling
+
+CACHE_EXT = '.nc'
+
+
+def _digest_array(sha, array):
+    '''Update sha with data and mask of array.'''
+    array = np.ma.asarray(array)
+    sha.update(str((array.dtype.str, array.shape)).encode('utf-8'))
+    sha.update(np.ascontiguousarray(np.ma.getdata(array)).data)
+    sha.update(np.packbits(np.ma.getmaskarray(array)).data)
+
+
+def make_key(func, parameters, radar=None, input_fields=(),
+             gatefilter=None):
+    '''
+    Return hex key of a computation.
+
+    Parameters
+    ----------
+    func : callable
+        pyart function, identified by module and name.
+    parameters : dict
+        Keyword arguments, runtime objects (radar, gatefilter) are ignored,
+        see :py:func:`~artview.core.batch.step_parameters`.
+    radar : Radar or None
+        Input radar, its file key (if read from a file) and the content of
+        input_fields are part of the key.
+    input_fields : list of str
+        Fields of radar used by the computation.
+    gatefilter : GateFilter or None
+        Excluded gates are part of the key.
+    '''
+    import pyart
+    sha = hashlib.sha1()
+    header = {'func': func.__module__ + '.' + func.__name__,
+              'pyart': pyart.__version__,
+              'parameters': step_parameters(parameters),
+              'input_fields': list(input_fields)}
+    filename = getattr(radar, 'filename', None)
+    if filename is not None and os.path.isfile(filename):
+        # cheap file identity, the input fields content is hashed below
+        header['file_key'] = sidecar.file_key(filename)
+    sha.update(json.dumps(header, sort_keys=True, default=str).encode('utf-8'))
+    # fields may have been edited after reading, hash the actual content
+    for field in input_fields:
+        if radar is not None and field in radar.fields:
+            _digest_array(sha, radar.fields[field]['data'])
+    if gatefilter is not None:
+        sha.update(np.packbits(gatefilter.gate_excluded).data)
+    return sha.hexdigest()
+
+
+def _json_metadata(field_dic):
+    '''Json serializable metadata of a field dict.'''
+    metadata = {}
+    for key, value in field_dic.items():
+        if key == 'data':
+            continue
+        if isinstance(value, np.ndarray):
+            value = value.tolist()
+        elif isinstance(value, np.generic):
+            value = value.item()
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        metadata[key] = value
+    return metadata
+
+
+class ResultCache(object):
+    '''
+    Directory of cached results, one netCDF file per key.
+
+    Field data is stored as float32 or as int16 scaled to the data range
+    (``packing='int16'``, about 1/65000 of the range resolution). The
+    least recently used entries are removed when the total size exceeds
+    max_bytes.
+
+    Parameters
+    ----------
+    directory : str or None
+        Cache directory, None uses ``results`` in the ARTview cache
+        directory.
+    max_bytes : int
+        Size cap of the cache.
+    packing : 'float32' or 'int16'
+        Storage of floating point data.
+    '''
+
+    def __init__(self, directory=None, max_bytes=2 * 2 ** 30,
+                 packing='float32'):
+        if directory is None:
+            directory = sidecar.get_cache_dir('results')
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.packing = packing
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CACHE_EXT)
+
+    def get(self, key):
+        '''Return cached result for key, or None.'''
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return None
+        try:
+            result = self._read(path)
+        except Exception:
+            print(traceback.format_exc(), file=log.debug)
+            return None
+        os.utime(path, None)  # mark as recently used
+        return result
+
+    def put(self, key, result):
+        '''
+        Store result (field dict, array or tuple of them) for key and
+        evict old entries if needed.
+        '''
+        path = self._path(key)
+        tmp = path + '.tmp%i' % os.getpid()
+        try:
+            self._write(tmp, result)
+            os.rename(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self.evict()
+
+    def evict(self):
+        '''Remove least recently used entries above max_bytes.'''
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_EXT):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(entry[1] for entry in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        '''Remove all entries.'''
+        for name in os.listdir(self.directory):
+            if name.endswith(CACHE_EXT):
+                os.remove(os.path.join(self.directory, name))
+
+    ######################
+    #   netCDF storage   #
+    ######################
+
+    def _write(self, path, result):
+        from netCDF4 import Dataset
+        if isinstance(result, tuple):
+            items, kind = result, 'tuple'
+        else:
+            items, kind = (result, ), 'single'
+        layout = {'kind': kind, 'items': []}
+        with Dataset(path, 'w') as dataset:
+            for n, item in enumerate(items):
+                name = 'item%i' % n
+                if isinstance(item, dict):
+                    array = np.ma.asarray(item['data'])
+                    layout['items'].append(
+                        {'type': 'field', 'metadata': _json_metadata(item),
+                         'dtype': array.dtype.str})
+                else:
+                    array = np.ma.asarray(item)
+                    layout['items'].append({'type': 'array',
+                                            'dtype': array.dtype.str})
+                self._write_array(dataset, name, array)
+            dataset.artview_layout = json.dumps(layout)
+
+    def _write_array(self, dataset, name, array):
+        dims = []
+        for i, size in enumerate(array.shape):
+            dim = '%s_dim%i' % (name, i)
+            dataset.createDimension(dim, size)
+            dims.append(dim)
+        if array.dtype == bool:
+            var = dataset.createVariable(name, 'u1', dims, zlib=True)
+            var[:] = np.ma.getdata(array).astype('u1')
+        elif array.dtype.kind == 'f' and self.packing == 'int16':
+            var = dataset.createVariable(name, 'i2', dims, zlib=True,
+                                         fill_value=-32768)
+            var.scale_factor, var.add_offset = int16_scaling(array)
+            var[:] = np.ma.masked_invalid(array)
+        elif array.dtype.kind == 'f':
+            var = dataset.createVariable(name, 'f4', dims, zlib=True,
+                                         fill_value=np.float32(-9999.))
+            var[:] = np.ma.masked_invalid(array.astype(np.float32))
+        else:
+            var = dataset.createVariable(name, array.dtype, dims, zlib=True)
+            var[:] = np.ma.getdata(array)
+            if np.ma.getmask(array) is not np.ma.nomask:
+                mask = dataset.createVariable(name + '_mask', 'u1', dims,
+                                              zlib=True)
+                mask[:] = np.ma.getmaskarray(array).astype('u1')
+
+    def _read(self, path):
+        from netCDF4 import Dataset
+        with Dataset(path, 'r') as dataset:
+            layout = json.loads(dataset.artview_layout)
+            items = []
+            for n, info in enumerate(layout['items']):
+                name = 'item%i' % n
+                var = dataset.variables[name]
+                data = var[:]
+                dtype = np.dtype(info['dtype'])
+                if dtype == bool:
+                    data = np.ma.getdata(data).astype(bool)
+                elif dtype.kind == 'f':
+                    data = np.ma.asarray(data).astype(np.float32)
+                else:
+                    data = np.ma.getdata(data).astype(dtype)
+                    if name + '_mask' in dataset.variables:
+                        mask = dataset.variables[name + '_mask'][:]
+                        data = np.ma.array(data, mask=mask.astype(bool))
+                if info['type'] == 'field':
+                    item = dict(info['metadata'])
+                    item['data'] = data
+                else:
+                    item = data
+                items.append(item)
+        if layout['kind'] == 'tuple':
+            return tuple(items)
+        return items[0]
+
+
+_cache = None
+
+
+def get_result_cache():
+    '''Return the ResultCache shared by all components.'''
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
+
+
+def _cached_call(cache, func, kwargs, radar, input_fields, gatefilter,
+                 bypass):
+    '''
+    Return the cached result of func(**kwargs) or compute and cache it,
+    executed in the worker process so neither hashing the inputs nor
+    writing the cache blocks the GUI.
+    '''
+    key = None
+    if not bypass:
+        try:
+            key = make_key(func, kwargs, radar, input_fields, gatefilter)
+            result = cache.get(key)
+        except Exception:
+            print(traceback.format_exc(), file=log.debug)
+            key, result = None, None
+        if result is not None:
+            return result
+    result = func(**kwargs)
+    if key is not None:
+        try:
+            cache.put(key, result)
+        except Exception:
+            print(traceback.format_exc(), file=log.debug)
+    return result
+
+
+def submit_cached(name, func, kwargs, callback, radar=None, input_fields=(),
+                  gatefilter=None, bypass=False):
+    '''
+    Submit func(**kwargs) to the :py:class:`~artview.core.jobs.JobRunner`,
+    the worker reads the result from the cache or computes and caches it,
+    and callback receives it.
+
+    Parameters
+    ----------
+    name : str
+        Job name.
+    func, kwargs : callable and dict
+        Computation.
+    callback : callable
+        Receives the result.
+    radar, input_fields, gatefilter :
+        Inputs of the computation, see :py:func:`make_key`.
+    bypass : bool
+        If True the cache is neither read nor written.
+
+    Returns
+    -------
+    job : :py:class:`~artview.core.jobs.Job`
+    '''
+    return get_job_runner().submit(
+        name, _cached_call,
+        args=(get_result_cache(), func, kwargs, radar, input_fields,
+              gatefilter, bypass),
+        callback=callback)
@@ -0,0 +1,190 @@
+"""
+save_service.py
+
+Save radars and grids in a worker process, so large volumes do not block
+the GUI, with per field compression and packing options.
+"""
+
+from __future__ import print_function
+import os
+import copy
+
+import numpy as np
+
+from .core import log
+from .jobs import get_job_runner, report_progress
+
+PACKINGS = ('native', 'float32', 'int16')
+''' storage of floating point field data '''
+
+DEFAULT_OPTIONS = {'zlib': 4, 'packing': 'native'}
+''' field options when not set in :py:data:`field_options` '''
+
+field_options = {}
+''' session wide save options by field name: dict with 'zlib' (0, no
+compression, to 9) and 'packing' (one of :py:data:`PACKINGS`) '''
+
+# attributes handled by the field writer
+_SPECIAL_KEYS = ('data', '_FillValue', '_Write_as_dtype', 'scale_factor',
+                 'add_offset')
+
+
+def get_field_options(field):
+    '''Return save options of field.'''
+    options = dict(DEFAULT_OPTIONS)
+    options.update(field_options.get(field, {}))
+    return options
+
+
+def int16_scaling(array):
+    '''
+    Return scale_factor and add_offset packing the valid range of array in
+    int16, -32768 is left for the fill value.
+    '''
+    valid = np.ma.masked_invalid(array).compressed()
+    if valid.size:
+        vmin, vmax = float(valid.min()), float(valid.max())
+    else:
+        vmin, vmax = 0., 0.
+    scale = (vmax - vmin) / 65532. or 1.
+    return scale, vmin + 32766 * scale
+
+
+def write_field(dataset, name, field, dimensions, zlib=4, packing='native'):
+    '''
+    Create variable name in netCDF4 dataset from pyart field dict.
+
+    Parameters
+    ----------
+    dataset : netCDF4.Dataset
+        Open dataset, with the dimensions defined.
+    name : str
+        Variable name.
+    field : dict
+        Field dict, its metadata are written as attributes.
+    dimensions : tuple of str
+        Variable dimensions, data with less dimensions (grid fields,
+        without time) is written in the first step of the leading ones.
+    zlib : int
+        Compression level, 0 for none.
+    packing : 'native', 'float32' or 'int16'
+        Storage of floating point data, int16 is scaled to the data range.
+    '''
+    data = np.ma.masked_invalid(np.ma.asarray(field['data']))
+    while data.ndim < len(dimensions):
+        # as pyart write_grid, else the unlimited time grows to nz
+        data = data[np.newaxis]
+    fill_value = field.get('_FillValue', None)
+    scaling = None
+    if data.dtype.kind == 'f' and packing == 'int16':
+        dtype = 'i2'
+        fill_value = np.int16(-32768)
+        scaling = int16_scaling(data)
+    elif data.dtype.kind == 'f' and packing == 'float32':
+        dtype = 'f4'
+        if fill_value is None:
+            fill_value = -9999.
+        fill_value = np.float32(fill_value)
+    else:
+        dtype = field.get('_Write_as_dtype', data.dtype)
+        if 'scale_factor' in field or 'add_offset' in field:
+            scaling = (field.get('scale_factor', 1.),
+                       field.get('add_offset', 0.))
+    if zlib:
+        var = dataset.createVariable(name, dtype, dimensions, zlib=True,
+                                     complevel=int(zlib),
+                                     fill_value=fill_value)
+    else:
+        var = dataset.createVariable(name, dtype, dimensions,
+                                     fill_value=fill_value)
+    for key, value in field.items():
+        if key not in _SPECIAL_KEYS:
+            var.setncattr(key, value)
+    if scaling is not None:
+        # set before the data, so netCDF4 packs on assignment
+        var.scale_factor, var.add_offset = scaling
+    var[:] = data
+    return var
+
+
+def _write(write, dimensions, filename, container, options):
+    '''
+    Write container with fields removed using pyart write function, then
+    append the fields with their options. The file is written as
+    filename + '.tmp' and renamed when complete, so an interrupted save
+    never leaves a truncated filename.
+    '''
+    from netCDF4 import Dataset
+    fields = container.fields
+    shell = copy.copy(container)
+    shell.fields = {}
+    tmp = filename + '.tmp'
+    try:
+        write(tmp, shell, format='NETCDF4')
+        report_progress(1. / (len(fields) + 1))
+        with Dataset(tmp, 'a') as dataset:
+            for n, (name, field) in enumerate(fields.items()):
+                write_field(dataset, name, field, dimensions,
+                            **options.get(name, DEFAULT_OPTIONS))
+                report_progress((n + 2.) / (len(fields) + 1))
+        os.replace(tmp, filename)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return filename
+
+
+def write_radar(filename, radar, options=None):
+    '''
+    Write radar as CfRadial, options are field save options by field name
+    (see :py:data:`field_options`).
+    '''
+    import pyart
+    return _write(pyart.io.write_cfradial, ('time', 'range'), filename,
+                  radar, options or {})
+
+
+def write_grid(filename, grid, options=None):
+    '''Write grid as pyart grid netCDF, see :py:func:`write_radar`.'''
+    import pyart
+    return _write(pyart.io.write_grid, ('time', 'z', 'y', 'x'), filename,
+                  grid, options or {})
+
+
+def submit_save(filename, container, callback=None, errback=None):
+    '''
+    Save radar or grid in a worker process using the session
+    :py:data:`field_options`.
+
+    The job starts at once (see
+    :py:meth:`~artview.core.jobs.JobRunner.submit`), so it writes the
+    container as it is now and the caller may keep changing it. It is not
+    a daemon, quitting waits for the save to finish.
+
+    Parameters
+    ----------
+    filename : str
+        Output path.
+    container : Radar or Grid
+        Object to save.
+    callback : callable or None
+        Called with filename when saved, by default it is logged.
+
+    Returns
+    -------
+    job : :py:class:`~artview.core.jobs.Job`
+    '''
+    import pyart
+    if isinstance(container, pyart.core.Grid):
+        func = write_grid
+    else:
+        func = write_radar
+    options = dict((field, get_field_options(field))
+                   for field in container.fields)
+    if callback is None:
+        def callback(filename):
+            print("Saved %s" % filename, file=log.info)
+    return get_job_runner().submit(
+        "Save %s" % os.path.basename(filename), func,
+        args=(filename, container, options), callback=callback,
+        errback=errback, immediate=True, daemon=False)
@@ -0,0 +1,301 @@
+"""
+session.py
+
+Save the open components, how their shared variables are linked and the
+variable values that can be stored (fields, tilts, limits, colormaps, file
+paths of radars and grids, gatefilter sidecars) to a json file, and restore
+them.
+
+Restoring is lazy: components are created at once with empty radars, the
+radar and grid files are read in worker jobs and each variable is set, so
+each display draws, as soon as its file is ready.
+"""
+
+from __future__ import print_function
+import os
+import json
+import inspect
+import importlib
+
+import numpy as np
+
+from .core import log, Variable, componentsList
+from .jobs import get_job_runner
+from . import sidecar, delta, reopen_cache
+
+SESSION_VERSION = 1
+
+
+def _json_default(value):
+    '''Json encoding of numpy values.'''
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(repr(value))
+
+
+def _is_radar(value):
+    return hasattr(value, 'nrays') and hasattr(value, 'fields')
+
+
+def _is_grid(value):
+    return (hasattr(value, 'nx') and hasattr(value, 'nz') and
+            hasattr(value, 'fields'))
+
+
+def encode_value(value, save_sidecars=False):
+    '''
+    Return json entry of a Variable value, or None if it can not be
+    stored. Radars and grids are stored by filename, gatefilters by the
+    sidecar of their radar file, which is only written if save_sidecars
+    (else gatefilters without sidecar are not stored).
+    '''
+    if _is_radar(value) or _is_grid(value):
+        filename = getattr(value, 'filename', None)
+        if filename is None:
+            return None
+        return {'type': 'radar' if _is_radar(value) else 'grid',
+                'filename': os.path.abspath(filename)}
+    if isinstance(value, list) and value and all(map(_is_radar, value)):
+        if not all(getattr(radar, 'filename', None) for radar in value):
+            return None
+        return {'type': 'radars',
+                'filenames': [os.path.abspath(r.filename) for r in value]}
+    radar = getattr(value, '_radar', None)
+    if hasattr(value, 'gate_excluded') and _is_radar(radar):
+        if getattr(radar, 'filename', None) is None:
+            return None
+        if save_sidecars:
+            path = sidecar.save_gatefilter(radar, value)
+        else:
+            path = sidecar.find_sidecar(radar.filename)
+        if path is None:
+            return None
+        return {'type': 'gatefilter',
+                'filename': os.path.abspath(radar.filename),
+                'sidecar': os.path.abspath(path)}
+    try:
+        value = json.loads(json.dumps(value, default=_json_default))
+    except (TypeError, ValueError):
+        return None
+    return {'type': 'json', 'value': value}
+
+
+def save_session(filename, components=None, save_sidecars=False):
+    '''
+    Save components (default all in
+    :py:data:`~artview.core.core.componentsList`) to json file filename,
+    see :py:func:`encode_value` for save_sidecars.
+    '''
+    if components is None:
+        components = componentsList
+    variables = []  # distinct Variable instances, index is the json id
+    entries = []
+    for component in components:
+        links = {}
+        for key, var in component.get_sharedVariables().items():
+            for n, known in enumerate(variables):
+                if known is var:
+                    break
+            else:
+                variables.append(var)
+                n = len(variables) - 1
+            links[key] = n
+        entry = {'class': type(component).__name__,
+                 'module': type(component).__module__,
+                 'name': component.name,
+                 'variables': links,
+                 'geometry': None}
+        if component.isWindow():
+            geometry = component.geometry()
+            entry['geometry'] = [geometry.x(), geometry.y(),
+                                 geometry.width(), geometry.height()]
+        entries.append(entry)
+    session = {'version': SESSION_VERSION,
+               'variables': [encode_value(var.value, save_sidecars)
+                             for var in variables],
+               'components': entries}
+    with open(filename, 'w') as f:
+        json.dump(session, f, indent=1)
+    print("Saved session %s" % filename, file=log.info)
+
+
+def _init_args(cls):
+    try:
+        return inspect.getfullargspec(cls.__init__).args
+    except AttributeError:  # python 2
+        return inspect.getargspec(cls.__init__).args
+
+
+def _relink(component, key, var):
+    '''Replace shared variable key of component by var.'''
+    component.disconnectSharedVariable(key)
+    setattr(component, key, var)
+    component.connectSharedVariable(key)
+    var.update()
+
+
+def _read_grid(filename):
+    '''Read grid in full, so it can be sent back from the worker.'''
+    import pyart
+    return pyart.io.read_grid(filename)
+
+
+class _RadarLoader(object):
+    '''
+    Read each radar or grid file once in a worker job and pass the Radar
+    or Grid to the setters waiting for it.
+    '''
+
+    def __init__(self):
+        self.setters = {}
+        self.radars = {}
+        self.grids = {}
+
+    def request(self, filename, setter):
+        if filename in self.radars:
+            setter(self.radars[filename])
+            return
+        if filename in self.setters:
+            self.setters[filename].append(setter)
+            return
+        self.setters[filename] = [setter]
+        reopen_cache.submit_build(
+            filename, callback=lambda result: self._ready(filename),
+            errback=lambda error: self._ready(filename))
+
+    def _ready(self, filename):
+        '''Read radar, from the reopen cache once filled, and set it.'''
+        try:
+            radar = reopen_cache.read(filename, delay_field_loading=True)
+        except Exception:
+            import traceback
+            print(traceback.format_exc(), file=log.error)
+            self.setters.pop(filename, None)
+            return
+        radar.filename = filename
+        delta.load_delta(radar)
+        self.radars[filename] = radar
+        for setter in self.setters.pop(filename, []):
+            setter(radar)
+
+    def request_grid(self, filename, setter):
+        if filename in self.grids:
+            setter(self.grids[filename])
+            return
+        key = ('grid', filename)
+        if key in self.setters:
+            self.setters[key].append(setter)
+            return
+        self.setters[key] = [setter]
+        get_job_runner().submit(
+            "Read %s" % os.path.basename(filename), _read_grid,
+            args=(filename,),
+            callback=lambda grid: self._grid_ready(filename, grid),
+            errback=lambda error: self._grid_ready(filename, None, error))
+
+    def _grid_ready(self, filename, grid, error=None):
+        '''Set grid read by the worker.'''
+        setters = self.setters.pop(('grid', filename), [])
+        if grid is None:
+            print(error, file=log.error)
+            return
+        grid.filename = filename
+        self.grids[filename] = grid
+        for setter in setters:
+            setter(grid)
+
+
+def _restore_value(var, entry, loader):
+    '''Set var from json entry, radars are set when read by loader.'''
+    if entry is None:
+        return
+    kind = entry['type']
+    if kind == 'json':
+        var.change(entry['value'])
+    elif kind == 'radar':
+        loader.request(entry['filename'], var.change)
+    elif kind == 'radars':
+        radars = [None] * len(entry['filenames'])
+
+        def setter(n, radar):
+            radars[n] = radar
+            if all(r is not None for r in radars):
+                var.change(list(radars))
+        for n, filename in enumerate(entry['filenames']):
+            loader.request(filename,
+                           lambda radar, n=n: setter(n, radar))
+    elif kind == 'grid':
+        loader.request_grid(entry['filename'], var.change)
+    elif kind == 'gatefilter':
+        if not os.path.isfile(entry['sidecar']):
+            print("Sidecar %s not found" % entry['sidecar'], file=log.error)
+            return
+        loader.request(entry['filename'], lambda radar:
+                       sidecar.submit_load_gatefilter(radar, var.change))
+
+
+def restore_session(filename, parent=None):
+    '''
+    Restore the session saved in json file filename.
+
+    Components of the same class and name already open are reused, others
+    are created with parent. Returns the list of restored components.
+    '''
+    with open(filename) as f:
+        session = json.load(f)
+    if session.get('version') != SESSION_VERSION:
+        raise ValueError("Unknown session version in %s" % filename)
+    entries = session['variables']
+    # json values are set before the components are created, so they draw
+    # with them; radars and gatefilters arrive later
+    variables = []
+    for entry in entries:
+        if entry is not None and entry['type'] == 'json':
+            variables.append(Variable(entry['value']))
+        else:
+            variables.append(Variable(None))
+
+    components = []
+    for entry in session['components']:
+        links = dict((key, variables[n])
+                     for key, n in entry['variables'].items())
+        component = None
+        for existing in componentsList:
+            if (type(existing).__name__ == entry['class'] and
+                    existing.name == entry['name']):
+                component = existing
+                break
+        if component is None:
+            try:
+                module = importlib.import_module(entry['module'])
+                cls = getattr(module, entry['class'])
+                args = _init_args(cls)
+                kwargs = dict((key, var) for key, var in links.items()
+                              if key in args)
+                if 'filename' in args:
+                    kwargs['filename'] = False  # no file dialog
+                if 'parent' in args:
+                    kwargs['parent'] = parent
+                component = cls(name=entry['name'], **kwargs)
+            except Exception:
+                import traceback
+                print(traceback.format_exc(), file=log.error)
+                continue
+        for key, var in links.items():
+            if key in component.sharedVariables and \
+                    getattr(component, key) is not var:
+                _relink(component, key, var)
+        if entry['geometry'] is not None and component.isWindow():
+            component.setGeometry(*entry['geometry'])
+        components.append(component)
+
+    loader = _RadarLoader()
+    # radars before gatefilters, so a gatefilter never precedes its radar
+    for kinds in (('radar', 'radars', 'grid'), ('gatefilter',)):
+        for var, entry in zip(variables, entries):
+            if entry is not None and entry['type'] in kinds:
+                _restore_value(var, entry, loader)
+    print("Restored session %s" % filename, file=log.info)
+    return components
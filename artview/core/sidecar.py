@@ -0,0 +1,256 @@
+"""
+sidecar.py
+
+Store gate masks (e.g. a GateFilter exclusion mask) in small sidecar files
+keyed to the radar file they belong to, so they can be restored without
+rewriting the radar file or recomputing the filters.
+
+Checking a sidecar hashes the whole radar file, GUI code uses
+:py:func:`submit_load_gatefilter` and :py:func:`submit_save_gatefilter` to
+do it in a worker process.
+"""
+
+from __future__ import print_function
+import os
+import json
+import time
+import hashlib
+import numpy as np
+
+from .core import log
+from .gatemask import GateMask
+from .jobs import get_job_runner
+
+SIDECAR_EXT = '.artview.npz'
+''' extension of sidecar files '''
+
+_hash_cache = {}
+
+
+def get_cache_dir(subdir='', create=True):
+    '''
+    Return ARTview cache directory, created if needed and create is True.
+
+    The base directory is the environment variable ARTVIEW_CACHE_DIR or
+    ``~/.artview/cache``.
+    '''
+    base = os.environ.get('ARTVIEW_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'), '.artview',
+                                       'cache'))
+    path = os.path.join(base, subdir)
+    if create and not os.path.isdir(path):
+        os.makedirs(path)
+    return path
+
+
+def file_key(filename):
+    '''
+    Return cheap key of file from its absolute path, modification time and
+    size, without reading it. Use :py:func:`file_hash` to identify the
+    content.
+    '''
+    stat = os.stat(filename)
+    key = '%s|%r|%i' % (os.path.abspath(filename), stat.st_mtime,
+                        stat.st_size)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def file_hash(filename, blocksize=2 ** 20):
+    '''
+    Return sha1 hex digest of file contents. Results are kept in memory
+    for the same path, modification time and size.
+    '''
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), stat.st_mtime, stat.st_size)
+    if key not in _hash_cache:
+        sha = hashlib.sha1()
+        with open(filename, 'rb') as f:
+            block = f.read(blocksize)
+            while block:
+                sha.update(block)
+                block = f.read(blocksize)
+        _hash_cache[key] = sha.hexdigest()
+    return _hash_cache[key]
+
+
+def _sidecar_paths(filename, kind, create=True):
+    '''
+    Candidate sidecar paths: next to file, then in cache directory under
+    the :py:func:`file_key` of the file.
+    '''
+    local = filename + '.' + kind + SIDECAR_EXT
+    cached = os.path.join(get_cache_dir('sidecar', create),
+                          file_key(filename) + '.' + kind + SIDECAR_EXT)
+    return [local, cached]
+
+
+def find_sidecar(filename, kind='gatefilter'):
+    '''
+    Return path of the sidecar file of filename or None, checking paths
+    only (no hashing, no directory created). It may still belong to other
+    file content, see :py:func:`load_mask`.
+    '''
+    if not os.path.isfile(filename):
+        return None
+    for path in _sidecar_paths(filename, kind, create=False):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def has_sidecar(filename, kind='gatefilter'):
+    '''
+    Return whether a sidecar file exists for filename, see
+    :py:func:`find_sidecar`.
+    '''
+    return find_sidecar(filename, kind) is not None
+
+
+def save_mask(filename, mask, kind='gatefilter', provenance=None,
+              location='auto'):
+    '''
+    Save a :py:class:`~artview.core.gatemask.GateMask` as sidecar of a
+    radar file.
+
+    Parameters
+    ----------
+    filename : str
+        Radar file the mask belongs to.
+    mask : GateMask
+        Mask to save.
+    kind : str
+        Name of the sidecar, allow several sidecars per file.
+    provenance : dict or None
+        Json serializable information on how the mask was created (e.g.
+        {'filterscript': [...]}).
+    location : 'auto', 'local' or 'cache'
+        'local' writes next to filename, 'cache' in the cache directory and
+        'auto' tries local and falls back to cache.
+
+    Returns
+    -------
+    path : str
+        Path of the written sidecar.
+    '''
+    digest = file_hash(filename)
+    info = dict(provenance or {})
+    info.update({'file': os.path.basename(filename),
+                 'file_hash': digest,
+                 'kind': kind,
+                 'created': time.strftime('%Y-%m-%dT%H:%M:%S')})
+    local, cached = _sidecar_paths(filename, kind)
+    if location == 'local':
+        paths = [local]
+    elif location == 'cache':
+        paths = [cached]
+    else:
+        paths = [local, cached]
+
+    for i, path in enumerate(paths):
+        try:
+            with open(path, 'wb') as f:
+                np.savez(f, packed=mask.packed,
+                         shape=np.array(mask.shape, dtype=np.int64),
+                         provenance=np.array(json.dumps(info)))
+            return path
+        except (IOError, OSError):
+            if i == len(paths) - 1:
+                raise
+
+
+def load_mask(filename, kind='gatefilter'):
+    '''
+    Load sidecar mask of a radar file.
+
+    Returns
+    -------
+    mask, provenance : GateMask and dict, or None if there is no sidecar
+        for this file content.
+    '''
+    if not has_sidecar(filename, kind):
+        # files are hashed only if there is a sidecar to check
+        return None
+    digest = file_hash(filename)
+    for path in _sidecar_paths(filename, kind, create=False):
+        if not os.path.isfile(path):
+            continue
+        with np.load(path) as npz:
+            info = json.loads(str(npz['provenance']))
+            if info.get('file_hash') != digest:
+                continue
+            mask = GateMask(tuple(npz['shape']), npz['packed'])
+        return mask, info
+    return None
+
+
+def save_gatefilter(radar, gatefilter, filterscript=None, **kwargs):
+    '''
+    Save excluded gates of gatefilter as sidecar of radar.filename, see
+    :py:func:`save_mask`.
+    '''
+    provenance = {'filterscript': list(filterscript or [])}
+    return save_mask(radar.filename, GateMask.from_gatefilter(gatefilter),
+                     provenance=provenance, **kwargs)
+
+
+def submit_save_gatefilter(radar, gatefilter, filterscript=None,
+                           callback=None, errback=None, **kwargs):
+    '''
+    Save gatefilter as sidecar of radar.filename in a worker process, see
+    :py:func:`save_gatefilter`. callback receives the written path,
+    errback the traceback. Returns the Job.
+    '''
+    provenance = {'filterscript': list(filterscript or [])}
+    kwargs['provenance'] = provenance
+    return get_job_runner().submit(
+        "Save sidecar of %s" % os.path.basename(radar.filename), save_mask,
+        args=(radar.filename, GateMask.from_gatefilter(gatefilter)),
+        kwargs=kwargs, callback=callback, errback=errback)
+
+
+def _to_gatefilter(radar, result):
+    '''GateFilter of radar from load_mask result, or None.'''
+    if result is None:
+        return None
+    mask, provenance = result
+    if mask.shape != (radar.nrays, radar.ngates):
+        return None
+    gatefilter = mask.to_gatefilter(radar)
+    gatefilter.sidecar_provenance = provenance
+    return gatefilter
+
+
+def load_gatefilter(radar):
+    '''
+    Return a pyart GateFilter for radar restored from its sidecar, or None.
+    The provenance is attached to the GateFilter as ``sidecar_provenance``.
+    '''
+    filename = getattr(radar, 'filename', None)
+    if filename is None:
+        return None
+    return _to_gatefilter(radar, load_mask(filename, 'gatefilter'))
+
+
+def submit_load_gatefilter(radar, callback):
+    '''
+    Restore the GateFilter of radar from its sidecar in a worker process,
+    see :py:func:`load_gatefilter`. callback(gatefilter) is called only if
+    the sidecar matches the file content. Returns the Job, or None if radar
+    has no sidecar (checked without hashing).
+    '''
+    filename = getattr(radar, 'filename', None)
+    if filename is None or not has_sidecar(filename):
+        return None
+
+    def finished(result):
+        gatefilter = _to_gatefilter(radar, result)
+        if gatefilter is not None:
+            callback(gatefilter)
+
+    def failed(error):
+        print("Loading sidecar of %s failed:\n%s" % (filename, error),
+              file=log.error)
+
+    return get_job_runner().submit(
+        "Load sidecar of %s" % os.path.basename(filename), load_mask,
+        args=(filename, 'gatefilter'), callback=finished, errback=failed)
@@ -0,0 +1,351 @@
+"""
+statistics.py
+
+Single pass statistics, mergeable percentile sketch and cached histograms
+used in region analysis.
+"""
+
+import numpy as np
+
+from .journal import radar_version
+
+CHUNK_SIZE = 2 ** 20  #: number of values processed at once
+
+
+class FineHistogram(object):
+    '''
+    Mergeable histogram sketch of fixed width bins.
+
+    Bin ``i`` covers ``[i * width, (i + 1) * width)``, so two sketches with
+    the same (or power of two related) width can always be merged. The bins
+    are stored densely between the first and last non empty bin; if that
+    would take more than ``max_bins`` the width is doubled as many times as
+    needed. Percentiles and histograms of any bin count are derived from
+    this base histogram, with an error bounded by ``width``.
+    '''
+
+    def __init__(self, width=0.01, max_bins=2 ** 20):
+        self.width = float(width)
+        self.max_bins = max_bins
+        self.offset = 0  #: index of first stored bin
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def count(self):
+        ''' Number of values in histogram. '''
+        return int(self.counts.sum())
+
+    def _coarsen(self, factor):
+        '''Multiply width by factor (a power of two).'''
+        if factor == 1:
+            return
+        self.width = self.width * factor
+        if self.counts.size == 0:
+            return
+        index = np.arange(self.offset, self.offset + self.counts.size,
+                          dtype=np.int64) // factor
+        start = index[0]
+        self.counts = np.bincount(index - start, weights=self.counts
+                                  ).astype(np.int64)
+        self.offset = int(start)
+
+    def _fit(self, lo, hi):
+        '''Coarsen so that the data range [lo, hi] fits in max_bins.'''
+        if self.counts.size:
+            lo = min(lo, self.offset * self.width)
+            hi = max(hi, (self.offset + self.counts.size) * self.width)
+        factor = 1
+        while True:
+            width = self.width * factor
+            nbins = np.floor(hi / width) - np.floor(lo / width) + 1
+            if (nbins <= self.max_bins and
+                    max(abs(lo), abs(hi)) / width < 2. ** 52):
+                break
+            factor = factor * 2
+        self._coarsen(factor)
+
+    def _extend(self, lo, hi):
+        '''Grow stored bins to cover bin indexes lo to hi.'''
+        if self.counts.size == 0:
+            self.offset = lo
+            self.counts = np.zeros(hi - lo + 1, dtype=np.int64)
+            return
+        end = self.offset + self.counts.size - 1
+        if lo >= self.offset and hi <= end:
+            return
+        lo = min(lo, self.offset)
+        hi = max(hi, end)
+        counts = np.zeros(hi - lo + 1, dtype=np.int64)
+        counts[self.offset - lo:self.offset - lo + self.counts.size] = \
+            self.counts
+        self.offset = lo
+        self.counts = counts
+
+    def add(self, values):
+        '''Add a 1D array of finite float values to the histogram.'''
+        if values.size == 0:
+            return
+        self._fit(float(values.min()), float(values.max()))
+        index = np.floor(values / self.width).astype(np.int64)
+        lo = int(index.min())
+        hi = int(index.max())
+        self._extend(lo, hi)
+        self.counts[lo - self.offset:hi - self.offset + 1] += np.bincount(
+            index - lo, minlength=hi - lo + 1)
+
+    def merge(self, other):
+        '''Merge other FineHistogram into this one.'''
+        if other.counts.size == 0:
+            return
+        other = other.copy()
+        ratio = other.width / self.width
+        if ratio > 1:
+            self._coarsen(int(round(ratio)))
+        elif ratio < 1:
+            other._coarsen(int(round(1. / ratio)))
+        if not np.isclose(self.width, other.width):
+            raise ValueError("Histogram widths are not power of two related")
+        self._fit(other.offset * other.width,
+                  (other.offset + other.counts.size) * other.width)
+        other._coarsen(int(round(self.width / other.width)))
+        lo = other.offset
+        hi = other.offset + other.counts.size - 1
+        self._extend(lo, hi)
+        self.counts[lo - self.offset:hi - self.offset + 1] += other.counts
+
+    def copy(self):
+        ''' Return a copy of the histogram. '''
+        new = FineHistogram(self.width, self.max_bins)
+        new.offset = self.offset
+        new.counts = self.counts.copy()
+        return new
+
+    def percentile(self, q):
+        '''
+        Approximate q-th percentile (0 to 100) by linear interpolation
+        inside the base bins.
+        '''
+        total = self.count
+        if total == 0:
+            return np.nan
+        target = total * q / 100.
+        cumulative = np.cumsum(self.counts)
+        i = int(np.searchsorted(cumulative, target))
+        i = min(i, self.counts.size - 1)
+        before = cumulative[i] - self.counts[i]
+        fraction = (target - before) / self.counts[i] if self.counts[i] else 0
+        return (self.offset + i + fraction) * self.width
+
+    def rank_bin(self, k):
+        '''Return index of the bin holding the k-th (from 0) smallest value.'''
+        cumulative = np.cumsum(self.counts)
+        i = int(np.searchsorted(cumulative, k, side='right'))
+        return self.offset + min(i, self.counts.size - 1)
+
+    def histogram(self, bins, range):
+        '''
+        Histogram with bins number of equal bins over range (min, max) as
+        :py:func:`numpy.histogram`, computed by rebinning the base bins.
+
+        Returns
+        -------
+        counts, edges : arrays
+        '''
+        vmin, vmax = float(range[0]), float(range[1])
+        edges = np.linspace(vmin, vmax, bins + 1)
+        if self.counts.size == 0 or vmax <= vmin:
+            return np.zeros(bins, dtype=np.int64), edges
+        lower = (np.arange(self.counts.size) + self.offset) * self.width
+        centers = lower + 0.5 * self.width
+        # bins overlapping [vmin, vmax], the bin of vmax included as in
+        # numpy.histogram
+        inside = (lower <= vmax) & (lower + self.width > vmin) & \
+            (self.counts > 0)
+        index = ((centers[inside] - vmin) * (bins / (vmax - vmin))).astype(
+            np.int64)
+        np.clip(index, 0, bins - 1, out=index)
+        counts = np.bincount(index, weights=self.counts[inside],
+                             minlength=bins).astype(np.int64)
+        return counts, edges
+
+
+class ArrayStatistics(object):
+    '''
+    Statistics of an array computed in one pass over chunks of data.
+
+    Moments are accumulated with the pairwise update of Chan et al., so
+    ArrayStatistics of different arrays can be merged exactly, percentiles
+    and histograms come from a :py:class:`FineHistogram`. Masked and non
+    finite values are ignored.
+
+    If exact_median the arrays given to :py:meth:`update` are kept (not
+    copied) and :py:attr:`median` is exact rather than interpolated in the
+    histogram bins: a second pass selects only the values of the base bins
+    holding the middle ranks. The arrays must not be edited in between.
+    '''
+
+    def __init__(self, data=None, width=0.01, exact_median=False):
+        self.n = 0
+        self.mean = 0.
+        self.m2 = 0.
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.sketch = FineHistogram(width)
+        self.exact_median = exact_median
+        self._arrays = []
+        self._median = None
+        if data is not None:
+            self.update(data)
+
+    def update(self, data):
+        '''Add values of array (masked or not) to the statistics.'''
+        for values in _valid_chunks(data):
+            self._add(values)
+        if self.exact_median:
+            self._arrays.append(data)
+            self._median = None
+
+    def _add(self, values):
+        n = values.size
+        if n == 0:
+            return
+        mean = values.mean()
+        deviation = values - mean
+        m2 = np.dot(deviation, deviation)
+        self._merge_moments(n, mean, m2, values.min(), values.max())
+        self.sketch.add(values)
+
+    def _merge_moments(self, n, mean, m2, minimum, maximum):
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * n / total
+        self.n = total
+        self.minimum = min(self.minimum, minimum)
+        self.maximum = max(self.maximum, maximum)
+
+    def merge(self, other):
+        '''Merge other ArrayStatistics into this one.'''
+        if other.n == 0:
+            return
+        self._merge_moments(other.n, other.mean, other.m2,
+                            other.minimum, other.maximum)
+        self.sketch.merge(other.sketch)
+        if self.exact_median:
+            if not other.exact_median:
+                # values of other are unknown, fall back to the sketch
+                self.exact_median = False
+                self._arrays = []
+            else:
+                self._arrays.extend(other._arrays)
+                self._median = None
+
+    @property
+    def variance(self):
+        ''' Population variance (as numpy var). '''
+        if self.n == 0:
+            return np.nan
+        return self.m2 / self.n
+
+    @property
+    def std(self):
+        ''' Population standard deviation (as numpy std). '''
+        return np.sqrt(self.variance)
+
+    def percentile(self, q):
+        '''Approximate q-th percentile, bounded by exact min and max.'''
+        if self.n == 0:
+            return np.nan
+        return min(max(self.sketch.percentile(q), self.minimum),
+                   self.maximum)
+
+    @property
+    def median(self):
+        ''' Median, approximate unless exact_median. '''
+        if self.exact_median and self.n:
+            if self._median is None:
+                ranks = sorted({(self.n - 1) // 2, self.n // 2})
+                self._median = float(np.mean(self._select(ranks)))
+            return self._median
+        return self.percentile(50)
+
+    def _select(self, ranks):
+        '''Return the values of the given ranks (from 0) of kept arrays.'''
+        # one bin of margin on each side, indexes of values near bin edges
+        # may round differently after the sketch was coarsened
+        lo = self.sketch.rank_bin(ranks[0]) - 1
+        hi = self.sketch.rank_bin(ranks[-1]) + 1
+        below = 0
+        selected = []
+        for data in self._arrays:
+            for values in _valid_chunks(data):
+                index = np.floor(values / self.sketch.width)
+                below += int(np.count_nonzero(index < lo))
+                selected.append(values[(index >= lo) & (index <= hi)])
+        selected = np.concatenate(selected)
+        ranks = [rank - below for rank in ranks]
+        if ranks[0] < 0 or ranks[-1] >= selected.size:
+            raise ValueError("Kept arrays changed since statistics update")
+        return np.partition(selected, ranks)[ranks]
+
+    def histogram(self, bins=25, range=None):
+        '''Histogram of the values, see :py:meth:`FineHistogram.histogram`.'''
+        if range is None:
+            range = (self.minimum, self.maximum)
+        return self.sketch.histogram(bins, range)
+
+    def as_dict(self):
+        '''Return the dictionary of statistics used in ARTview dialogs.'''
+        statdict = {}
+        statdict['Minimum'] = self.minimum if self.n else np.nan
+        statdict['Maximum'] = self.maximum if self.n else np.nan
+        statdict['Mean'] = self.mean if self.n else np.nan
+        statdict['Median'] = self.median
+        statdict['Standard_Deviation'] = self.std
+        statdict['Variance'] = self.variance
+        return statdict
+
+
+def _valid_chunks(data):
+    '''Yield float64 arrays of the unmasked finite values of data.'''
+    data = np.ma.ravel(data)
+    for start in range(0, data.size, CHUNK_SIZE):
+        chunk = data[start:start + CHUNK_SIZE]
+        values = np.ma.getdata(chunk)
+        if chunk.mask is not np.ma.nomask:
+            values = values[~np.ma.getmaskarray(chunk)]
+        values = values.astype(np.float64)
+        yield values[np.isfinite(values)]
+
+
+class StatisticsCache(object):
+    '''
+    Keep :py:class:`ArrayStatistics` of the fields of a
+    :py:class:`~artview.core.points.Points` instance, recomputing only when
+    the Points instance, the field data array or the edit version of the
+    radar the points were taken from (see
+    :py:func:`~artview.core.journal.radar_version`) changes. The median is
+    exact.
+    '''
+
+    def __init__(self):
+        self.points = None
+        self.stats = {}
+
+    def get(self, points, field):
+        '''Return ArrayStatistics of field in points.'''
+        if points is not self.points:
+            self.points = points
+            self.stats = {}
+        data = points.fields[field]['data']
+        version = radar_version(getattr(points, 'source', None))
+        if (field not in self.stats or self.stats[field][0] is not data or
+                self.stats[field][1] != version):
+            self.stats[field] = (data, version,
+                                 ArrayStatistics(data, exact_median=True))
+        return self.stats[field][2]
+
+    def clear(self):
+        ''' Drop all cached statistics. '''
+        self.points = None
+        self.stats = {}
@@ -0,0 +1,43 @@
+"""
+sweep.py
+
+Helpers to run volume algorithms on a single sweep, used by the sweep
+preview of correction plugins.
+"""
+
+import numpy as np
+
+PREVIEW_SUFFIX = '_preview'
+''' appended to a field name for its single sweep preview field '''
+
+
+def extract_sweep(radar, sweep, gatefilter=None):
+    '''
+    Return a radar holding only sweep (see
+    :py:meth:`pyart.core.Radar.extract_sweeps`) and the matching part of
+    gatefilter (or None).
+    '''
+    import pyart
+    sweep_radar = radar.extract_sweeps([sweep])
+    sweep_gatefilter = None
+    if gatefilter is not None:
+        sweep_gatefilter = pyart.filters.GateFilter(sweep_radar,
+                                                    exclude_based=True)
+        sweep_gatefilter._gate_excluded = \
+            gatefilter.gate_excluded[radar.get_slice(sweep)].copy()
+    return sweep_radar, sweep_gatefilter
+
+
+def paste_sweep_field(radar, name, field, sweep):
+    '''
+    Add field dict computed for a single sweep to radar as field name,
+    gates of other sweeps are masked.
+    '''
+    sweep_data = np.ma.asarray(field['data'])
+    data = np.ma.masked_all((radar.nrays, radar.ngates),
+                            dtype=sweep_data.dtype)
+    data[radar.get_slice(sweep)] = sweep_data
+    field_dic = dict((key, value) for key, value in field.items()
+                     if key != 'data')
+    field_dic['data'] = data
+    radar.add_field(name, field_dic, replace_existing=True)
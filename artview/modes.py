@@ -87,7 +87,7 @@ def radar_mode():
 
     from .core.core import suggestName
     radar = RadarDisplay(name=suggestName(RadarDisplay), Vradar=menu.Vradar,
-                         parent=menu)
+                         Vgatefilter=menu.Vgatefilter, parent=menu)
     radar.add_mode(display_select_region, "Select a Region of Interest")
     window.addComponent(radar)
 
@@ -116,6 +116,7 @@ def map_to_grid_mode():
         [FileNavigator, RadarDisplay, Mapper, GridDisplay],
         [
             ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
             # link component 1 (RadarDisplay) Vradar to
             # component 0 (FileNavigator) Vradar
             ((1, 'Vradar'), (2, 'Vradar')),
@@ -129,6 +130,7 @@ def compare_fields_mode():
         [FileNavigator, RadarDisplay, RadarDisplay],
         [
             ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
             ((1, 'Vradar'), (2, 'Vradar')),
             ((1, 'Vtilt'), (2, 'Vtilt')),
             ]
@@ -137,7 +139,8 @@ def compare_fields_mode():
 def corrections_mode():
     change_mode(
         [FileNavigator, RadarDisplay],
-        [((0, 'Vradar'), (1, 'Vradar')),]
+        [((0, 'Vradar'), (1, 'Vradar')),
+         ((0, 'Vgatefilter'), (1, 'Vgatefilter')),]
         )
 
     static_comp_list = componentsList[:]
@@ -169,6 +172,7 @@ def gatefilter_mode():
         [FileNavigator, RadarDisplay, GateFilter],
         [
             ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
             ((1, 'Vradar'), (2, 'Vradar')),
             ((1, 'Vgatefilter'), (2, 'Vgatefilter')),
             ]
@@ -179,6 +183,7 @@ def select_region_mode():
         [FileNavigator, RadarDisplay, SelectRegion],
         [
             ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
             ((1, 'VplotAxes'), (2, 'VplotAxes')),
             ((1, 'Vfield'), (2, 'Vfield')),
             ((1, 'VpathInteriorFunc'), (2, 'VpathInteriorFunc')),
@@ -223,6 +228,7 @@ def extract_points_mode():
         [FileNavigator, RadarDisplay, SelectRegion, PointsDisplay],
         [
             ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
             ((1, 'VplotAxes'), (2, 'VplotAxes')),
             ((1, 'Vfield'), (2, 'Vfield')),
             ((1, 'VpathInteriorFunc'), (2, 'VpathInteriorFunc')),
@@ -239,6 +245,7 @@ def map_to_grid_mode():
         [FileNavigator, RadarDisplay, GridDisplay, Mapper],
         [
             ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
             ((1, 'Vradar'), (3, 'Vradar')),
             ((3, 'Vgrid'), (2, 'Vgrid')),
             ((1, 'Vfield'), (2, 'Vfield')),
@@ -250,6 +257,7 @@ def manual_unfold_mode():
         [FileNavigator, RadarDisplay, SelectRegion, ManualUnfold],
         [
             ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
             ((1, 'VplotAxes'), (2, 'VplotAxes')),
             ((1, 'Vfield'), (2, 'Vfield')),
             ((1, 'VpathInteriorFunc'), (2, 'VpathInteriorFunc')),
@@ -265,6 +273,7 @@ def manual_filter_mode():
         [FileNavigator, RadarDisplay, SelectRegion, ManualEdit, PointsDisplay],
         [
             ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
             ((1, 'VplotAxes'), (2, 'VplotAxes')),
             ((1, 'Vfield'), (2, 'Vfield')),
             ((1, 'VpathInteriorFunc'), (2, 'VpathInteriorFunc')),
@@ -301,6 +310,7 @@ def despeckle_mode():
         [FileNavigator, RadarDisplay, Despeckle],
         [
             ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
             ((1, 'Vradar'), (2, 'Vradar')),
             ((1, 'Vfield'), (2, 'Vfield')),
             ((1, 'Vgatefilter'), (2, 'Vgatefilter')),
@@ -322,6 +332,7 @@ def topography_mode():
         [FileNavigator, RadarDisplay, TopographyBackground],
         [
             ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
             ((1, 'VpyartDisplay'), (2, 'VpyartDisplay')),
             ]
         )
@@ -331,6 +342,7 @@ def background_mode():
         [FileNavigator, RadarDisplay, ImageBackground],
         [
             ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
             ((1, 'VpyartDisplay'), (2, 'VpyartDisplay')),
             ((1, 'Vradar'), (2, 'Vradar')),
             ((1, 'VplotAxes'), (2, 'VplotAxes')),
@@ -342,6 +354,7 @@ def correlation_mode():
     [FileNavigator, Correlation],
     [
         ((0, 'Vradar'), (1, 'Vradar')),
+        ((0, 'Vfilelist'), (1, 'Vfilelist')),
         ]
     )
 
@@ -350,6 +363,7 @@ def radar_terminal_mode():
     [FileNavigator, RadarDisplay, RadarTerminal],
     [
         ((0, 'Vradar'), (1, 'Vradar')),
+            ((0, 'Vgatefilter'), (1, 'Vgatefilter')),
         ((1, 'Vradar'), (2, 'Vradar')),
         ]
     )
@@ -205,6 +205,7 @@ correlation_mode = (
     [Menu, Correlation],
     [
         ((0, 'Vradar'), (1, 'Vradar')),
+        ((0, 'Vfilelist'), (1, 'Vfilelist')),
         ]
     )
 
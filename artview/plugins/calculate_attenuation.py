@@ -7,10 +7,9 @@ from functools import partial
 
 import pyart
 from pyart.config import get_field_name
-import time
 
 from ..core import (Component, Variable, common, QtWidgets, QtGui,
-                    QtCore, VariableChoose)
+                    QtCore, VariableChoose, submit_cached)
 
 import os
 
@@ -68,6 +67,12 @@ class CalculateAttenuation(Component):
                                                 triggered=self.setParameters))
         self.configMenu.addAction(QtWidgets.QAction("Help", self,
                                                 triggered=self._displayHelp))
+        self.configMenu.addAction(QtWidgets.QAction(
+            "Add to Batch Pipeline", self, triggered=self.exportPipelineStep))
+        self.bypassCache = QtWidgets.QAction("Bypass Result Cache", self)
+        self.bypassCache.setCheckable(True)
+        self.bypassCache.setToolTip("Always compute, ignoring cached results")
+        self.configMenu.addAction(self.bypassCache)
         self.parameters = {
             "radar": None,
             "z_offset": 0,
@@ -130,25 +135,35 @@ class CalculateAttenuation(Component):
 
         print(self.parameters)
 
-        # execute
+        # use cached result or execute in a worker process, fields are added
+        # when done
         print("Correcting ..")
-        t0 = time.time()
-        try:
-            spec_at, cor_z = pyart.correct.calculate_attenuation(**self.parameters)
-        except:
-            import traceback
-            error = traceback.format_exc()
-            common.ShowLongText("Py-ART fails with following error\n\n" +
-                                error)
-        t1 = time.time()
-        print(("Correction took %fs" % (t1-t0)))
+        submit_cached(
+            self.name, pyart.correct.calculate_attenuation,
+            self.parameters.copy(),
+            partial(self._addFields, self.Vradar.value,
+                    self.parameters['spec_at_field'],
+                    self.parameters['corr_refl_field']),
+            radar=self.Vradar.value,
+            input_fields=[self.parameters[key] for key in
+                          ('refl_field', 'ncp_field', 'rhv_field',
+                           'phidp_field')],
+            bypass=self.bypassCache.isChecked())
+
+    def _addFields(self, radar, spec_at_field_name, corr_refl_field_name,
+                   result):
+        '''
+        Job callback, add corrected fields to radar with the names chosen
+        when the job was submitted.
+        '''
+        if radar is not self.Vradar.value:
+            common.ShowWarning("Radar changed, correction discarded.")
+            return
+        spec_at, cor_z = result
 
         # verify field overwriting
-        spec_at_field_name = self.parameters['spec_at_field']
-        corr_refl_field_name = self.parameters['corr_refl_field']
-
         strong_update = False  # insertion is weak, overwrite strong
-        if spec_at_field_name in self.Vradar.value.fields.keys():
+        if spec_at_field_name in radar.fields.keys():
             resp = common.ShowQuestion(
                 "Field %s already exists! Do you want to over write it?" %
                 spec_at_field_name)
@@ -157,7 +172,7 @@ class CalculateAttenuation(Component):
             else:
                 strong_update = True
 
-        if corr_refl_field_name in self.Vradar.value.fields.keys():
+        if corr_refl_field_name in radar.fields.keys():
             resp = common.ShowQuestion(
                 "Field %s already exists! Do you want to over write it?" %
                 corr_refl_field_name)
@@ -167,10 +182,9 @@ class CalculateAttenuation(Component):
                 strong_update = True
 
         # add fields and update
-        self.Vradar.value.add_field(spec_at_field_name, spec_at, True)
-        self.Vradar.value.add_field(corr_refl_field_name, cor_z, True)
+        radar.add_field(spec_at_field_name, spec_at, True)
+        radar.add_field(corr_refl_field_name, cor_z, True)
         self.Vradar.update(strong_update)
-        print("Correction took %fs" % (t1-t0))
 
     def setParameters(self):
         '''Open set parameters dialog.'''
@@ -178,6 +192,11 @@ class CalculateAttenuation(Component):
         for key in parm.keys():
             self.parameters[key] = parm[key]
 
+    def exportPipelineStep(self):
+        '''Append current parameters to a batch pipeline spec file.'''
+        common.export_pipeline_step(self, "calculate_attenuation",
+                                    self.parameters)
+
     def _displayHelp(self):
         '''Display Py-Art's docstring for help.'''
         common.ShowLongText(pyart.correct.calculate_attenuation.__doc__)
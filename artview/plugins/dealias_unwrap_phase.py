@@ -6,11 +6,11 @@ from functools import partial
 
 import pyart
 from pyart.config import get_field_name
-import time
 import os
 
 from ..core import (Component, Variable, common, QtWidgets, QtGui,
-                    QtCore, VariableChoose)
+                    QtCore, VariableChoose, submit_cached,
+                    get_job_runner, sweep)
 
 class DealiasUnwrapPhase(Component):
     '''
@@ -19,6 +19,7 @@ class DealiasUnwrapPhase(Component):
 
     Vradar = None  #: see :ref:`shared_variable`
     Vgatefilter = None  #: see :ref:`shared_variable`
+    Vtilt = None  #: see :ref:`shared_variable`
 
     @classmethod
     def guiStart(self, parent=None):
@@ -28,7 +29,7 @@ class DealiasUnwrapPhase(Component):
         kwargs['parent'] = parent
         return self(**kwargs), independent
 
-    def __init__(self, Vradar=None, Vgatefilter=None,
+    def __init__(self, Vradar=None, Vgatefilter=None, Vtilt=None,
                  name="DealiasUnwrapPhase", parent=None):
         '''Initialize the class to create the interface.
 
@@ -38,6 +39,12 @@ class DealiasUnwrapPhase(Component):
         Vradar : :py:class:`~artview.core.core.Variable` instance
             Radar signal variable.
             A value of None initializes an empty Variable.
+        Vgatefilter : :py:class:`~artview.core.core.Variable` instance
+            GateFilter signal variable.
+            A value of None initializes an empty Variable.
+        Vtilt : :py:class:`~artview.core.core.Variable` instance
+            Tilt signal variable, sweep used by the preview.
+            A value of None initializes a Variable with value 0.
         name : string
             Field Radiobutton window name.
         parent : PyQt instance
@@ -53,6 +60,12 @@ class DealiasUnwrapPhase(Component):
         self.despeckleButton.clicked.connect(self.dealias_unwrap_phase)
         self.layout.addWidget(self.despeckleButton, 0, 0)
 
+        self.previewButton = QtWidgets.QPushButton("Preview Sweep")
+        self.previewButton.setToolTip(
+            "Correct only the current tilt, into a temporary field")
+        self.previewButton.clicked.connect(self.previewSweep)
+        self.layout.addWidget(self.previewButton, 1, 0)
+
         parentdir = os.path.abspath(os.path.join(os.path.dirname(__file__),
                                                  os.pardir))
         config_icon = QtGui.QIcon(os.sep.join(
@@ -66,6 +79,12 @@ class DealiasUnwrapPhase(Component):
                                                 triggered=self.setParameters))
         self.configMenu.addAction(QtWidgets.QAction("Help", self,
                                                 triggered=self._displayHelp))
+        self.configMenu.addAction(QtWidgets.QAction(
+            "Add to Batch Pipeline", self, triggered=self.exportPipelineStep))
+        self.bypassCache = QtWidgets.QAction("Bypass Result Cache", self)
+        self.bypassCache.setCheckable(True)
+        self.bypassCache.setToolTip("Always compute, ignoring cached results")
+        self.configMenu.addAction(self.bypassCache)
         self.parameters = {
             "radar": None,
             "gatefilter": None,
@@ -103,8 +122,14 @@ class DealiasUnwrapPhase(Component):
         else:
             self.Vgatefilter = Vgatefilter
 
+        if Vtilt is None:
+            self.Vtilt = Variable(0)
+        else:
+            self.Vtilt = Vtilt
+
         self.sharedVariables = {"Vradar": None,
-                                "Vgatefilter": None}
+                                "Vgatefilter": None,
+                                "Vtilt": None}
         self.connectAllVariables()
 
         self.show()
@@ -123,27 +148,71 @@ class DealiasUnwrapPhase(Component):
         self.parameters['gatefilter'] = self.Vgatefilter.value
         print(self.parameters)
 
-        # execute
+        # use cached result or execute in a worker process, field is added
+        # when done
         print("Correcting ..")
-        t0 = time.time()
-        try:
-            field = pyart.correct.dealias_unwrap_phase(**self.parameters)
-        except:
-            import traceback
-            error = traceback.format_exc()
-            common.ShowLongText("Py-ART fails with following error\n\n" +
-                                error)
-        t1 = time.time()
-        print(("Correction took %fs" % (t1-t0)))
+        submit_cached(
+            self.name, pyart.correct.dealias_unwrap_phase,
+            self.parameters.copy(),
+            partial(self._addField, self.Vradar.value,
+                    self._correctedFieldName()),
+            radar=self.Vradar.value,
+            input_fields=[self.parameters['vel_field']],
+            gatefilter=self.Vgatefilter.value,
+            bypass=self.bypassCache.isChecked())
+
+    def _correctedFieldName(self):
+        if self.parameters['corr_vel_field'] is None:
+            return "dealiased_velocity"
+        return self.parameters['corr_vel_field']
+
+    def previewSweep(self):
+        '''
+        Execute :py:func:`~pyart.correct.dealias_unwrap_phase` on the sweep in
+        Vtilt only, the result is added to Vradar as a temporary preview
+        field.
+        '''
+        radar = self.Vradar.value
+        if radar is None:
+            common.ShowWarning("Radar is None, can not perform correction.")
+            return
+        tilt = self.Vtilt.value
+        if tilt is None or tilt < 0 or tilt >= radar.nsweeps:
+            tilt = 0
+        sweep_radar, sweep_gatefilter = sweep.extract_sweep(
+            radar, tilt, self.Vgatefilter.value)
+        parameters = self.parameters.copy()
+        parameters['radar'] = sweep_radar
+        parameters['gatefilter'] = sweep_gatefilter
+        get_job_runner().submit(
+            self.name + " (tilt %i)" % tilt, pyart.correct.dealias_unwrap_phase,
+            kwargs=parameters,
+            callback=partial(self._addPreviewField, radar, tilt,
+                             self._correctedFieldName()))
+
+    def _addPreviewField(self, radar, tilt, name, field):
+        '''Job callback, paste corrected sweep in preview field of name.'''
+        if radar is not self.Vradar.value:
+            return
+        name = name + sweep.PREVIEW_SUFFIX
+        strong_update = name in radar.fields
+        sweep.paste_sweep_field(radar, name, field, tilt)
+        self.statusBar().showMessage(
+            "Preview of tilt %i in field %s" % (tilt, name), 5000)
+        self.Vradar.update(strong_update)
 
-        # verify field overwriting
-        if args['corr_vel_field'] is None:
-            name = "dealiased_velocity"
-        else:
-            name = args['corr_vel_field']
+    def _addField(self, radar, name, field):
+        '''
+        Job callback, add corrected field to radar as name (chosen when the
+        job was submitted).
+        '''
+        if radar is not self.Vradar.value:
+            common.ShowWarning("Radar changed, correction discarded.")
+            return
 
+        # verify field overwriting
         strong_update = False  # insertion is weak, overwrite strong
-        if name in self.Vradar.value.fields.keys():
+        if name in radar.fields.keys():
             resp = common.ShowQuestion(
                 "Field %s already exists! Do you want to over write it?" %
                 name)
@@ -152,11 +221,12 @@ class DealiasUnwrapPhase(Component):
             else:
                 strong_update = True
 
-        # add fields and update
-        self.Vradar.value.add_field(name, field, True)
-        self.Vradar.value.changed = True
+        # add fields and update, the full volume replaces the preview
+        radar.add_field(name, field, True)
+        if radar.fields.pop(name + sweep.PREVIEW_SUFFIX, None) is not None:
+            strong_update = True
+        radar.changed = True
         self.Vradar.update(strong_update)
-        print("Correction took %fs" % (t1-t0))
 
     def setParameters(self):
         '''Open set parameters dialog.'''
@@ -164,6 +234,11 @@ class DealiasUnwrapPhase(Component):
         for key in parm.keys():
             self.parameters[key] = parm[key]
 
+    def exportPipelineStep(self):
+        '''Append current parameters to a batch pipeline spec file.'''
+        common.export_pipeline_step(self, "dealias_unwrap_phase",
+                                    self.parameters)
+
     def _displayHelp(self):
         '''Display Py-Art's docstring for help.'''
         common.ShowLongText(pyart.correct.dealias_unwrap_phase.__doc__)
@@ -5,6 +5,10 @@ despeckle.py
 
 # Load the needed packages
 
+import hashlib
+from collections import OrderedDict
+from functools import partial
+
 import pyart
 import numpy as np
 # from netCDF4 import Dataset
@@ -16,7 +20,8 @@ import os
 
 
 from ..core import (Component, Variable, common, QtWidgets, QtCore, QtGui,
-                    componentsList)
+                    componentsList, get_job_runner)
+from ..core.journal import radar_version
 
 
 class Despeckle(Component):
@@ -91,9 +96,17 @@ class Despeckle(Component):
                                triggered=self.addObjectsField)
         action.setToolTip("Identify Object and add as field to radar")
         self.configMenu.addAction(action)
+        self.configMenu.addAction(QtWidgets.QAction(
+            "Add to Batch Pipeline", self, triggered=self.exportPipelineStep))
 
         self.layout.setColumnStretch(0, 1)
 
+        # object labels of recent (radar, field, threshold, delta,
+        # gatefilter), shared by despeckle and addObjectsField
+        self._labels = OrderedDict()
+        self.maxLabels = 4
+        self._lastOutput = None
+
 
 #        self.applyButton = QtWidgets.QPushButton("Apply")
 #        self.applyButton.clicked.connect(self.apply)
@@ -138,15 +151,80 @@ class Despeckle(Component):
             return
 
         gatefilter = self.Vgatefilter.value
+        base = self._baseExcluded(gatefilter)
+        size = self.parameters['size']
+        # labels are cached, a change of size only repeats the size filter
+        self._withLabels(radar, field, base,
+                         partial(self._setGatefilter, radar, base, size))
+
+    def _baseExcluded(self, gatefilter):
+        '''
+        Return excluded gates of gatefilter before despeckle. If gatefilter
+        is the unchanged output of the last despeckle its input is returned,
+        so despeckling again replaces the speckles instead of accumulating.
+        '''
+        if gatefilter is None:
+            return None
+        if self._lastOutput is not None:
+            output, excluded, base = self._lastOutput
+            if gatefilter is output and gatefilter._gate_excluded is excluded:
+                return base
+        return gatefilter.gate_excluded.copy()
+
+    def _threshold(self):
         if self.parameters['threshold_max'] == 'Inf':
-            threshold = self.parameters['threshold_min']
+            return self.parameters['threshold_min']
         else:
-            threshold = (self.parameters['threshold_min'],
-                         self.parameters['threshold_max'])
-        gatefilter = pyart.correct.despeckle_field(
-            radar, field, label_dict=None, threshold=threshold,
-            size=self.parameters['size'],
-            gatefilter=gatefilter, delta=self.parameters['delta'])
+            return (self.parameters['threshold_min'],
+                    float(self.parameters['threshold_max']))
+
+    def _withLabels(self, radar, field, base, callback):
+        '''
+        Call callback with the object labels of field (the label dict of
+        :py:func:`pyart.correct.find_objects`), from the cache or computed
+        in a worker process.
+        '''
+        threshold = self._threshold()
+        delta = self.parameters['delta']
+        data = radar.fields[field]['data']
+        if base is None:
+            gatefilter_key = None
+        else:
+            gatefilter_key = hashlib.sha1(np.packbits(base).data).hexdigest()
+        key = (id(radar), radar_version(radar), field, id(data),
+               str(threshold), delta, gatefilter_key)
+        if key in self._labels:
+            self._labels[key] = self._labels.pop(key)  # most recently used
+            callback(self._labels[key][1])
+            return
+
+        def store(label_dict):
+            # keep data referenced so its id is not reused
+            self._labels[key] = (data, label_dict)
+            while len(self._labels) > self.maxLabels:
+                self._labels.popitem(last=False)
+            callback(label_dict)
+
+        get_job_runner().submit(
+            self.name, _find_objects,
+            args=(radar, field, threshold, base, delta),
+            callback=store)
+
+    def _setGatefilter(self, radar, base, size, label_dict):
+        '''Exclude objects smaller than size from base excluded gates.'''
+        if radar is not self.Vradar.value:
+            common.ShowWarning("Radar changed, despeckle discarded.")
+            return
+        labels = np.ma.filled(label_dict['data'], 0).astype(np.intp)
+        counts = np.bincount(labels.ravel())
+        speckle = counts < size
+        speckle[0] = False  # not part of any object
+        excluded = speckle[labels]
+        if base is not None:
+            excluded |= base
+        gatefilter = pyart.filters.GateFilter(radar, exclude_based=True)
+        gatefilter._gate_excluded = excluded
+        self._lastOutput = (gatefilter, excluded, base)
         self.Vgatefilter.change(gatefilter)
 
     def addObjectsField(self):
@@ -181,17 +259,26 @@ class Despeckle(Component):
             else:
                 strong_update = True
 
-        if self.parameters['threshold_max'] == 'Inf':
-            threshold = self.parameters['threshold_min']
-        else:
-            threshold = (self.parameters['threshold_min'],
-                         self.parameters['threshold_max'])
-        label_dict = pyart.correct.find_objects(
-            radar, field, threshold=threshold,
-            gatefilter=gatefilter, delta=self.parameters['delta'])
-        radar.add_field(objects, label_dict, True)
+        base = self._baseExcluded(gatefilter)
+        self._withLabels(radar, field, base, partial(
+            self._addLabels, radar, objects, strong_update))
+
+    def _addLabels(self, radar, objects, strong_update, label_dict):
+        '''Add label dict to radar as field objects.'''
+        if radar is not self.Vradar.value:
+            common.ShowWarning("Radar changed, object field discarded.")
+            return
+        field_dic = dict(label_dict)
+        field_dic['data'] = label_dict['data'].copy()
+        radar.add_field(objects, field_dic, True)
         self.Vradar.update(strong_update)
 
+    def exportPipelineStep(self):
+        '''Append current parameters to a batch pipeline spec file.'''
+        parameters = dict(self.parameters)
+        parameters['field'] = self.Vfield.value
+        common.export_pipeline_step(self, "despeckle", parameters)
+
     def change_field(self):
         '''Slot from menu to change field.'''
         action = self.field_radio_group.checkedAction()
@@ -296,4 +383,17 @@ class Despeckle(Component):
             self.parameters['delta'] = float(ent_delta.text())
 
 
+def _find_objects(radar, field, threshold, excluded, delta):
+    '''
+    Run :py:func:`pyart.correct.find_objects` with the gates in excluded
+    (or None) filtered, as in a worker process.
+    '''
+    gatefilter = None
+    if excluded is not None:
+        gatefilter = pyart.filters.GateFilter(radar, exclude_based=True)
+        gatefilter._gate_excluded = excluded
+    return pyart.correct.find_objects(
+        radar, field, threshold=threshold, gatefilter=gatefilter, delta=delta)
+
+
 _plugins = [Despeckle]
@@ -9,7 +9,9 @@ import numpy as np
 import pyart
 import time
 
-from ..core import Component, Variable, common, QtWidgets, QtCore, componentsList
+from ..core import (Component, Variable, common, QtWidgets, QtCore,
+                    componentsList, GateMask, sidecar, FilterPipeline,
+                    FILTER_OPERATORS, submit_save, log)
 from ..components import RadarDisplay
 
 
@@ -20,6 +22,10 @@ class GateFilter(Component):
 
     Vradar = None  #: see :ref:`shared_variable`
     Vgatefilter = None  #: see :ref:`shared_variable`
+    Vtilt = None  #: see :ref:`shared_variable`
+
+    # emitted from the background filtering thread
+    filterDone = QtCore.pyqtSignal(object, name="FilterDone")
 
     @classmethod
     def guiStart(self, parent=None):
@@ -29,7 +35,7 @@ class GateFilter(Component):
         kwargs['parent'] = parent
         return self(**kwargs), independent
 
-    def __init__(self, Vradar=None, Vgatefilter=None,
+    def __init__(self, Vradar=None, Vgatefilter=None, Vtilt=None,
                  name="GateFilter", parent=None):
         '''Initialize the class to create the interface.
 
@@ -42,6 +48,9 @@ class GateFilter(Component):
         Vgatefilter : :py:class:`~artview.core.core.Variable` instance
             GateFilter signal variable.
             A value of None initializes an empty Variable.
+        Vtilt : :py:class:`~artview.core.core.Variable` instance
+            Tilt signal variable, live preview is computed for this tilt.
+            A value of None initializes a Variable with value 0.
         name : string
             GateFilter instance window name.
         parent : PyQt instance
@@ -65,21 +74,34 @@ class GateFilter(Component):
         else:
             self.Vgatefilter = Vgatefilter
 
-        self.sharedVariables = {"Vradar": None,
-                                "Vgatefilter": None, }
+        if Vtilt is None:
+            self.Vtilt = Variable(0)
+        else:
+            self.Vtilt = Vtilt
+
+        self.sharedVariables = {"Vradar": self.NewRadar,
+                                "Vgatefilter": self.NewGatefilter,
+                                "Vtilt": self.NewTilt, }
         # Connect the components
         self.connectAllVariables()
         self.field = None
 
-        self.operators = {"=": "exclude_equal",
-                          "!=": "exclude_not_equal",
-                          "<": "exclude_below",
-                          "<=": "exclude_below",
-                          ">": "exclude_above",
-                          ">=": "exclude_above",
-                          "inside": "exclude_inside",
-                          "outside": "exclude_outside",
-                          }
+        self.operators = FILTER_OPERATORS
+
+        # cached criteria masks and lazy snapshots of modified field masks
+        self.pipeline = FilterPipeline(self.Vradar.value)
+        self.original_masks = {}
+
+        # live preview is debounced, only the last edit is evaluated
+        self.previewTimer = QtCore.QTimer(self)
+        self.previewTimer.setSingleShot(True)
+        self.previewTimer.setInterval(300)
+        self.previewTimer.timeout.connect(self.preview)
+        # results of superseded background filtering are discarded
+        self._filterGeneration = 0
+        self.filterDone.connect(self._filterFinished)
+        # live preview GateFilter, drawn by the display over Vgatefilter
+        self._previewGatefilter = None
 
         self.generalLayout = QtWidgets.QVBoxLayout()
         # Set the Variable layout
@@ -140,11 +162,30 @@ class GateFilter(Component):
         self.saveButton.setToolTip('Save cfRadial data file')
         gBox_layout.addWidget(self.saveButton, 0, 2, 1, 1)
 
+        self.sidecarButton = QtWidgets.QPushButton("Save Sidecar")
+        self.sidecarButton.clicked.connect(self.saveSidecar)
+        self.sidecarButton.setToolTip(
+            'Save GateFilter next to the radar file, it is restored when '
+            'the file is opened again')
+        gBox_layout.addWidget(self.sidecarButton, 1, 2, 1, 1)
+
         self.restoreButton = QtWidgets.QPushButton("Restore to Original")
         self.restoreButton.clicked.connect(self.restoreRadar)
         self.restoreButton.setToolTip('Remove applied filters')
         gBox_layout.addWidget(self.restoreButton, 0, 3, 1, 1)
 
+        self.previewCheck = QtWidgets.QCheckBox("Live Preview")
+        self.previewCheck.setToolTip(
+            'Filter the displayed sweep while editing the thresholds')
+        self.previewCheck.stateChanged.connect(self._schedulePreview)
+        gBox_layout.addWidget(self.previewCheck, 1, 0, 1, 2)
+
+        self.exportButton = QtWidgets.QPushButton("Add to Batch")
+        self.exportButton.clicked.connect(self.exportPipelineStep)
+        self.exportButton.setToolTip(
+            'Add active filters as a step of a batch pipeline spec')
+        gBox_layout.addWidget(self.exportButton, 1, 3, 1, 1)
+
         self.filterButton = QtWidgets.QPushButton("Filter")
         self.filterButton.clicked.connect(self.apply_filters)
         self.filterButton.setToolTip('Make Filter')
@@ -194,6 +235,12 @@ class GateFilter(Component):
                 gBox_layout.addWidget(loval[nn], nn+1, 3, 1, 1)
                 gBox_layout.addWidget(hival[nn], nn+1, 4, 1, 1)
 
+                chkactive[nn].stateChanged.connect(self._schedulePreview)
+                operator[nn].currentIndexChanged.connect(
+                    self._schedulePreview)
+                loval[nn].textChanged.connect(self._schedulePreview)
+                hival[nn].textChanged.connect(self._schedulePreview)
+
             self.fieldfilter["check_active"] = chkactive
             self.fieldfilter["field"] = fldlab
             self.fieldfilter["operator"] = operator
@@ -219,12 +266,16 @@ class GateFilter(Component):
         Vradar = getattr(self.DispChoiceList[selection], str("Vradar"))
         Vgatefilter = getattr(self.DispChoiceList[selection],
                               str("Vgatefilter"))
+        Vtilt = getattr(self.DispChoiceList[selection], str("Vtilt"),
+                        self.Vtilt)
 
         self.dispCombo.setCurrentIndex(selection)
+        self.display = self.DispChoiceList[selection]
 
         self.disconnectAllVariables()
         self.Vradar = Vradar
         self.Vgatefilter = Vgatefilter
+        self.Vtilt = Vtilt
         self.connectAllVariables()
 
     def _displayHelp(self):
@@ -244,10 +295,17 @@ class GateFilter(Component):
             "results. It is turned on by default. To check see "
             "'Display Options' dropdown menu on the Display of interest.<br>"
             "<br>"
+            "<i>Live Preview:</i><br>"
+            "  With 'Live Preview' checked the displayed sweep is filtered "
+            "while the thresholds are edited, other sweeps are filtered "
+            "when the 'Filter' button is clicked.<br><br>"
             "<i>Change Radar variables:</i><br>"
             "  Click the 'Find Variable', select variable.<br><br>"
             "<i>Show Python script for batching:</i><br>"
             "  Click the 'Show Script' button.<br><br>"
+            "<i>Keep the filter without saving the radar:</i><br>"
+            "  Click the 'Save Sidecar' button, the GateFilter is restored "
+            "next time the same file is opened.<br><br>"
             "The following information is from the Py-ART documentation.<br>"
             "<br>"
             "<b>WARNING</b>: By saving the file, the mask associated with "
@@ -309,6 +367,9 @@ class GateFilter(Component):
             return
         else:
             for field in self.Vradar.value.fields.keys():
+                if field not in self.original_masks:
+                    self.original_masks[field] = GateMask.from_field(
+                        self.Vradar.value.fields[field]['data'])
                 self.Vradar.value.fields[field]['data'] = np.ma.array(
                     self.Vradar.value.fields[field]['data'],
                     mask=self.Vgatefilter.value._gate_excluded)
@@ -326,163 +387,261 @@ class GateFilter(Component):
 #                     self.Vradar.value.fields[field]['_FillValue'],
 #                     self.Vradar.value.fields[field]['data'].data)
 
-            pyart.io.write_cfradial(filename, self.Vradar.value)
-            print("Saved %s" % (filename))
+            submit_save(filename, self.Vradar.value)
+
+    def exportPipelineStep(self):
+        '''Append active filters to a batch pipeline spec file.'''
+        criteria, filterscript = self._getCriteria()
+        if not criteria:
+            common.ShowWarning("Please Activate Filter(s)")
+            return
+        common.export_pipeline_step(self, "gatefilter",
+                                    {'criteria': criteria})
+
+    def saveSidecar(self):
+        '''Save current GateFilter as sidecar file of the radar file.'''
+        if (self.Vradar.value is None or self.Vgatefilter.value is None or
+                getattr(self.Vradar.value, 'filename', None) is None):
+            common.ShowWarning("Must apply filter first.")
+            return
+        sidecar.submit_save_gatefilter(
+            self.Vradar.value, self.Vgatefilter.value,
+            getattr(self, 'filterscript', None),
+            callback=lambda path: print("Saved %s" % path, file=log.info),
+            errback=lambda error: common.ShowLongText(
+                "Saving sidecar fails with following error\n\n" + error))
+
+    def NewRadar(self, variable, strong):
+        '''
+        Slot for 'ValueChanged' signal of
+        :py:class:`Vradar <artview.core.core.Variable>`.
+
+        This will:
+
+        * Discard running filtering, remove or recompute live preview
+        '''
+        # a running filtering or preview was made for the previous radar
+        # (or field values)
+        self._filterGeneration += 1
+        self.statusBar().clearMessage()
+        radar = self.Vradar.value
+        if radar is None:
+            self._setPreview(None)
+            return
+        if radar is not self.pipeline.radar:
+            self._setPreview(None)
+            self.pipeline.set_radar(radar)
+            self.original_masks = {}
+        elif self._previewGatefilter is not None:
+            self._schedulePreview()  # fields may have been edited
+
+    def NewGatefilter(self, variable, strong):
+        '''
+        Slot for 'ValueChanged' signal of
+        :py:class:`Vgatefilter <artview.core.core.Variable>`.
+
+        This will:
+
+        * Keep the filter script of a GateFilter restored from a sidecar
+          file (the file readers restore it, see
+          :py:func:`~artview.core.sidecar.submit_load_gatefilter`)
+        '''
+        provenance = getattr(variable.value, 'sidecar_provenance', None)
+        if provenance is not None:
+            self.filterscript = provenance.get('filterscript', [])
+
+    def NewTilt(self, variable, strong):
+        '''
+        Slot for 'ValueChanged' signal of
+        :py:class:`Vtilt <artview.core.core.Variable>`.
+
+        This will:
+
+        * Update live preview, if active
+        '''
+        if self._previewGatefilter is not None:
+            self._schedulePreview()
 
     def restoreRadar(self):
         '''Remove applied filters by restoring original mask'''
-        for field in self.Vradar.value.fields.keys():
-            self.Vradar.value.fields[field]['data'] = np.ma.array(
-                self.Vradar.value.fields[field]['data'],
-                mask=self.original_masks[field])
-        self.Vgatefilter.value._gate_excluded = self.original_masks[field]
-        self.Vgatefilter.update(True)
+        radar = self.Vradar.value
+        if radar is None:
+            return
+        # only fields modified by saving have a snapshot
+        for field, mask in self.original_masks.items():
+            if field in radar.fields:
+                radar.fields[field]['data'] = np.ma.array(
+                    radar.fields[field]['data'], mask=mask.to_array())
+        self.original_masks = {}
+        if self.Vgatefilter.value is not None:
+            self.Vgatefilter.value._gate_excluded = np.zeros(
+                (radar.nrays, radar.ngates), dtype=bool)
+            self.Vgatefilter.update(True)
 
     ######################
     #   Filter Methods   #
     ######################
 
+    def _getCriteria(self, warn=True):
+        '''
+        Return list of active criteria (field, operator, values) and the
+        equivalent pyart commands. Criteria with invalid values are skipped,
+        with a warning if warn.
+        '''
+        criteria = []
+        filterscript = []
+
+        # Create a list of possible filtering actions
+        val2Cmds = ["inside", "outside"]
+        valinc = [">=", "<="]
+
+        for index, chk in enumerate(self.fieldfilter.get("check_active", [])):
+            if not chk.isChecked():
+                continue
+            field = str(self.fieldfilter["field"][index].text())
+            operator = str(
+                self.fieldfilter["operator"][index].currentText())
+            val1 = str(self.fieldfilter["low_value"][index].text())
+            val2 = str(self.fieldfilter["high_value"][index].text())
+
+            # Create the command to be issued for filtering
+            # If the operator takes val1 and val2
+            if operator in val2Cmds:
+                filtercmd = "gatefilter.%s(%s, %s, %s)" % (
+                    self.operators[operator], field, val1, val2)
+                values = (val1, val2)
+            # If the operators are inclusive of val1
+            elif operator in valinc:
+                filtercmd = "gatefilter.%s(%s, %s, inclusive=True)" % (
+                    self.operators[operator], field, val1)
+                values = (val1,)
+            # If the operators are exclusive of val1
+            else:
+                filtercmd = "gatefilter.%s(%s, %s, inclusive=False)" % (
+                    self.operators[operator], field, val1)
+                values = (val1,)
+
+            try:
+                values = tuple(float(val) for val in values)
+            except ValueError:
+                if warn:
+                    common.ShowWarning("Invalid value(s) for %s filter: %s" %
+                                       (field, ", ".join(values)))
+                continue
+            if warn:
+                print("%s checked, %s, v1 = %s, v2 = %s" %
+                      (field, self.operators[operator], val1, val2),
+                      file=log.debug)
+            criteria.append((field, operator, values))
+            filterscript.append(filtercmd)
+        return criteria, filterscript
+
+    def _schedulePreview(self, *args):
+        '''Restart live preview timer, or remove preview if inactive.'''
+        if self.previewCheck.isChecked():
+            self.previewTimer.start()
+        else:
+            self.previewTimer.stop()
+            self._setPreview(None)
+
+    def _setPreview(self, gatefilter):
+        '''Draw gatefilter in the display, Vgatefilter is not changed.'''
+        self._previewGatefilter = gatefilter
+        display = getattr(self, 'display', None)
+        if hasattr(display, 'setPreviewGatefilter'):
+            display.setPreviewGatefilter(gatefilter)
+
+    def preview(self):
+        '''
+        Filter only the sweep in Vtilt and draw it in the display over
+        Vgatefilter, the other sweeps have no excluded gates. Vgatefilter
+        is changed only by the 'Filter' button.
+        '''
+        radar = self.Vradar.value
+        if radar is None or not self.previewCheck.isChecked():
+            return
+        criteria, filterscript = self._getCriteria(warn=False)
+        sweep = self.Vtilt.value
+        if sweep is None or sweep < 0 or sweep >= radar.nsweeps:
+            sweep = 0
+        self.pipeline.set_radar(radar)
+        try:
+            gatefilter = self.pipeline.preview_gatefilter(criteria, sweep)
+        except:
+            import traceback
+            print(traceback.format_exc())
+            return
+        self._setPreview(gatefilter)
+
     def apply_filters(self):
         '''Mount Options and execute
         :py:func:`~pyart.filters.GateFilter`.
         The resulting fields are added to Vradar.
         Vradar is updated, strong or weak depending on overwriting old fields.
+
+        The volume is filtered in a background thread, Vgatefilter is
+        changed when it is done.
         '''
         # Test radar
         if self.Vradar.value is None:
             common.ShowWarning("Radar is None, cannot perform filtering.")
             return
 
-        # Retain the original masks
-        self.original_masks = {}
-        for field in self.Vradar.value.fields.keys():
-            self.original_masks[field] = np.ma.getmaskarray(
-                self.Vradar.value.fields[field]['data'])
-            print(field)
-
-        gatefilter = pyart.filters.GateFilter(self.Vradar.value,
-                                              exclude_based=True)
-
-        # Clear flags from previous filter application or instantiate if first
-        args = {}
-        self.filterscript = []
-
-        # Create a list of possible filtering actions
-        val2Cmds = ["inside", "outside"]
-        valinc = [">=", "<="]
-
-        # Initial point for timing
-        t0 = time.time()
-
-        # Get a list of field to apply the filters
-        self.filt_flds = []
-
-        pyarterr = "Py-ART fails with following error\n\n"
-        # Execute chosen filters
+        # Collect active criteria, their masks are cached in the pipeline
         print("Applying filters ..")
-        NoChecks = True
-        for index, chk in enumerate(self.fieldfilter["check_active"]):
-            if chk.isChecked():
-                NoChecks = False
-                field = str(self.fieldfilter["field"][index].text())
-                operator = str(
-                    self.fieldfilter["operator"][index].currentText())
-                val1 = self.fieldfilter["low_value"][index].text()
-                val2 = self.fieldfilter["high_value"][index].text()
+        criteria, self.filterscript = self._getCriteria()
 
-                print("%s checked, %s, v1 = %s, v2 = %s" %
-                      (field, self.operators[operator], val1, val2))
-
-                # Create the command to be issued for filtering
-                # Try that command and return error if fail
-
-                # If the operator takes val1 and val2
-                if operator in val2Cmds:
-                    filtercmd = "gatefilter.%s(%s, %s, %s)" % (
-                        self.operators[operator], field, val1, val2)
-                    if operator == "inside":
-                        try:
-                            gatefilter.exclude_inside(
-                                field, float(val1), float(val2))
-                        except:
-                            import traceback
-                            error = traceback.format_exc()
-                            common.ShowLongText(pyarterr + error)
-                    else:
-                        try:
-                            gatefilter.exclude_outside(
-                                field, float(val1), float(val2))
-                        except:
-                            import traceback
-                            error = traceback.format_exc()
-                            common.ShowLongText(pyarterr + error)
-                # If the operators are inclusive of val1
-                elif operator in valinc:
-                    filtercmd = "gatefilter.%s(%s, %s, inclusive=True)" % (
-                        self.operators[operator], field, val1)
-                    if operator == "<=":
-                        try:
-                            gatefilter.exclude_below(
-                                field, float(val1), inclusive=True)
-                        except:
-                            import traceback
-                            error = traceback.format_exc()
-                            common.ShowLongText(pyarterr + error)
-                    elif operator == ">=":
-                        try:
-                            gatefilter.exclude_above(
-                                field, float(val1), inclusive=True)
-                        except:
-                            import traceback
-                            error = traceback.format_exc()
-                            common.ShowLongText(pyarterr + error)
-                # If the operators are exclusive of val1
-                else:
-                    filtercmd = "gatefilter.%s(%s, %s, inclusive=False)" % (
-                        self.operators[operator], field, val1)
-                    if operator == "=":
-                        try:
-                            gatefilter.exclude_equal(
-                                field, float(val1))
-                        except:
-                            import traceback
-                            error = traceback.format_exc()
-                            common.ShowLongText(pyarterr + error)
-                    elif operator == "!=":
-                        try:
-                            gatefilter.exclude_not_equal(
-                                field, float(val1))
-                        except:
-                            import traceback
-                            error = traceback.format_exc()
-                            common.ShowLongText(pyarterr + error)
-                    elif operator == "<":
-                        try:
-                            gatefilter.exclude_below(
-                                field, float(val1), inclusive=False)
-                        except:
-                            import traceback
-                            error = traceback.format_exc()
-                            common.ShowLongText(pyarterr + error)
-                    elif operator == ">":
-                        try:
-                            gatefilter.exclude_above(
-                                field, float(val1), inclusive=False)
-                        except:
-                            import traceback
-                            error = traceback.format_exc()
-                            common.ShowLongText(pyarterr + error)
-
-                self.filterscript.append(filtercmd)
-
-        print(("Filtering took %fs" % (time.time()-t0)))
         # If no filters were applied issue warning
-        if NoChecks:
+        if not criteria:
             common.ShowWarning("Please Activate Filter(s)")
             return
 
-        # add fields and update
-        self.Vgatefilter.change(gatefilter, True)
+        self.previewTimer.stop()
+        self._filterGeneration += 1
+        radar = self.Vradar.value
+        self.pipeline.set_radar(radar)
+        self.statusBar().showMessage("Filtering volume ...")
+
+        # the thread gets its own references, Vradar and the pipeline may
+        # change while it runs
+        import threading
+        thread = threading.Thread(
+            target=self._filterVolume,
+            args=(radar, self.pipeline.snapshot(), criteria,
+                  self._filterGeneration, time.time()))
+        thread.daemon = True
+        thread.start()
+
+    def _filterVolume(self, radar, pipeline, criteria, generation, t0):
+        '''Background thread, evaluate criteria in the whole volume.'''
+        try:
+            result = pipeline.gatefilter(criteria)
+        except:
+            import traceback
+            result = traceback.format_exc()
+        self.filterDone.emit((generation, radar, result, time.time() - t0))
+
+    def _filterFinished(self, args):
+        '''Slot for filterDone, runs in the GUI thread.'''
+        generation, radar, result, elapsed = args
+        if generation != self._filterGeneration or \
+                radar is not self.Vradar.value:
+            return  # superseded by a newer filtering or radar
+        self.statusBar().clearMessage()
+        if isinstance(result, str):
+            common.ShowLongText("Filtering fails with following error\n\n" +
+                                result)
+            return
+        print(("Filtering took %fs" % elapsed))
+
+        # add fields and update, the filter replaces the preview
+        self._setPreview(None)
+        self.Vgatefilter.change(result, True)
+
+    def closeEvent(self, event):
+        self.previewTimer.stop()
+        self._setPreview(None)
+        super(GateFilter, self).closeEvent(event)
 
     def _clearLayout(self, layout):
         '''recursively remove items from layout.'''
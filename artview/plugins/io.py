@@ -17,7 +17,8 @@ sys.path.insert(0, path)
 
 import artview
 
-from ..core import Component, Variable, common, QtWidgets, QtCore
+from ..core import (Component, Variable, common, QtWidgets, QtCore,
+                    file_metadata)
 
 # get list of read functions
 import inspect
@@ -143,11 +144,13 @@ class DirectoryList(Component):
         try:
             grid = pyart.io.read_grid(
                 self.filename, delay_field_loading=True)
+            grid.filename = self.filename
             self.Vgrid.change(grid)
             return
         except:
             try:
                 grid = pyart.io.read_grid(self.filename)
+                grid.filename = self.filename
                 self.Vgrid.change(grid)
                 return
             except:
@@ -274,6 +277,7 @@ class FileDetail(Component):
         self.menu.addAction("Show Short Info File", self._show_RadarShortInfo)
         self.menu.addAction("Save Short Info File", self._save_RadarShortInfo)
         self.menu.addAction("Save Long Info File", self._get_RadarLongInfo)
+        self.menu.addAction("Show Info of Files", self._show_FilesInfo)
         return self.button
 
 
@@ -292,92 +296,28 @@ class FileDetail(Component):
 
     def _get_RadarShortInfo(self):
         '''Print out some basic info about the radar.'''
-        # For any missing data
-        infoNA = "Info not available"
-
-        try:
-            rname = self.Vradar.value.metadata['instrument_name']
-        except:
-            rname = infoNA
-        try:
-            rlon = str(self.Vradar.value.longitude['data'][0])
-        except:
-            rlon = infoNA
-        try:
-            rlat = str(self.Vradar.value.latitude['data'][0])
-        except:
-            rlat = infoNA
-        try:
-            ralt = str(self.Vradar.value.altitude['data'][0])
-            raltu = self.Vradar.value.altitude['units'][0]
-        except:
-            ralt = infoNA
-            raltu = " "
-        try:
-            maxr = str(self.Vradar.value.instrument_parameters[
-                'unambiguous_range']['data'][0])
-            maxru = self.Vradar.value.instrument_parameters[
-                'unambiguous_range']['units'][0]
-        except:
-            maxr = infoNA
-            maxru = " "
-        try:
-            nyq = str(self.Vradar.value.instrument_parameters[
-                'nyquist_velocity']['data'][0])
-            nyqu = self.Vradar.value.instrument_parameters[
-                'nyquist_velocity']['units'][0]
-        except:
-            nyq = infoNA
-            nyqu = " "
-        try:
-            bwh = str(self.Vradar.value.instrument_parameters[
-                'radar_beam_width_h']['data'][0])
-            bwhu = self.Vradar.value.instrument_parameters[
-                'radar_beam_width_h']['units'][0]
-        except:
-            bwh = infoNA
-            bwhu = " "
-        try:
-            bwv = str(self.Vradar.value.instrument_parameters[
-                'radar_beam_width_v']['data'][0])
-            bwvu = self.Vradar.value.instrument_parameters[
-                'radar_beam_width_v']['units'][0]
-        except:
-            bwv = infoNA
-            bwvu = " "
-        try:
-            pw = str(self.Vradar.value.instrument_parameters[
-                'pulse_width']['data'][0])
-            pwu = self.Vradar.value.instrument_parameters[
-                'pulse_width']['units'][0]
-        except:
-            pw = infoNA
-            pwu = " "
-        try:
-            ngates = str(self.Vradar.value.ngates)
-        except:
-            ngates = infoNA
-        try:
-            nsweeps = str(self.Vradar.value.nsweeps)
-        except:
-            nsweeps = infoNA
-
-        txOut = (('Radar Name: %s\n' % rname) +
-                 ('Radar longitude: %s\n' % rlon) +
-                 ('Radar latitude: %s\n' % rlat) +
-                 ('Radar altitude: %s %s\n' % (ralt, raltu)) +
-                 ('    \n') +
-                 ('Unambiguous range: %s %s\n' % (maxr, maxru)) +
-                 ('Nyquist velocity: %s %s\n' % (nyq, nyqu)) +
-                 ('    \n') +
-                 ('Radar Beamwidth, horiz: %s %s\n' % (bwh, bwhu)) +
-                 ('Radar Beamwidth, vert: %s %s\n' % (bwv, bwvu)) +
-                 ('Pulsewidth: %s %s \n' % (pw, pwu)) +
-                 ('    \n') +
-                 ('Number of gates: %s\n' % ngates) +
-                 ('Number of sweeps: %s\n' % nsweeps))
-
-        return txOut
+        if self.Vradar.value is None:
+            return file_metadata.INFO_NA
+        return file_metadata.short_info(
+            file_metadata.radar_metadata(self.Vradar.value))
+
+    def _show_FilesInfo(self):
+        '''Show basic info of files, from their headers if possible.'''
+        filenames = QtWidgets.QFileDialog.getOpenFileNames(
+            self, 'Files Info', os.getcwd())
+        if isinstance(filenames, tuple): # PyQt5
+            filenames = filenames[0]
+        txOut = []
+        for filename in filenames:
+            filename = str(filename)
+            try:
+                info = file_metadata.short_info(
+                    file_metadata.read_metadata(filename))
+            except Exception:
+                info = file_metadata.INFO_NA + '\n'
+            txOut.append('%s\n%s' % (os.path.basename(filename), info))
+        if txOut:
+            common.ShowLongText('\n'.join(txOut))
 
     def _save_RadarShortInfo(self):
         txOut = self._get_RadarShortInfo()
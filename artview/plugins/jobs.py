@@ -0,0 +1,102 @@
+"""
+jobs.py
+"""
+
+# Load the needed packages
+from ..core import Component, common, QtWidgets, QtCore, get_job_runner
+
+
+class JobList(Component):
+    '''
+    List of background jobs (corrections, gridding) with their state and
+    elapsed time, running jobs may be cancelled.
+    '''
+
+    @classmethod
+    def guiStart(self, parent=None):
+        '''Graphical interface for starting this class.'''
+        kwargs, independent = \
+            common._SimplePluginStart("JobList").startDisplay()
+        kwargs['parent'] = parent
+        return self(**kwargs), independent
+
+    def __init__(self, name="JobList", parent=None):
+        '''Initialize the class to create the interface.
+
+        Parameters
+        ----------
+        [Optional]
+        name : string
+            Window name.
+        parent : PyQt instance
+            Parent instance to associate to this class.
+            If None, then Qt owns, otherwise associated w/ parent PyQt instance
+        '''
+        super(JobList, self).__init__(name=name, parent=parent)
+        self.central_widget = QtWidgets.QWidget()
+        self.setCentralWidget(self.central_widget)
+        self.layout = QtWidgets.QGridLayout(self.central_widget)
+
+        self.table = QtWidgets.QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["Job", "State", "Elapsed (s)"])
+        self.table.setSelectionBehavior(
+            QtWidgets.QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.layout.addWidget(self.table, 0, 0, 1, 2)
+
+        self.cancelButton = QtWidgets.QPushButton("Cancel")
+        self.cancelButton.setToolTip("Cancel selected jobs")
+        self.cancelButton.clicked.connect(self.cancelSelected)
+        self.layout.addWidget(self.cancelButton, 1, 0)
+
+        self.clearButton = QtWidgets.QPushButton("Clear Finished")
+        self.clearButton.clicked.connect(self.clearFinished)
+        self.layout.addWidget(self.clearButton, 1, 1)
+
+        self.sharedVariables = {}
+        self.connectAllVariables()
+
+        self.runner = get_job_runner()
+        self.runner.jobsChanged.connect(self.refresh)
+
+        # refresh elapsed time of running jobs
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(1000)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start()
+
+        self.refresh()
+        self.show()
+
+    def refresh(self):
+        '''Fill table with the jobs of the runner.'''
+        jobs = self.runner.jobs
+        self.table.setRowCount(len(jobs))
+        for row, job in enumerate(jobs):
+            self.table.setItem(row, 0, QtWidgets.QTableWidgetItem(job.name))
+            state = job.state
+            if job.state == 'running' and job.progress is not None:
+                state = "%s %i%%" % (state, 100 * job.progress)
+            self.table.setItem(row, 1, QtWidgets.QTableWidgetItem(state))
+            self.table.setItem(row, 2, QtWidgets.QTableWidgetItem(
+                "%.1f" % job.elapsed))
+
+    def cancelSelected(self):
+        '''Cancel jobs in the selected rows.'''
+        rows = set(index.row() for index in self.table.selectedIndexes())
+        jobs = [self.runner.jobs[row] for row in rows
+                if row < len(self.runner.jobs)]
+        for job in jobs:
+            self.runner.cancel(job)
+
+    def clearFinished(self):
+        '''Remove finished, failed and cancelled jobs from the list.'''
+        self.runner.clear_finished()
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        self.runner.jobsChanged.disconnect(self.refresh)
+        super(JobList, self).closeEvent(event)
+
+
+_plugins = [JobList]
@@ -8,7 +8,6 @@ import pyart
 
 import sys
 import os
-import numpy as np
 import collections
 
 path = os.path.dirname(sys.modules[__name__].__file__)
@@ -17,7 +16,9 @@ sys.path.insert(0, path)
 
 import artview
 
-from ..core import Component, Variable, common, QtWidgets, QtCore, componentsList
+from ..core import (Component, Variable, common, QtWidgets, QtCore,
+                    componentsList, GateMask, sidecar, EditJournal,
+                    EditOperation, MaskOperation, get_journal, log)
 
 
 class ManualEdit(Component):
@@ -85,6 +86,9 @@ class ManualEdit(Component):
         else:
             self.Vgatefilter = Vgatefilter
 
+        # GateMask of the Vpoints selection, see _selection_mask
+        self._selection = None
+
         self.sharedVariables = {"Vradar": self.NewRadar,
                                 "Vpoints": None,
                                 "Vfield": self.NewField,
@@ -121,15 +125,44 @@ class ManualEdit(Component):
         self.resetButton.clicked.connect(self.reset)
         self.layout.addWidget(self.resetButton, 5, 0)
 
+        self.sidecarButton = QtWidgets.QPushButton("Save GateFilter Sidecar")
+        self.sidecarButton.setToolTip(
+            "Save GateFilter next to the radar file, it is restored when "
+            "the file is opened again")
+        self.sidecarButton.clicked.connect(self.saveSidecar)
+        self.layout.addWidget(self.sidecarButton, 6, 0)
+
+        self.undoButton = QtWidgets.QPushButton("Undo")
+        self.undoButton.setToolTip("Undo last edit of the radar fields")
+        self.undoButton.clicked.connect(self.undo)
+        self.layout.addWidget(self.undoButton, 7, 0)
+
+        self.redoButton = QtWidgets.QPushButton("Redo")
+        self.redoButton.setToolTip("Redo last undone edit")
+        self.redoButton.clicked.connect(self.redo)
+        self.layout.addWidget(self.redoButton, 8, 0)
+
+        self.saveJournalButton = QtWidgets.QPushButton("Save Edits")
+        self.saveJournalButton.setToolTip(
+            "Save the edits of the radar fields to a journal file")
+        self.saveJournalButton.clicked.connect(self.saveJournal)
+        self.layout.addWidget(self.saveJournalButton, 9, 0)
+
+        self.replayJournalButton = QtWidgets.QPushButton("Replay Edits")
+        self.replayJournalButton.setToolTip(
+            "Apply the edits of a journal file to the current radar")
+        self.replayJournalButton.clicked.connect(self.replayJournal)
+        self.layout.addWidget(self.replayJournalButton, 10, 0)
+
         self.buttonHelp = QtWidgets.QPushButton("Help")
         self.buttonHelp.setToolTip("About using Manual Filter")
         self.buttonHelp.clicked.connect(self._displayHelp)
-        self.layout.addWidget(self.buttonHelp, 6, 0)
+        self.layout.addWidget(self.buttonHelp, 11, 0)
 
         #empty space at the bottom
         self.layout.addItem(QtWidgets.QSpacerItem(
             0, 0, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding),
-                            7, 0)
+                            12, 0)
 
         self.show()
 
@@ -137,24 +170,34 @@ class ManualEdit(Component):
         '''Filter selected gates.'''
         if self.Vpoints.value is None:
             return
-        mask_ray = self.Vpoints.value.axes['ray_index']['data'][:]
-        mask_range = self.Vpoints.value.axes['range_index']['data'][:]
 
         if self.Vgatefilter.value is None:
             if self.Vradar.value is None:
                 print("Error can not creat mask from none radar")
                 return
             gatefilter = pyart.filters.GateFilter(self.Vradar.value)
-            mask = gatefilter.gate_excluded
-            mask[mask_ray, mask_range] = True
-            gatefilter._merge(mask, 'or', True)
+            selection = self._selection_mask(gatefilter._gate_excluded.shape)
+            # only the selected gates, no full size temporary
+            gatefilter._gate_excluded[selection.indices()] = True
             self.Vgatefilter.change(gatefilter)
         else:
-            mask = self.Vgatefilter.value.gate_excluded
-            mask[mask_ray, mask_range] = True
-            self.Vgatefilter.value._merge(mask, 'or', True)
+            gatefilter = self.Vgatefilter.value
+            selection = self._selection_mask(gatefilter._gate_excluded.shape)
+            gatefilter._gate_excluded[selection.indices()] = True
             self.Vgatefilter.update()
 
+    def _selection_mask(self, shape):
+        '''
+        Return the selected gates in Vpoints as a GateMask, kept while
+        Vpoints and shape are the same. The journal operations hold it
+        instead of index arrays.
+        '''
+        points = self.Vpoints.value
+        if (self._selection is None or self._selection[0] is not points or
+                self._selection[1].shape != tuple(shape)):
+            self._selection = (points, GateMask.from_points(points, shape))
+        return self._selection[1]
+
     def removeFromField(self):
         '''Remove selected points from current field in Radar.'''
         if (self.Vpoints.value is None or
@@ -162,17 +205,17 @@ class ManualEdit(Component):
             self.Vfield.value not in self.Vradar.value.fields):
             return
 
-        mask_ray = self.Vpoints.value.axes['ray_index']['data'][:]
-        mask_range = self.Vpoints.value.axes['range_index']['data'][:]
+        radar = self.Vradar.value
+        selection = self._selection_mask((radar.nrays, radar.ngates))
 
-        data = self.Vradar.value.fields[self.Vfield.value]['data']
-        mask = np.ma.getmaskarray(data)
-        mask[mask_ray, mask_range] = True
-        self.Vradar.value.fields[self.Vfield.value]['data'] = np.ma.array(
-            data, mask=mask)
+        operation = EditOperation(self.Vfield.value, selection, None,
+                                  mask=True)
+        get_journal(self.Vradar.value).edit(
+            self.Vradar.value, [operation],
+            "remove gates from " + self.Vfield.value)
 
         self.Vradar.value.changed = True
-        self.Vradar.update()
+        self.Vradar.update(False)
 
     def removeFromRadar(self):
         '''Remove selected points from all fields in Radar.'''
@@ -180,17 +223,75 @@ class ManualEdit(Component):
             self.Vradar.value is None):
             return
 
-        mask_ray = self.Vpoints.value.axes['ray_index']['data'][:]
-        mask_range = self.Vpoints.value.axes['range_index']['data'][:]
+        radar = self.Vradar.value
+        selection = self._selection_mask((radar.nrays, radar.ngates))
 
-        for field in self.Vradar.value.fields.keys():
-            data = self.Vradar.value.fields[field]['data']
-            mask = np.ma.getmaskarray(data)
-            mask[mask_ray, mask_range] = True
-            self.Vradar.value.fields[field]['data'] = np.ma.array(data,
-                                                                  mask=mask)
+        # one in place edit per distinct mask, displays redraw on the weak
+        # update as the radar edit version changed
+        operation = MaskOperation(list(radar.fields.keys()), selection,
+                                  None, mask=True)
+        get_journal(self.Vradar.value).edit(
+            self.Vradar.value, [operation], "remove gates from radar")
 
         self.Vradar.value.changed = True
+        self.Vradar.update(False)
+
+    def undo(self):
+        '''Undo last edit of the radar (shared with ManualUnfold).'''
+        radar = self.Vradar.value
+        if radar is None or get_journal(radar).undo(radar) is None:
+            common.ShowWarning("No edit to be undone")
+            return
+        radar.changed = True
+        self.Vradar.update(False)
+
+    def redo(self):
+        '''Redo last undone edit of the radar.'''
+        radar = self.Vradar.value
+        if radar is None or get_journal(radar).redo(radar) is None:
+            common.ShowWarning("No edit to be redone")
+            return
+        radar.changed = True
+        self.Vradar.update(False)
+
+    def saveJournal(self):
+        '''Save edit journal of the radar to a file.'''
+        radar = self.Vradar.value
+        if radar is None or not get_journal(radar).can_undo():
+            common.ShowWarning("No edit to be saved")
+            return
+        dirIn = os.path.dirname(getattr(radar, 'filename', '') or '')
+        filename = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Save Edit Journal', dirIn, 'Journal (*.npz)')
+        if isinstance(filename, tuple):  # PyQt5
+            filename = filename[0]
+        filename = str(filename)
+        if filename == '':
+            return
+        get_journal(radar).save(filename)
+        print("Saved %s" % (filename))
+
+    def replayJournal(self):
+        '''Load an edit journal file and apply it to the radar.'''
+        radar = self.Vradar.value
+        if radar is None:
+            common.ShowWarning("Radar is None, can not replay edits")
+            return
+        dirIn = os.path.dirname(getattr(radar, 'filename', '') or '')
+        filename = QtWidgets.QFileDialog.getOpenFileName(
+            self, 'Open Edit Journal', dirIn, 'Journal (*.npz)')
+        if isinstance(filename, tuple):  # PyQt5
+            filename = filename[0]
+        filename = str(filename)
+        if filename == '':
+            return
+        journal = EditJournal.load(filename)
+        journal.replay(radar)
+        # keep previous edits undoable before the replayed ones
+        old = get_journal(radar)
+        journal.undo_stack = old.undo_stack + journal.undo_stack
+        radar.edit_journal = journal
+        radar.changed = True
         self.Vradar.update()
 
     def reset(self):
@@ -199,6 +300,21 @@ class ManualEdit(Component):
             self.Vgatefilter.value.include_all()
             self.Vgatefilter.update()
 
+    def saveSidecar(self):
+        '''Save GateFilter as sidecar file of the radar file.'''
+        if (self.Vradar.value is None or self.Vgatefilter.value is None or
+                getattr(self.Vradar.value, 'filename', None) is None):
+            common.ShowWarning("There is no GateFilter to save.")
+            return
+        filterscript = getattr(self.Vgatefilter.value, 'sidecar_provenance',
+                               {}).get('filterscript', [])
+        filterscript = filterscript + ["# gates excluded with ManualEdit"]
+        sidecar.submit_save_gatefilter(
+            self.Vradar.value, self.Vgatefilter.value, filterscript,
+            callback=lambda path: print("Saved %s" % path, file=log.info),
+            errback=lambda error: common.ShowLongText(
+                "Saving sidecar fails with following error\n\n" + error))
+
     def _fillFieldBox(self):
         '''Fill in the Field Window Box with current variable names.'''
         self.fieldBox.clear()
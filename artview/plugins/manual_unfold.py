@@ -9,7 +9,6 @@ import pyart
 import sys
 import os
 import numpy as np
-import collections
 
 path = os.path.dirname(sys.modules[__name__].__file__)
 path = os.path.join(path, '...')
@@ -18,7 +17,8 @@ sys.path.insert(0, path)
 import artview
 
 from ..core import (Component, Variable, common, QtCore,
-                    QtGui, QtWidgets, componentsList)
+                    QtGui, QtWidgets, componentsList, EditOperation,
+                    get_journal)
 
 
 class ManualUnfold(Component):
@@ -102,21 +102,26 @@ class ManualUnfold(Component):
         self.negativeButton.clicked.connect(self.negativeUnfold)
         self.layout.addWidget(self.negativeButton, 7, 0)
 
-        # list for undoing: (unfold matriz, nyquist_vel)
-        self.unfoldList = collections.deque(maxlen=30)
+        # undoing uses the radar edit journal, shared with ManualEdit
         self.foldButton = QtWidgets.QPushButton("Fold Back")
+        self.foldButton.setToolTip("Undo last edit")
         self.foldButton.clicked.connect(self.foldBack)
         self.layout.addWidget(self.foldButton, 8, 0)
 
+        self.redoButton = QtWidgets.QPushButton("Redo")
+        self.redoButton.setToolTip("Redo last undone edit")
+        self.redoButton.clicked.connect(self.redo)
+        self.layout.addWidget(self.redoButton, 9, 0)
+
         self.buttonHelp = QtWidgets.QPushButton("Help")
         self.buttonHelp.setToolTip("About using Manual Unfold")
         self.buttonHelp.clicked.connect(self._displayHelp)
-        self.layout.addWidget(self.buttonHelp, 9, 0)
+        self.layout.addWidget(self.buttonHelp, 10, 0)
 
         #empty space at the bottom
         self.layout.addItem(QtWidgets.QSpacerItem(
             0, 0, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding),
-                            10, 0)
+                            11, 0)
 
 
         self.NewRadar(None, True)
@@ -163,26 +168,32 @@ class ManualUnfold(Component):
         vel, corrVel = self.getFieldNames()
         original_data = radar.fields[vel]['data']
         if corrVel in self.Vradar.value.fields.keys():
-            data = radar.fields[corrVel]['data'].copy()
+            data = radar.fields[corrVel]['data']
+            source = None
         else:
-            data = original_data.copy()
+            data = original_data
+            source = vel
         ray = points.axes['ray_index']['data']
         rng = points.axes['range_index']['data']
         nyquist = self.nyquistVelocity.value()
+        base = original_data[ray, rng]
         if side == 'positive':
-            data[ray, rng] = np.ma.where(
-                original_data[ray, rng] > 0,
-                -2 * nyquist + original_data[ray, rng], data[ray, rng])
+            values = np.ma.where(base > 0, -2 * nyquist + base,
+                                 data[ray, rng])
         elif side == 'negative':
-            data[ray, rng] = np.ma.where(
-                original_data[ray, rng] < 0,
-                2 * nyquist + original_data[ray, rng], data[ray, rng])
+            values = np.ma.where(base < 0, 2 * nyquist + base,
+                                 data[ray, rng])
 
         strong_update = False  # insertion is weak, overwrite strong
-        if corrVel in self.Vradar.value.fields.keys():
+        if source is None:
             strong_update = True
 
-        radar.add_field_like(vel, corrVel, data, replace_existing=True)
+        # only the selected gates are changed and kept for undoing
+        operation = EditOperation(corrVel, ray, rng, data=values,
+                                  mask=np.ma.getmaskarray(values),
+                                  source=source)
+        get_journal(radar).edit(radar, [operation], "unfold " + side)
+
         if 'valid_min' not in radar.fields[corrVel]:
             radar.fields[corrVel]['valid_min'] = - 1.5 * nyquist
         if 'valid_max' not in radar.fields[corrVel]:
@@ -191,27 +202,22 @@ class ManualUnfold(Component):
         self.Vradar.value.changed = True
         self.Vradar.update(strong_update)
 
-        # save for undoing
-        unfold = np.zeros_like(original_data, dtype=np.int8)
-        if side == 'positive':
-            unfold[ray, rng] = np.where(original_data[ray, rng] > 0, -1, 0)
-        elif side == 'negative':
-            unfold[ray, rng] = np.where(original_data[ray, rng] < 0, 1, 0)
-
-        self.unfoldList.append((unfold, nyquist))
-
     def foldBack(self):
-        '''Undo last unfolding.'''
-        vel, corrVel = self.getFieldNames()
+        '''Undo last edit (unfolding or ManualEdit masking).'''
         radar = self.Vradar.value
-        if len(self.unfoldList) == 0 or corrVel not in radar.fields.keys():
+        if radar is None or get_journal(radar).undo(radar) is None:
             common.ShowWarning("No folding to be undone")
             return
+        self.lockNyquist = True
+        self.Vradar.value.changed = True
+        self.Vradar.update()
 
-        unfold, nyquist = self.unfoldList.pop()
-        data = radar.fields[corrVel]['data']
-        data = data - 2 * unfold * nyquist
-        radar.fields[corrVel]['data'] = data
+    def redo(self):
+        '''Redo last undone edit.'''
+        radar = self.Vradar.value
+        if radar is None or get_journal(radar).redo(radar) is None:
+            common.ShowWarning("No folding to be redone")
+            return
         self.lockNyquist = True
         self.Vradar.value.changed = True
         self.Vradar.update()
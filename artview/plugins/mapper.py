@@ -7,11 +7,11 @@ from functools import partial
 
 import pyart
 from pyart.config import get_field_name
-import time
 import os
 
 from ..core import (Component, Variable, common, QtWidgets, QtGui,
-                    QtCore, VariableChoose, log)
+                    QtCore, VariableChoose, log, get_job_runner)
+from ..core.gridding import submit_grid
 
 class Mapper(Component):
     '''
@@ -20,6 +20,7 @@ class Mapper(Component):
 
     Vradar = None  #: see :ref:`shared_variable`
     Vgrid = None  #: see :ref:`shared_variable`
+    VradarCollection = None  #: see :ref:`shared_variable`
 
     @classmethod
     def guiStart(self, parent=None):
@@ -29,7 +30,8 @@ class Mapper(Component):
         kwargs['parent'] = parent
         return self(**kwargs), independent
 
-    def __init__(self, Vradar=None, Vgrid=None, name="Mapper", parent=None):
+    def __init__(self, Vradar=None, Vgrid=None, VradarCollection=None,
+                 name="Mapper", parent=None):
         '''Initialize the class to create the interface.
 
         Parameters
@@ -41,6 +43,10 @@ class Mapper(Component):
         Vgrid : :py:class:`~artview.core.core.Variable` instance
             Grid signal variable.
             A value of None initializes an empty Variable.
+        VradarCollection : :py:class:`~artview.core.core.Variable` instance
+            Radar collection signal variable, mapped instead of Vradar if
+            'Map Radar Collection' is checked.
+            A value of None initializes an empty list Variable.
         name : string
             Field Radiobutton window name.
         parent : PyQt instance
@@ -52,6 +58,9 @@ class Mapper(Component):
         self.setCentralWidget(self.central_widget)
         self.layout = QtWidgets.QGridLayout(self.central_widget)
 
+        self.previewFactor = 4
+        self._generation = 0  # of the last mapping, older ones are dropped
+        self._refined = 0  # last generation with full resolution result
         self.mountUI()
 
         self.parameters = {
@@ -82,6 +91,8 @@ class Mapper(Component):
             "copy_field_data": True,
             "algorithm": "kd_tree",
             "leafsize": 10,
+            "tiles_y": 1,
+            "tiles_x": 1,
             }
 
         self.general_parameters_type = [
@@ -95,6 +106,8 @@ class Mapper(Component):
             ("map_roi", bool),
             ("weighting_function", ("Barnes", "Cressman")),
             ("toa", float),
+            ("tiles_y", int, "tiles along Y"),
+            ("tiles_x", int, "tiles along X"),
             ]
         self.roi_parameters_type = [
             ("roi_func", ("constant", "dist", "dist_beam")),
@@ -119,8 +132,14 @@ class Mapper(Component):
             self.Vgrid = Variable(None)
         else:
             self.Vgrid = Vgrid
+
+        if VradarCollection is None:
+            self.VradarCollection = Variable([])
+        else:
+            self.VradarCollection = VradarCollection
         self.sharedVariables = {"Vradar": self.NewRadar,
-                                "Vgrid": None}
+                                "Vgrid": None,
+                                "VradarCollection": self.NewRadarCollection}
         self.connectAllVariables()
 
         self.NewRadar(None, True)
@@ -149,6 +168,26 @@ class Mapper(Component):
         self.configMenu.addAction(QtWidgets.QAction("Set map_to_grid Parameters", self,
                                                 triggered=self.setGriddingParameters))
         self.fieldMenu = self.configMenu.addMenu("Fields")
+        self.collectionAction = QtWidgets.QAction(
+            "Map Radar Collection", self, checkable=True,
+            triggered=lambda checked: self.NewRadar(None, True))
+        self.collectionAction.setToolTip(
+            "Grid all radars of the radar collection in a composite")
+        self.configMenu.addAction(self.collectionAction)
+        self.geometryAction = QtWidgets.QAction(
+            "Reuse Gridding Geometry", self, checkable=True)
+        self.geometryAction.setToolTip(
+            "Keep gate to grid point neighbours (map_gates_to_grid) in the "
+            "cache,\nso mapping the same geometry again with other fields "
+            "or weighting is fast")
+        self.configMenu.addAction(self.geometryAction)
+        self.progressiveAction = QtWidgets.QAction(
+            "Progressive Mapping", self, checkable=True)
+        self.progressiveAction.setToolTip(
+            "First show a grid at 1/%i of the horizontal resolution, "
+            "replaced\nby the full resolution grid when done" %
+            self.previewFactor)
+        self.configMenu.addAction(self.progressiveAction)
         self.configMenu.addAction(QtWidgets.QAction("Help", self,
                                                 triggered=self._displayHelp))
 
@@ -211,11 +250,12 @@ class Mapper(Component):
         The resulting grid is update in Vgrid.
         '''
         # test radar
-        if self.Vradar.value is None:
+        radars = self._radars()
+        if not radars:
             common.ShowWarning("Radar is None, can not perform correction")
             return
         # mount options
-        self.parameters['radars'] = (self.Vradar.value,)
+        self.parameters['radars'] = radars
         self.parameters['fields'] = []
         for field in self.field_actions.keys():
             if self.field_actions[field].isChecked():
@@ -232,22 +272,48 @@ class Mapper(Component):
         self.parameters['grid_origin'] = (self.parameters['grid_origin_lat'],
                                           self.parameters['grid_origin_lon'])
 
-        # execute
+        # execute in worker processes, one per tile, Vgrid is changed when
+        # all are done
         print("mapping ..", file=log.debug)
-        t0 = time.time()
-        try:
-            grid = pyart.map.grid_from_radars(**self.parameters)
-        except:
-            import traceback
-            error = traceback.format_exc()
-            common.ShowLongText("Py-ART fails with following error\n\n" +
-                                error)
-        t1 = time.time()
-        print("Mapping took %fs" % (t1-t0), file=log.debug)
-
-        # update
+        kwargs = self.parameters.copy()
+        tiles = (kwargs.pop('tiles_y'), kwargs.pop('tiles_x'))
+        self._generation += 1
+        if self.progressiveAction.isChecked():
+            nz, ny, nx = kwargs['grid_shape']
+            preview = dict(kwargs, grid_shape=(
+                nz, max(1, ny // self.previewFactor),
+                max(1, nx // self.previewFactor)))
+            submit_grid(self.name + " (preview)", preview,
+                        callback=partial(self._setGrid, self._generation,
+                                         True))
+        submit_grid(self.name, kwargs, tiles,
+                    callback=partial(self._setGrid, self._generation, False),
+                    reuse_geometry=self.geometryAction.isChecked())
+
+    def _setGrid(self, generation, preview, grid):
+        '''
+        Job callback, change Vgrid unless a later mapping was started or,
+        for a preview, the full resolution grid is already there.
+        '''
+        if generation != self._generation:
+            return
+        if preview:
+            if self._refined == generation:
+                return
+            grid.preview = True
+        else:
+            self._refined = generation
         self.Vgrid.change(grid)
 
+    def _radars(self):
+        '''Return tuple of radars to map.'''
+        if self.collectionAction.isChecked():
+            return tuple(self.VradarCollection.value)
+        elif self.Vradar.value is None:
+            return ()
+        else:
+            return (self.Vradar.value,)
+
     def setParameters(self):
         '''Open set parameters dialog.'''
         parm = common.get_options(self.general_parameters_type, self.parameters)
@@ -271,11 +337,20 @@ class Mapper(Component):
         common.ShowLongText(pyart.map.grid_from_radars.__doc__)
 
     def NewRadar(self, variable, strong):
-        '''Display Py-Art's docstring for help.'''
-        if self.Vradar.value is None:
+        '''
+        Slot for 'ValueChanged' signal of
+        :py:class:`Vradar <artview.core.core.Variable>`.
+        This will:
+
+        * Repopulate field menu with fields common to the mapped radars
+        * Set grid origin to the first radar
+        '''
+        radars = self._radars()
+        if not radars:
             return
 
-        fields = self.Vradar.value.fields.keys()
+        fields = [field for field in radars[0].fields.keys() if
+                  all(field in radar.fields for radar in radars[1:])]
         self.field_radio_group = QtWidgets.QActionGroup(self, exclusive=False)
         self.field_actions = {}
         self.fieldMenu.clear()
@@ -286,13 +361,24 @@ class Mapper(Component):
             self.fieldMenu.addAction(action)
             self.field_actions[field] = action
 
-        lat = float(self.Vradar.value.latitude['data'])
-        lon = float(self.Vradar.value.longitude['data'])
-        alt = float(self.Vradar.value.altitude['data'])
+        lat = float(radars[0].latitude['data'])
+        lon = float(radars[0].longitude['data'])
+        alt = float(radars[0].altitude['data'])
         self.parameters["grid_origin_lat"] = lat
         self.parameters["grid_origin_lon"] = lon
         self.parameters["grid_origin_alt"] = alt
 
+    def NewRadarCollection(self, variable, strong):
+        '''
+        Slot for 'ValueChanged' signal of
+        :py:class:`VradarCollection <artview.core.core.Variable>`.
+        This will:
+
+        * Repopulate field menu if the collection is mapped
+        '''
+        if self.collectionAction.isChecked():
+            self.NewRadar(variable, strong)
+
 class Mapper_old(Component):
     '''
     Interface for executing :py:func:`pyart.map.grid_from_radars`
@@ -672,21 +758,10 @@ class Mapper_old(Component):
 
         print(args)
 
-        # execute
+        # execute in a worker process, Vgrid is changed when done
         print("mapping ..")
-        t0 = time.time()
-        try:
-            grid = pyart.map.grid_from_radars(**args)
-        except:
-            import traceback
-            error = traceback.format_exc()
-            common.ShowLongText("Py-ART fails with following error\n\n" +
-                                error)
-        t1 = time.time()
-        print(("Mapping took %fs" % (t1-t0)))
-
-        # update
-        self.Vgrid.change(grid)
+        get_job_runner().submit(self.name, pyart.map.grid_from_radars,
+                                kwargs=args, callback=self.Vgrid.change)
 
     def _clearLayout(self, layout):
         '''recursively remove items from layout.'''
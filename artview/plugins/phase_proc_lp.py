@@ -7,11 +7,10 @@ from functools import partial
 
 import pyart
 from pyart.config import get_field_name
-import time
 import os
 
 from ..core import (Component, Variable, common, QtWidgets, QtGui,
-                    QtCore, VariableChoose)
+                    QtCore, VariableChoose, submit_cached)
 
 
 class PhaseProcLp(Component):
@@ -67,6 +66,12 @@ class PhaseProcLp(Component):
                                                 triggered=self.setParameters))
         self.configMenu.addAction(QtWidgets.QAction("Help", self,
                                                 triggered=self._displayHelp))
+        self.configMenu.addAction(QtWidgets.QAction(
+            "Add to Batch Pipeline", self, triggered=self.exportPipelineStep))
+        self.bypassCache = QtWidgets.QAction("Bypass Result Cache", self)
+        self.bypassCache.setCheckable(True)
+        self.bypassCache.setToolTip("Always compute, ignoring cached results")
+        self.configMenu.addAction(self.bypassCache)
         self.parameters = {
             "radar": None,
             "z_offset": 0,
@@ -151,25 +156,33 @@ class PhaseProcLp(Component):
 
         print(parameters)
 
-        # execute
+        # use cached result or execute in a worker process, fields are added
+        # when done
         print("Correcting ..")
-        t0 = time.time()
-        try:
-            reproc_phase, sob_kdp = pyart.correct.phase_proc_lp(**parameters)
-        except:
-            import traceback
-            error = traceback.format_exc()
-            common.ShowLongText("Py-ART fails with following error\n\n" +
-                                error)
-        t1 = time.time()
-        print(("Correction took %fs" % (t1-t0)))
+        submit_cached(
+            self.name, pyart.correct.phase_proc_lp, parameters,
+            partial(self._addFields, self.Vradar.value,
+                    self.parameters["reproc_phase"],
+                    self.parameters["sob_kdp"]),
+            radar=self.Vradar.value,
+            input_fields=[self.parameters[key] for key in
+                          ('refl_field', 'ncp_field', 'rhv_field',
+                           'phidp_field')],
+            bypass=self.bypassCache.isChecked())
+
+    def _addFields(self, radar, reproc_phase_name, sob_kdp_name, result):
+        '''
+        Job callback, add corrected fields to radar with the names chosen
+        when the job was submitted.
+        '''
+        if radar is not self.Vradar.value:
+            common.ShowWarning("Radar changed, correction discarded.")
+            return
+        reproc_phase, sob_kdp = result
 
         # verify field overwriting
-        reproc_phase_name = self.parameters["reproc_phase"]
-        sob_kdp_name = self.parameters["sob_kdp"]
-
         strong_update = False  # insertion is weak, overwrite strong
-        if reproc_phase_name in self.Vradar.value.fields.keys():
+        if reproc_phase_name in radar.fields.keys():
             resp = common.ShowQuestion(
                 "Field %s already exists! Do you want to over write it?" %
                 reproc_phase_name)
@@ -178,7 +191,7 @@ class PhaseProcLp(Component):
             else:
                 strong_update = True
 
-        if sob_kdp_name in self.Vradar.value.fields.keys():
+        if sob_kdp_name in radar.fields.keys():
             resp = common.ShowQuestion(
                 "Field %s already exists! Do you want to over write it?" %
                 sob_kdp_name)
@@ -188,11 +201,10 @@ class PhaseProcLp(Component):
                 strong_update = True
 
         # add fields and update
-        self.Vradar.value.add_field(reproc_phase_name, reproc_phase, True)
-        self.Vradar.value.add_field(sob_kdp_name, sob_kdp, True)
-        self.Vradar.value.changed = True
+        radar.add_field(reproc_phase_name, reproc_phase, True)
+        radar.add_field(sob_kdp_name, sob_kdp, True)
+        radar.changed = True
         self.Vradar.update(strong_update)
-        print("Correction took %fs" % (t1-t0))
 
     def setParameters(self):
         '''Open set parameters dialog.'''
@@ -200,6 +212,10 @@ class PhaseProcLp(Component):
         for key in parm.keys():
             self.parameters[key] = parm[key]
 
+    def exportPipelineStep(self):
+        '''Append current parameters to a batch pipeline spec file.'''
+        common.export_pipeline_step(self, "phase_proc_lp", self.parameters)
+
     def _displayHelp(self):
         '''Display Py-Art's docstring for help.'''
         common.ShowLongText(pyart.correct.phase_proc_lp.__doc__)
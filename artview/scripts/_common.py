@@ -3,6 +3,7 @@ _common.py
 
 auxiliary functions for scripts
 """
+import os
 import pyart
 from ..components import (Menu, RadarDisplay, GridDisplay, LinkSharedVariables,
                           SelectRegion, PointsDisplay, Window, Correlation)
@@ -0,0 +1,33 @@
+"""
+batch.py
+
+Driver function that runs a correction pipeline over the files of a
+directory, without any display.
+"""
+import os
+
+from ..core import batch
+from ._common import _parse_dir
+
+
+def run(DirIn=None, filename=None, field=None, spec=None, output=None,
+        processes=None):
+    """
+    artview headless batch corrections
+
+    The pipeline spec defaults to 'pipeline.json' in DirIn and it is applied
+    to filename or else to every file in DirIn. See
+    :py:mod:`artview.core.batch` for the spec format.
+    """
+    DirIn = _parse_dir(DirIn)
+    if spec is None:
+        spec = os.path.join(DirIn, 'pipeline.json')
+    if filename is not None:
+        files = [filename]
+    else:
+        files = batch._expand_inputs([DirIn])
+        # skip specs, sidecars and journals
+        files = [f for f in files if not f.endswith(('.json', '.npz'))]
+    reports = batch.run_batch(files, batch.load_spec(spec), output,
+                              processes=processes)
+    return reports
@@ -39,7 +39,11 @@ def run(DirIn=None, filename=None, field=None):
     menu.setGeometry(0, 0, 700, 700)
 
     for correction in corrections:
-        c = correction(Vradar=Vradar, parent=menu)
+        if correction in (DealiasRegionBased, DealiasUnwrapPhase):
+            # sweep preview follows the display tilt
+            c = correction(Vradar=Vradar, Vtilt=Vtilt, parent=menu)
+        else:
+            c = correction(Vradar=Vradar, parent=menu)
         menu.addLayoutWidget(c)
         c.show()
 
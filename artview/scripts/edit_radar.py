@@ -30,7 +30,7 @@ def run(DirIn=None, filename=None, field=None):
     # start Displays
     Vtilt = Variable(0)
     plot1 = RadarDisplay(Vradar, Variable(field), Vtilt, name="Display",
-                         parent=menu)
+                         Vgatefilter=menu.Vgatefilter, parent=menu)
     roi = SelectRegion(plot1, name="SelectRegion", parent=menu)
 
     filt = GateFilter(Vradar=Vradar, Vgatefilter=plot1.Vgatefilter,
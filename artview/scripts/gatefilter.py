@@ -29,7 +29,7 @@ def run(DirIn=None, filename=None, field=None):
     # start Displays
     Vtilt = Variable(0)
     plot1 = RadarDisplay(Vradar, Variable(field), Vtilt, name="Display",
-                         parent=menu)
+                         Vgatefilter=menu.Vgatefilter, parent=menu)
     filt = GateFilter(Vradar=Vradar, Vgatefilter=plot1.Vgatefilter,
                       name="GateFilter", parent=None)
     # plot1._gatefilter_toggle_on()
@@ -0,0 +1,20 @@
+"""
+Tests of artview.core.batch
+"""
+
+import numpy as np
+import pyart
+
+from artview.core import batch
+
+
+def test_gatefilter_step_adds_exclusions():
+    radar = pyart.testing.make_empty_ppi_radar(10, 8, 1)
+    data = np.arange(radar.nrays * 10, dtype=float).reshape(-1, 10)
+    radar.add_field('reflectivity', {'data': data})
+    gatefilter = pyart.filters.GateFilter(radar)
+    gatefilter.exclude_above('reflectivity', 70.)
+    result = batch._step_gatefilter(
+        radar, gatefilter, {'criteria': [('reflectivity', '<', [5.])]})
+    expected = (data < 5.) | (data > 70.)
+    assert np.array_equal(result.gate_excluded, expected)
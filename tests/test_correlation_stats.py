@@ -0,0 +1,50 @@
+"""
+Tests of artview.core.correlation_stats
+"""
+
+import numpy as np
+
+from artview.core import correlation_stats
+
+
+def test_histogram2d_as_numpy():
+    random = np.random.RandomState(0)
+    x = random.normal(10, 5, 5000)
+    y = random.normal(0, 2, 5000)
+    xedges = correlation_stats.bin_edges(-5., 25., 30)
+    yedges = correlation_stats.bin_edges(-4., 4., 16)
+    # values on the edges, the last one belongs to the last bin
+    x[:3] = xedges[[0, 7, -1]]
+    y[:3] = yedges[[0, 5, -1]]
+    expected = np.histogram2d(x, y, bins=[xedges, yedges])[0]
+    counts = correlation_stats.histogram2d(x, y, xedges, yedges)
+    assert np.array_equal(counts, expected)
+
+
+def test_histogram2d_log_as_numpy():
+    random = np.random.RandomState(1)
+    x, y = correlation_stats.valid_pairs(
+        random.lognormal(0, 1, 5000), random.uniform(-1, 1, 5000),
+        xscale='log')
+    xedges = correlation_stats.bin_edges(1e-3, 1e3, 24, 'log')
+    yedges = correlation_stats.bin_edges(-1, 1, 10)
+    expected = np.histogram2d(x, y, bins=[np.log10(xedges), yedges])[0]
+    counts = correlation_stats.histogram2d(x, y, xedges, yedges, 'log')
+    assert np.array_equal(counts, expected)
+
+
+def test_density_counts_all_log():
+    random = np.random.RandomState(2)
+    xvalues = random.lognormal(0, 2, 3000)
+    yvalues = random.lognormal(1, 1, 3000)
+    for bins in (7, 50, 200):
+        counts, xedges, yedges = correlation_stats.density(
+            xvalues, yvalues, bins, 'log', 'log')
+        # the extreme values fall in the outer bins
+        assert counts.sum() == xvalues.size
+        assert counts[-1].sum() >= 1 and counts[:, -1].sum() >= 1
+    # maximum whose log10 round trip lands above the last edge
+    xvalues = np.array([0.5, 1.0, 1.8110410937470227])
+    counts, xedges, yedges = correlation_stats.density(
+        xvalues, xvalues, 50, 'log', 'log')
+    assert counts.sum() == 3 and counts[-1, -1] == 1
@@ -0,0 +1,82 @@
+"""
+Tests of artview.core.delta
+"""
+
+from functools import partial
+
+import numpy as np
+import pyart
+from pyart.lazydict import LazyLoadDict
+
+from artview.core import delta, sidecar
+
+
+def _radar(filename):
+    radar = pyart.testing.make_target_radar()
+    with open(filename, 'wb') as f:
+        f.write(b'radar file content')
+    radar.filename = filename
+    return radar
+
+
+def test_write_merge(tmpdir, monkeypatch):
+    monkeypatch.setenv('ARTVIEW_CACHE_DIR', str(tmpdir.join('cache')))
+    filename = str(tmpdir.join('radar.nc'))
+    radar = _radar(filename)
+    data = radar.fields['reflectivity']['data']
+    field = dict(radar.fields['reflectivity'])
+    field['data'] = np.ma.masked_greater(np.asarray(data) * 2., 80.)
+    mask = np.zeros((radar.nrays, radar.ngates), dtype=bool)
+    mask[3:7, 10:20] = True
+    path = filename + delta.DELTA_EXT
+    delta.write_delta(path, filename, None, radar.nrays, radar.ngates,
+                      {'doubled': field}, {'reflectivity': mask})
+
+    other = _radar(filename)
+    assert delta.merge_delta(other) == path
+    merged = other.fields['doubled']['data']
+    assert np.array_equal(np.ma.getmaskarray(merged),
+                          np.ma.getmaskarray(field['data']))
+    assert np.ma.allclose(merged, field['data'])
+    assert np.array_equal(
+        np.ma.getmaskarray(other.fields['reflectivity']['data']), mask)
+    assert other.delta_fields == ({'doubled'}, {'reflectivity'})
+
+    # a delta of other file content is not merged
+    with open(filename, 'ab') as f:
+        f.write(b' changed')
+    changed = pyart.testing.make_target_radar()
+    changed.filename = filename
+    assert delta.merge_delta(changed) is None
+    assert 'doubled' not in changed.fields
+
+
+def test_no_delta_no_hash(tmpdir, monkeypatch):
+    monkeypatch.setenv('ARTVIEW_CACHE_DIR', str(tmpdir.join('cache')))
+    radar = _radar(str(tmpdir.join('radar.nc')))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file hashed")
+    monkeypatch.setattr(sidecar, 'file_hash', fail)
+    assert delta.merge_delta(radar) is None
+
+
+def test_lazy_fields_not_loaded():
+    radar = pyart.testing.make_target_radar()
+    reflectivity = radar.fields['reflectivity']
+    calls = []
+
+    def loader(name):
+        calls.append(name)
+        return dict(reflectivity)
+    radar.fields = LazyLoadDict({})
+    for name in ('one', 'two', 'three'):
+        radar.fields.set_lazy(name, partial(loader, name))
+    delta.mark_loaded(radar)
+    assert calls == []
+    assert delta.modified_fields(radar) == (set(), set())
+
+    radar.fields['one']
+    radar.fields['two'] = dict(reflectivity)
+    assert calls == ['one']
+    assert delta.modified_fields(radar) == ({'two'}, set())
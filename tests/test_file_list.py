@@ -0,0 +1,15 @@
+"""
+Tests of artview.core.file_list
+"""
+
+from artview.core import file_list
+
+
+def test_companions_not_listed(tmpdir):
+    names = ['a.nc', 'b.nc', 'a.nc.delta.nc', 'a.nc.gatefilter.artview.npz',
+             'session.json', 'b.nc.tmp']
+    for name in names:
+        tmpdir.join(name).write(b'')
+    tmpdir.mkdir('subdir')
+    assert file_list.list_files(str(tmpdir)) == [
+        str(tmpdir.join('a.nc')), str(tmpdir.join('b.nc'))]
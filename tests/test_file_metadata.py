@@ -0,0 +1,34 @@
+"""
+Tests of artview.core.file_metadata
+"""
+
+import pytest
+import pyart
+
+from artview.core import file_metadata
+
+
+def test_netcdf_header(tmpdir):
+    filename = str(tmpdir.join('radar.nc'))
+    radar = pyart.testing.make_target_radar()
+    pyart.io.write_cfradial(filename, radar)
+    meta = file_metadata.read_metadata(filename, full=False)
+    assert (meta['nrays'], meta['ngates'], meta['nsweeps']) == (
+        radar.nrays, radar.ngates, radar.nsweeps)
+    assert meta['fields'] == sorted(radar.fields)
+    assert meta['time'] == '1989-01-01T00:00:01Z'
+    assert file_metadata.tooltip(filename).startswith('radar.nc\n')
+
+
+def test_unknown_format_not_read(tmpdir, monkeypatch):
+    filename = str(tmpdir.join('radar.unknown'))
+    with open(filename, 'wb') as f:
+        f.write(b'unknown radar format')
+
+    def read_full(filename):
+        raise AssertionError('full read')
+
+    monkeypatch.setattr(file_metadata, '_read_full', read_full)
+    assert file_metadata.tooltip(filename) == 'radar.unknown'
+    with pytest.raises(ValueError):
+        file_metadata.read_metadata(filename, full=False)
@@ -0,0 +1,49 @@
+"""
+Tests of artview.core.filter_pipeline
+"""
+
+import numpy as np
+import pyart
+
+from artview.core.filter_pipeline import (evaluate_criterion, FilterPipeline,
+                                         FILTER_OPERATORS)
+
+
+def _radar():
+    radar = pyart.testing.make_empty_ppi_radar(12, 20, 2)
+    data = np.random.RandomState(0).uniform(-10, 30, (radar.nrays, 12))
+    data = np.ma.masked_where(data > 28, data)
+    data[3, :4] = [np.nan, np.inf, -np.inf, np.nan]
+    radar.add_field('reflectivity', {'data': data})
+    return radar
+
+
+def test_same_as_gatefilter():
+    radar = _radar()
+    data = radar.fields['reflectivity']['data']
+    for operator, values in (("=", (0,)), ("<", (5.,)), (">=", (12.,)),
+                             ("inside", (0., 10.)), ("inside", (10., 0.)),
+                             ("outside", (0., 10.)),
+                             ("outside", (10., 0.))):
+        gatefilter = pyart.filters.GateFilter(radar)
+        gatefilter.exclude_invalid('reflectivity')
+        getattr(gatefilter, FILTER_OPERATORS[operator])(
+            'reflectivity', *values)
+        marked = evaluate_criterion(data, operator, values)
+        assert np.array_equal(marked, gatefilter.gate_excluded), operator
+
+
+def test_snapshot():
+    radar = _radar()
+    pipeline = FilterPipeline(radar)
+    criteria = [('reflectivity', '<', (5.,))]
+    snapshot = pipeline.snapshot()
+    pipeline.set_radar(_radar())
+    assert snapshot.radar is radar
+    gatefilter = snapshot.gatefilter(criteria)
+    assert gatefilter._radar is radar
+    expected = evaluate_criterion(radar.fields['reflectivity']['data'],
+                                  '<', (5.,))
+    assert np.array_equal(gatefilter.gate_excluded, expected)
+    # results for the old radar do not fill the cache of the new one
+    assert len(pipeline._cache) == 0
@@ -0,0 +1,52 @@
+"""
+Tests of artview.core.gatemask
+"""
+
+import numpy as np
+
+from artview.core.gatemask import GateMask
+
+
+def _random_mask(shape=(7, 13), seed=0):
+    return np.random.RandomState(seed).rand(*shape) > 0.6
+
+
+def test_array_round_trip():
+    array = _random_mask()
+    mask = GateMask.from_array(array)
+    assert mask.nbytes == (array.size + 7) // 8
+    assert np.array_equal(mask.to_array(), array)
+    assert mask.count() == array.sum()
+
+
+def test_indices_round_trip():
+    array = _random_mask()
+    ray, rng = np.nonzero(array)
+    mask = GateMask.from_indices(array.shape, ray, rng)
+    assert np.array_equal(mask.to_array(), array)
+    ray2, rng2 = mask.indices()
+    assert np.array_equal(ray2, ray)
+    assert np.array_equal(rng2, rng)
+
+
+def test_set_indices_false():
+    array = _random_mask()
+    mask = GateMask.from_array(array)
+    ray, rng = np.nonzero(array)
+    mask.set_indices(ray[:5], rng[:5], False)
+    array[ray[:5], rng[:5]] = False
+    assert np.array_equal(mask.to_array(), array)
+
+
+def test_operators():
+    a = _random_mask(seed=1)
+    b = _random_mask(seed=2)
+    ma, mb = GateMask.from_array(a), GateMask.from_array(b)
+    assert np.array_equal((ma & mb).to_array(), a & b)
+    assert np.array_equal((ma | mb).to_array(), a | b)
+    assert np.array_equal((ma ^ mb).to_array(), a ^ b)
+    # padding bits of the last byte stay clear
+    assert np.array_equal((~ma).to_array(), ~a)
+    assert (~ma).count() == (~a).sum()
+    assert ma == GateMask.from_array(a)
+    assert ma != mb
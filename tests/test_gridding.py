@@ -0,0 +1,90 @@
+"""
+Tests of artview.core.gridding
+"""
+
+import numpy as np
+import pyart
+
+from artview.core import gridding
+
+
+def _radar():
+    radar = pyart.testing.make_target_radar()
+    refl = np.ma.array(radar.fields['reflectivity']['data'], dtype=float)
+    refl += np.random.RandomState(0).uniform(0, 10, refl.shape)
+    refl[::7, ::5] = np.ma.masked
+    radar.fields['reflectivity']['data'] = refl
+    transition = np.zeros(radar.nrays, dtype='int8')
+    transition[10:20] = 1
+    radar.antenna_transition = {'data': transition}
+    return radar
+
+
+# constant and the distance functions with a radius below the grid size
+ROIS = (dict(roi_func='constant', constant_roi=155.),
+        dict(roi_func='dist', min_radius=50.),
+        dict(roi_func='dist_beam', min_radius=50.),
+        dict(roi_func='dist_beam', min_radius=50., h_factor=(0.5, 1., 2.),
+             nb=1.5))
+
+
+def _kwargs(radar, roi=ROIS[0]):
+    # grid origin at the radar, pyart then uses gate_x/y/z unprojected
+    kwargs = dict(grid_shape=(2, 21, 21),
+                  grid_limits=((0., 200.), (-1000., 1000.),
+                               (-1000., 1000.)),
+                  fields=['reflectivity'])
+    kwargs.update(roi)
+    return kwargs
+
+
+def test_parity_with_pyart(tmpdir):
+    radar = _radar()
+    gatefilter = pyart.filters.GateFilter(radar)
+    gatefilter.exclude_transition()
+    gatefilter.exclude_masked('reflectivity')
+    gatefilter.exclude_invalid('reflectivity')
+    gatefilter.exclude_above('reflectivity', 40.)
+    for roi in ROIS:
+        for weighting_function in ('Barnes', 'Cressman'):
+            expected = pyart.map.grid_from_radars(
+                [radar], gatefilters=[gatefilter],
+                weighting_function=weighting_function, **_kwargs(radar, roi))
+            grid = gridding.grid_from_radars_cached(
+                [radar], cache_dir=str(tmpdir), refl_field='reflectivity',
+                max_refl=40., weighting_function=weighting_function,
+                **_kwargs(radar, roi))
+            a = expected.fields['reflectivity']['data']
+            b = grid.fields['reflectivity']['data']
+            assert np.array_equal(np.ma.getmaskarray(a),
+                                  np.ma.getmaskarray(b))
+            assert np.ma.allclose(a, b, rtol=1e-4)
+            assert b.count() > 100
+            assert np.allclose(expected.fields['ROI']['data'],
+                               grid.fields['ROI']['data'], rtol=1e-5)
+
+
+def test_roi_bands_same_pairs():
+    radar = _radar()
+    spec = gridding._grid_spec([radar], _kwargs(radar, ROIS[2]))
+    geometry = gridding.build_geometry([radar], spec)
+    # a single band searches every gate with the largest radius
+    ratio = gridding.ROI_BAND_RATIO
+    try:
+        gridding.ROI_BAND_RATIO = 1e9
+        single = gridding.build_geometry([radar], spec)
+    finally:
+        gridding.ROI_BAND_RATIO = ratio
+    pairs = sorted(zip(geometry['point'], geometry['gate']))
+    assert pairs == sorted(zip(single['point'], single['gate']))
+    assert np.all(geometry['dist2'] <= geometry['roi2'] * (1 + 1e-6))
+
+
+def test_evict_by_bytes(tmpdir):
+    sizes = [100, 200, 300]
+    for n, size in enumerate(sizes):
+        path = tmpdir.join('%i.npz' % n)
+        path.write(b'0' * size)
+        path.setmtime(1000 + n)
+    gridding._evict(str(tmpdir), 550)
+    assert sorted(p.basename for p in tmpdir.listdir()) == ['1.npz', '2.npz']
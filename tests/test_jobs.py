@@ -0,0 +1,57 @@
+"""
+Tests of artview.core.jobs
+"""
+
+import os
+import time
+
+import numpy as np
+
+from artview.core import jobs
+
+
+def test_done_jobs_bounded():
+    runner = jobs.JobRunner(max_done=3)
+    called = []
+    for n in range(5):
+        job = jobs.Job('job %i' % n, len, callback=called.append)
+        job.state = jobs.FINISHED
+        job.result = n
+        runner.jobs.append(job)
+        runner._finish(job)
+    queued = jobs.Job('queued', len)
+    runner.jobs.insert(0, queued)
+    runner._forget_done()
+    assert called == [0, 1, 2, 3, 4]
+    assert [job.name for job in runner.jobs] == [
+        'queued', 'job 2', 'job 3', 'job 4']
+    assert runner.jobs[-1].callback is None
+
+
+def _wait(runner, job, timeout=30.):
+    start = time.time()
+    while not job.done() and time.time() - start < timeout:
+        time.sleep(0.05)
+        runner._poll()
+
+
+def test_result_received():
+    runner = jobs.JobRunner()
+    results, errors = [], []
+    big = np.arange(2 ** 20, dtype=float)
+    job = runner.submit('sum', np.cumsum, args=(big, ),
+                        callback=results.append, errback=errors.append)
+    _wait(runner, job)
+    assert job.state == jobs.FINISHED and not errors
+    assert np.array_equal(results[0], np.cumsum(big))
+
+    job = runner.submit('exit', os._exit, args=(3, ),
+                        errback=errors.append)
+    _wait(runner, job)
+    assert job.state == jobs.FAILED
+    assert errors == ["Worker process died (exit code 3)."]
+
+    job = runner.submit('sleep', time.sleep, args=(60, ))
+    runner.cancel(job)
+    assert job.state == jobs.CANCELLED
+    assert not job._thread.is_alive()
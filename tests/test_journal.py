@@ -0,0 +1,164 @@
+"""
+Tests of artview.core.journal
+"""
+
+import numpy as np
+
+from artview.core.gatemask import GateMask
+from artview.core.journal import (EditJournal, EditOperation, MaskOperation,
+                                  radar_version)
+
+
+class _Radar(object):
+    '''Minimal stand in of pyart Radar for the journal.'''
+
+    def __init__(self, nrays=6, ngates=9, nfields=3):
+        self.nrays = nrays
+        self.ngates = ngates
+        self.fields = {}
+        for n in range(nfields):
+            data = np.arange(nrays * ngates, dtype=float).reshape(
+                nrays, ngates) + n
+            self.fields['f%i' % n] = {'data': data}
+
+    def add_field_like(self, source, name, data, replace_existing=False):
+        self.fields[name] = {'data': data}
+
+
+def _snapshot(radar):
+    return dict((name, (np.ma.getdata(f['data']).copy(),
+                        np.ma.getmaskarray(f['data']).copy()))
+                for name, f in radar.fields.items())
+
+
+def _assert_same(radar, snapshot):
+    assert set(radar.fields) == set(snapshot)
+    for name, (data, mask) in snapshot.items():
+        assert np.array_equal(np.ma.getdata(radar.fields[name]['data']),
+                              data)
+        assert np.array_equal(np.ma.getmaskarray(radar.fields[name]['data']),
+                              mask)
+
+
+def _gates():
+    return np.array([0, 1, 3, 5]), np.array([2, 2, 7, 0])
+
+
+def test_edit_undo_redo():
+    radar = _Radar()
+    before = _snapshot(radar)
+    ray, rng = _gates()
+    journal = EditJournal()
+    journal.edit(radar, [EditOperation('f0', ray, rng, data=-1.),
+                         EditOperation('f1', ray, rng, mask=True)])
+    after = _snapshot(radar)
+    assert np.all(radar.fields['f0']['data'][ray, rng] == -1.)
+    assert np.all(radar.fields['f1']['data'].mask[ray, rng])
+    assert journal.fields() == set(['f0', 'f1'])
+    assert radar_version(radar) == 1
+
+    assert journal.undo(radar) is not None
+    _assert_same(radar, before)
+    assert journal.redo(radar) is not None
+    _assert_same(radar, after)
+    assert journal.undo(radar) is not None
+    assert journal.undo(radar) is None
+
+
+def test_created_field_undo():
+    radar = _Radar()
+    ray, rng = _gates()
+    journal = EditJournal()
+    journal.edit(radar, [EditOperation('new', ray, rng, data=0.,
+                                       source='f0')])
+    assert 'new' in radar.fields
+    journal.undo(radar)
+    assert 'new' not in radar.fields
+
+
+def test_gatemask_selection():
+    radar = _Radar()
+    before = _snapshot(radar)
+    ray, rng = _gates()
+    selection = GateMask.from_indices((radar.nrays, radar.ngates), ray, rng)
+    journal = EditJournal()
+    journal.edit(radar, [MaskOperation(list(radar.fields), selection, None),
+                         EditOperation('f0', selection, None, data=5.)])
+    assert np.all(radar.fields['f2']['data'].mask[ray, rng])
+    assert np.all(np.ma.getdata(radar.fields['f0']['data'])[ray, rng] == 5.)
+    journal.undo(radar)
+    _assert_same(radar, before)
+
+
+def test_save_load_replay(tmpdir):
+    ray, rng = _gates()
+    radar = _Radar()
+    selection = GateMask.from_indices((radar.nrays, radar.ngates), ray, rng)
+    journal = EditJournal()
+    journal.edit(radar, [EditOperation('f0', ray, rng, data=-2.)], 'edit')
+    journal.edit(radar, [MaskOperation(['f1', 'f2'], selection, None)],
+                 'mask')
+    filename = str(tmpdir.join('journal.npz'))
+    journal.save(filename)
+
+    fresh = _Radar()
+    loaded = EditJournal.load(filename)
+    loaded.replay(fresh)
+    _assert_same(fresh, _snapshot(radar))
+    assert [d for d, ops in loaded.undo_stack] == ['edit', 'mask']
+
+
+def test_maxlen():
+    radar = _Radar()
+    ray, rng = _gates()
+    journal = EditJournal(maxlen=2)
+    for value in range(4):
+        journal.edit(radar, [EditOperation('f0', ray, rng, data=value)])
+    assert len(journal.undo_stack) == 2
+
+
+def test_maxbytes():
+    radar = _Radar()
+    ray, rng = _gates()
+    journal = EditJournal()
+    journal.edit(radar, [EditOperation('f0', ray, rng, data=1.)])
+    size = journal.nbytes
+    journal.maxbytes = 2 * size
+    for value in range(4):
+        journal.edit(radar, [EditOperation('f0', ray, rng, data=value)])
+    assert len(journal.undo_stack) == 2
+    assert journal.nbytes <= 2 * size
+    # the last group is kept even above the limit
+    journal.maxbytes = 0
+    journal.edit(radar, [EditOperation('f0', ray, rng, data=5.)])
+    assert len(journal.undo_stack) == 1
+
+
+def test_mask_operation_shared_overlay():
+    radar = _Radar(nfields=4)
+    radar.fields['f3']['data'] = np.ma.array(radar.fields['f3']['data'],
+                                             mask=False)
+    own = np.ma.getmask(radar.fields['f3']['data'])
+    before = _snapshot(radar)
+    ray, rng = _gates()
+    journal = EditJournal()
+    journal.edit(radar, [MaskOperation(list(radar.fields), ray, rng)])
+    masks = [np.ma.getmask(radar.fields[name]['data'])
+             for name in ('f0', 'f1', 'f2')]
+    # one overlay for the fields without mask, the own mask edited in place
+    assert masks[0] is masks[1] is masks[2]
+    assert np.ma.getmask(radar.fields['f3']['data']) is own
+    for field in radar.fields.values():
+        assert np.all(field['data'].mask[ray, rng])
+
+    # later edits of some fields do not leak to the others
+    journal.edit(radar, [EditOperation('f0', [4], [4], mask=True)])
+    journal.edit(radar, [MaskOperation(['f1'], [5], [5])])
+    assert not radar.fields['f1']['data'].mask[4, 4]
+    assert not radar.fields['f2']['data'].mask[4, 4]
+    assert not radar.fields['f0']['data'].mask[5, 5]
+    assert not radar.fields['f2']['data'].mask[5, 5]
+    assert radar.fields['f1']['data'].mask[5, 5]
+    while journal.undo(radar) is not None:
+        pass
+    _assert_same(radar, before)
@@ -0,0 +1,96 @@
+"""
+Tests of artview.core.reopen_cache
+"""
+
+import os
+
+import numpy as np
+import pyart
+
+from artview.core import reopen_cache
+
+
+def test_write_read_radar(tmpdir):
+    radar = pyart.testing.make_target_radar()
+    data = radar.fields['reflectivity']['data']
+    radar.fields['reflectivity']['data'] = np.ma.masked_greater(data, 30.)
+    directory = str(tmpdir.join('entry'))
+    reopen_cache.write_radar(directory, radar)
+
+    other = reopen_cache.read_radar(directory)
+    assert (other.nrays, other.ngates) == (radar.nrays, radar.ngates)
+    assert np.array_equal(other.azimuth['data'], radar.azimuth['data'])
+    assert np.array_equal(other.range['data'], radar.range['data'])
+    assert other.metadata == radar.metadata
+    field = other.fields['reflectivity']
+    assert field['units'] == radar.fields['reflectivity']['units']
+    assert np.array_equal(np.ma.getmaskarray(field['data']),
+                          np.asarray(data) > 30.)
+    assert np.ma.allclose(field['data'], radar.fields['reflectivity']['data'])
+    # copy on write, the cache is never changed
+    field['data'][0, 0] = -10.
+    assert reopen_cache.read_radar(directory).fields['reflectivity'][
+        'data'][0, 0] != -10.
+
+
+def _radar_file(tmpdir):
+    filename = str(tmpdir.join('radar.nc'))
+    pyart.io.write_cfradial(filename, pyart.testing.make_target_radar())
+    return filename
+
+
+def test_build_cache_lost_race(tmpdir, monkeypatch):
+    monkeypatch.setenv('ARTVIEW_CACHE_DIR', str(tmpdir.join('cache')))
+    filename = _radar_file(tmpdir)
+    rename = os.rename
+
+    def other_worker_first(src, dst):
+        # other worker renames its entry to dst meanwhile
+        rename(src, dst)
+        raise OSError('Directory not empty')
+
+    monkeypatch.setattr(reopen_cache.os, 'rename', other_worker_first)
+    directory = reopen_cache.build_cache(filename)
+    assert os.path.isfile(os.path.join(directory, reopen_cache.HEADER))
+    assert os.listdir(os.path.dirname(directory)) == [
+        os.path.basename(directory)]
+
+
+class _Runner(object):
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, name, func, args=(), kwargs=None, callback=None,
+               errback=None):
+        self.jobs.append((args, callback, errback))
+
+
+def test_submit_build_once(tmpdir, monkeypatch):
+    monkeypatch.setenv('ARTVIEW_CACHE_DIR', str(tmpdir.join('cache')))
+    monkeypatch.setattr(reopen_cache, '_building', {})
+    monkeypatch.setattr(reopen_cache, '_failed', set())
+    runner = _Runner()
+    monkeypatch.setattr(reopen_cache, 'get_job_runner', lambda: runner)
+    filename = _radar_file(tmpdir)
+    done = []
+    reopen_cache.submit_build(filename, callback=done.append)
+    # read while filling does not start a second worker
+    reopen_cache.read(filename)
+    reopen_cache.submit_build(filename, callback=done.append)
+    assert len(runner.jobs) == 1
+
+    args, callback, errback = runner.jobs[0]
+    errback('Traceback')
+    assert done == []
+    # failed entries are not tried again
+    reopen_cache.read(filename)
+    reopen_cache.submit_build(filename, callback=done.append)
+    assert len(runner.jobs) == 1
+    assert done == [None]
+
+    monkeypatch.setattr(reopen_cache, '_failed', set())
+    reopen_cache.submit_build(filename, callback=done.append)
+    args, callback, errback = runner.jobs[1]
+    callback(reopen_cache.build_cache(*args))
+    assert done == [None, reopen_cache.build_cache(filename)]
+    assert reopen_cache.read(filename).nrays == 360
@@ -0,0 +1,35 @@
+"""
+Tests of artview.core.result_cache
+"""
+
+import numpy as np
+import pyart
+
+from artview.core import result_cache
+
+
+def test_cached_call(tmpdir):
+    cache = result_cache.ResultCache(str(tmpdir))
+    radar = pyart.testing.make_target_radar()
+    calls = []
+
+    def double(radar, field):
+        calls.append(field)
+        result = dict(radar.fields[field])
+        result['data'] = radar.fields[field]['data'] * 2.
+        return result
+
+    kwargs = {'radar': radar, 'field': 'reflectivity'}
+    args = (cache, double, kwargs, radar, ['reflectivity'], None)
+    first = result_cache._cached_call(*(args + (False, )))
+    second = result_cache._cached_call(*(args + (False, )))
+    assert calls == ['reflectivity']
+    assert np.ma.allclose(first['data'], second['data'])
+    assert second['units'] == first['units']
+
+    # edited input fields are a new computation
+    radar.fields['reflectivity']['data'] = \
+        radar.fields['reflectivity']['data'] + 1.
+    result_cache._cached_call(*(args + (False, )))
+    result_cache._cached_call(*(args + (True, )))
+    assert len(calls) == 3
@@ -0,0 +1,57 @@
+"""
+Tests of artview.core.save_service
+"""
+
+import os
+
+import numpy as np
+import pyart
+
+from artview.core import save_service
+
+
+def test_write_radar(tmpdir):
+    filename = str(tmpdir.join('radar.nc'))
+    radar = pyart.testing.make_target_radar()
+    save_service.write_radar(filename, radar,
+                             {'reflectivity': {'zlib': 2,
+                                               'packing': 'float32'}})
+    assert os.listdir(str(tmpdir)) == ['radar.nc']
+    data = pyart.io.read(filename).fields['reflectivity']['data']
+    assert np.ma.allclose(data, radar.fields['reflectivity']['data'])
+
+
+def test_write_grid(tmpdir):
+    filename = str(tmpdir.join('grid.nc'))
+    grid = pyart.map.grid_from_radars(
+        (pyart.testing.make_target_radar(),), grid_shape=(2, 10, 10),
+        grid_limits=((0, 2000), (-1000, 1000), (-1000, 1000)),
+        fields=['reflectivity'])
+    save_service.write_grid(filename, grid,
+                            {'reflectivity': {'zlib': 2,
+                                              'packing': 'int16'}})
+    other = pyart.io.read_grid(filename)
+    assert sorted(other.fields) == sorted(grid.fields)
+    data = other.fields['reflectivity']['data']
+    assert data.shape == (2, 10, 10)
+    assert np.ma.allclose(data, grid.fields['reflectivity']['data'],
+                          atol=1e-2)
+
+
+def test_failed_write_keeps_file(tmpdir):
+    filename = str(tmpdir.join('radar.nc'))
+    with open(filename, 'w') as f:
+        f.write('previous')
+    radar = pyart.testing.make_target_radar()
+    # a field that can not be written
+    radar.fields['bad'] = {'data': radar.fields['reflectivity']['data'],
+                           'attribute': object()}
+    try:
+        save_service.write_radar(filename, radar)
+    except Exception:
+        pass
+    else:
+        raise AssertionError("write did not fail")
+    assert os.listdir(str(tmpdir)) == ['radar.nc']
+    with open(filename) as f:
+        assert f.read() == 'previous'
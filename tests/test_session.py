@@ -0,0 +1,43 @@
+"""
+Tests of artview.core.session
+"""
+
+import pickle
+
+import pyart
+
+from artview.core import session, sidecar
+
+
+def test_encode_gatefilter(tmpdir, monkeypatch):
+    monkeypatch.setenv('ARTVIEW_CACHE_DIR', str(tmpdir.join('cache')))
+    filename = str(tmpdir.join('radar.nc'))
+    radar = pyart.testing.make_target_radar()
+    pyart.io.write_cfradial(filename, radar)
+    radar.filename = filename
+    gatefilter = pyart.filters.GateFilter(radar)
+    gatefilter.exclude_above('reflectivity', 30.)
+
+    # no sidecar is written unless asked
+    assert session.encode_value(gatefilter) is None
+    assert not sidecar.has_sidecar(filename)
+
+    entry = session.encode_value(gatefilter, save_sidecars=True)
+    assert entry == {'type': 'gatefilter', 'filename': filename,
+                     'sidecar': sidecar.find_sidecar(filename)}
+    assert session.encode_value(gatefilter) == entry
+    assert (sidecar.load_gatefilter(radar).gate_excluded ==
+            gatefilter.gate_excluded).all()
+
+
+def test_encode_grid(tmpdir):
+    filename = str(tmpdir.join('grid.nc'))
+    grid = pyart.testing.make_target_grid()
+    assert session.encode_value(grid) is None
+    pyart.io.write_grid(filename, grid)
+    grid.filename = filename
+    assert session.encode_value(grid) == {'type': 'grid',
+                                          'filename': filename}
+    # sent back from the worker
+    other = pickle.loads(pickle.dumps(session._read_grid(filename)))
+    assert (other.nx, other.ny, other.nz) == (grid.nx, grid.ny, grid.nz)
@@ -0,0 +1,94 @@
+"""
+Tests of artview.core.sidecar
+"""
+
+import os
+
+import numpy as np
+import pyart
+
+from artview.core import sidecar
+from artview.core.gatemask import GateMask
+
+
+def test_load_without_sidecar(tmpdir, monkeypatch):
+    cache = str(tmpdir.join('cache'))
+    monkeypatch.setenv('ARTVIEW_CACHE_DIR', cache)
+    filename = str(tmpdir.join('radar.nc'))
+    with open(filename, 'wb') as f:
+        f.write(b'radar data')
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file hashed")
+    monkeypatch.setattr(sidecar, 'file_hash', fail)
+    assert not sidecar.has_sidecar(filename)
+    assert sidecar.load_mask(filename) is None
+    assert not os.path.exists(cache)
+
+
+def test_save_load(tmpdir, monkeypatch):
+    monkeypatch.setenv('ARTVIEW_CACHE_DIR', str(tmpdir.join('cache')))
+    filename = str(tmpdir.join('radar.nc'))
+    with open(filename, 'wb') as f:
+        f.write(b'radar data')
+    array = np.zeros((5, 7), dtype=bool)
+    array[1, 2] = array[4, 6] = True
+    for location in ('local', 'cache'):
+        path = sidecar.save_mask(filename, GateMask.from_array(array),
+                                 location=location)
+        assert sidecar.has_sidecar(filename)
+        mask, info = sidecar.load_mask(filename)
+        assert np.array_equal(mask.to_array(), array)
+        assert info['file_hash'] == sidecar.file_hash(filename)
+        os.remove(path)
+    # sidecar of other content is not loaded
+    sidecar.save_mask(filename, GateMask.from_array(array), location='local')
+    with open(filename, 'ab') as f:
+        f.write(b' changed')
+    assert sidecar.load_mask(filename) is None
+
+
+class _Runner(object):
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, name, func, args=(), kwargs=None, callback=None,
+               errback=None):
+        self.jobs.append((func, args, kwargs or {}, callback))
+
+    def run(self):
+        func, args, kwargs, callback = self.jobs.pop(0)
+        callback(func(*args, **kwargs))
+
+
+def test_gatefilter_in_job(tmpdir, monkeypatch):
+    monkeypatch.setenv('ARTVIEW_CACHE_DIR', str(tmpdir.join('cache')))
+    runner = _Runner()
+    monkeypatch.setattr(sidecar, 'get_job_runner', lambda: runner)
+    radar = pyart.testing.make_target_radar()
+    radar.filename = str(tmpdir.join('radar.nc'))
+    with open(radar.filename, 'wb') as f:
+        f.write(b'radar data')
+    assert sidecar.submit_load_gatefilter(radar, None) is None
+    assert runner.jobs == []
+
+    gatefilter = pyart.filters.GateFilter(radar)
+    gatefilter.exclude_below('reflectivity', 30.)
+    # hashing and writing are done by the job
+    monkeypatch.setattr(sidecar, '_hash_cache', {})
+    paths = []
+    sidecar.submit_save_gatefilter(radar, gatefilter, ['script'],
+                                   callback=paths.append)
+    assert not sidecar._hash_cache and not sidecar.has_sidecar(
+        radar.filename)
+    runner.run()
+    assert paths == [sidecar.find_sidecar(radar.filename)]
+
+    restored = []
+    monkeypatch.setattr(sidecar, '_hash_cache', {})
+    sidecar.submit_load_gatefilter(radar, restored.append)
+    assert not sidecar._hash_cache and restored == []
+    runner.run()
+    assert np.array_equal(restored[0].gate_excluded,
+                          gatefilter.gate_excluded)
+    assert restored[0].sidecar_provenance['filterscript'] == ['script']
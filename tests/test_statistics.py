@@ -0,0 +1,46 @@
+"""
+Tests of artview.core.statistics
+"""
+
+import numpy as np
+
+from artview.core import statistics
+from artview.core.points import Points
+
+
+def test_exact_median():
+    random = np.random.RandomState(0)
+    for size in [1, 2, 1001, 1000]:
+        values = random.normal(10, 5, size)
+        data = np.ma.masked_greater(np.append(values, [1e3, np.inf]), 100.)
+        stats = statistics.ArrayStatistics(data, exact_median=True)
+        assert stats.median == np.median(values)
+        assert stats._arrays[0] is data
+    # coarsened sketch
+    data = random.uniform(-1e4, 1e4, 10001)
+    stats = statistics.ArrayStatistics(exact_median=True)
+    stats.sketch.max_bins = 100
+    stats.update(data[:5000])
+    stats.update(data[5000:])
+    assert stats.median == np.median(data)
+
+
+def test_histogram_includes_vmax():
+    data = np.array([0., 0.5, 1.5, 2.25, 3.])
+    stats = statistics.ArrayStatistics(data)
+    counts, edges = stats.histogram(bins=3)
+    expected = np.histogram(data, bins=3, range=(0., 3.))
+    assert np.array_equal(counts, expected[0])
+    assert np.allclose(edges, expected[1])
+
+
+def test_cache_keyed_on_source_version():
+    radar = type('Radar', (object, ), {})()
+    data = np.arange(10.)
+    points = Points({'field': {'data': data}}, {}, {}, 10, source=radar)
+    cache = statistics.StatisticsCache()
+    assert cache.get(points, 'field').median == 4.5
+    data[:] = 0.
+    assert cache.get(points, 'field').median == 4.5
+    radar.edit_version = 1
+    assert cache.get(points, 'field').median == 0.